@@ -0,0 +1,125 @@
+"""Admission control: per-class concurrency limits with bounded wait queues.
+
+Endpoints that burn CPU/IO for seconds (photo uploads, PDF/ZIP exports) are tagged with
+``@admit("upload")`` / ``@admit("export")``. Each class lets ADMISSION_<CLASS>_CONCURRENCY
+requests run at once and up to ADMISSION_<CLASS>_QUEUE more wait (at most
+ADMISSION_<CLASS>_WAIT_SECONDS); everything beyond that gets an immediate 503 with
+Retry-After instead of tying up another server thread. Untagged endpoints (the cheap
+reads) never wait here, so they keep their latency during upload bursts.
+
+A limit of 0 disables the gate for that class.
+"""
+import time
+import threading
+from functools import wraps
+from typing import Dict
+
+from flask import current_app, jsonify
+
+from instrumentation import Counter, Gauge, Histogram, register_metric
+
+CLASSES = ("upload", "export")
+
+ADMISSION_REJECTED = register_metric(Counter(
+    "bauapp_admission_rejected_total", "Requests answered 503 by admission control.", ("class", "reason")
+))
+ADMISSION_WAIT_SECONDS = register_metric(Histogram(
+    "bauapp_admission_wait_seconds", "Time admitted requests waited for a slot.",
+    (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0), ("class",)
+))
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class Gate:
+    def __init__(self, name: str):
+        self.name = name
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+
+    def acquire(self, limit: int, queue_max: int, wait_seconds: float) -> None:
+        with self._cond:
+            if self.active < limit and self.waiting == 0:
+                self.active += 1
+                return
+            if self.waiting >= queue_max:
+                ADMISSION_REJECTED.inc(self.name, "queue_full")
+                raise AdmissionRejected(self._retry_after(wait_seconds))
+            self.waiting += 1
+            started = time.monotonic()
+            deadline = started + wait_seconds
+            try:
+                while self.active >= limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        ADMISSION_REJECTED.inc(self.name, "timeout")
+                        raise AdmissionRejected(self._retry_after(wait_seconds))
+                    self._cond.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, self.name)
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def _retry_after(self, wait_seconds: float) -> int:
+        return max(1, int(round(wait_seconds)))
+
+_gates: Dict[str, Gate] = {name: Gate(name) for name in CLASSES}
+
+register_metric(Gauge(
+    "bauapp_admission_in_flight", "Requests currently running per admission class.", ("class",),
+    lambda: {(name,): g.active for name, g in _gates.items()}
+))
+register_metric(Gauge(
+    "bauapp_admission_queued", "Requests waiting for a slot per admission class.", ("class",),
+    lambda: {(name,): g.waiting for name, g in _gates.items()}
+))
+
+def _limits(name: str):
+    cfg = current_app.config
+    key = name.upper()
+    return (
+        int(cfg.get(f"ADMISSION_{key}_CONCURRENCY") or 0),
+        int(cfg.get(f"ADMISSION_{key}_QUEUE") or 0),
+        float(cfg.get(f"ADMISSION_{key}_WAIT_SECONDS") or 0),
+    )
+
+def admit(name: str):
+    """Decorator; put it below @token_required so only authenticated requests take a slot.
+    Generated (streamed) responses keep their slot until the body has been sent."""
+    gate = _gates[name]
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            limit, queue_max, wait_seconds = _limits(name)
+            if limit <= 0:
+                return f(*args, **kwargs)
+            try:
+                gate.acquire(limit, queue_max, wait_seconds)
+            except AdmissionRejected as e:
+                resp = jsonify({"error": "Server ausgelastet, bitte erneut versuchen"})
+                resp.headers["Retry-After"] = str(e.retry_after)
+                return resp, 503
+
+            resp = None
+            try:
+                resp = current_app.make_response(f(*args, **kwargs))
+            finally:
+                if resp is None:
+                    gate.release()
+            # generators (ZIP streams) keep working while the body is sent; send_file bodies are ready
+            if resp.is_streamed and not resp.direct_passthrough:
+                resp.call_on_close(gate.release)
+            else:
+                gate.release()
+            return resp
+        return wrapper
+    return decorator
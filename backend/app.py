@@ -1,28 +1,58 @@
 import os
+import io
+import re
 import json
 import uuid
 import datetime
-from typing import List, Optional
+import functools
+import mimetypes
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from flask import Flask, request, jsonify, send_file, abort
+import click
+from flask import Flask, Response, request, jsonify, send_file, abort, g
 from flask_cors import CORS
-from werkzeug.security import check_password_hash
 from werkzeug.utils import secure_filename
 
 from config import Config
-from db import get_db, init_db, ensure_upload_root, project_upload_dir
-from auth import token_required, create_token, require_admin
-from image_processing import save_images_for_report
-from pdf_export import build_project_pdf, build_report_pdf
+from db import ensure_upload_root, project_upload_dir, tags_from_json
+from repositories import init_storage, open_store
+from auth import (
+    token_required, create_token, require_admin, current_role,
+    issue_refresh_token, rotate_refresh_token, revoke_refresh_token,
+)
+from image_processing import save_images_for_report, save_avatar, remove_stale_avatars, AVATAR_SIZES, AVATAR_NAME_RE
+from image_processing import ImageTooLarge, photo_hash
+from image_processing import preload as preload_image_modules
+from pdf_export import ImageCache, build_project_pdf, build_report_pdf
+from pdf_export import preload as preload_pdf_modules
+from pdf_batch import export_projects
+from zip_stream import stream_zip
+from table_export import stream_csv, stream_xlsx
+import cold_archive
+import tenants
+from admission import admit
+from instrumentation import init_instrumentation, timed
+from events import broker, record_event, replay_events, tail_events, latest_event_id, stream as event_stream
+from dashboard import dashboard_cache, compute_dashboard, data_stamp
+from photo_index import photo_index, project_stamp, distance as hash_distance
+from passwords import verify_password, hash_password, note_rehash, login_throttle, HashPoolBusy
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 def iso_now() -> str:
     return datetime.datetime.utcnow().isoformat() + "Z"
 
+def storage_base() -> str:
+    """Directory stored file paths are relative to: the tenant's directory with TENANTS_DIR."""
+    tenant = tenants.current(app.config)
+    return tenant.base_dir if tenant else BASE_DIR
+
+def storage_config():
+    return tenants.storage_config(app.config)
+
 def _rel_from_base(path: str) -> str:
     if os.path.isabs(path):
-        rel = os.path.relpath(path, BASE_DIR)
+        rel = os.path.relpath(path, storage_base())
     else:
         rel = path
     return rel.replace("\\", "/")
@@ -32,21 +62,173 @@ def make_url(rel_path: str) -> str:
     return request.host_url.rstrip("/") + "/" + rel_path
 
 def make_upload_url(file_path: str) -> str:
-    return make_url(_rel_from_base(file_path))
+    rel = _rel_from_base(file_path)
+    tenant = tenants.current_name(app.config)
+    if tenant and tenants.host_tenant(app.config) != tenant:
+        # the host doesn't name the tenant (localhost, shared API host): name it in the path
+        rel = f"tenants/{tenant}/{rel}"
+    return make_url(rel)
+
+def requested_tags() -> List[str]:
+    """?tag=Sicherheitsproblem (repeatable) -> reports having any of these quick actions."""
+    tags = []
+    for t in request.args.getlist("tag"):
+        t = t.strip()
+        if t and t not in tags:
+            tags.append(t)
+    return tags
+
+def normalize_worker_ids(value) -> Optional[List[str]]:
+    """Dedupe (order-preserving) a worker id list from a request body; None if it isn't a list of strings."""
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        return None
+    return list(dict.fromkeys(v.strip() for v in value if v.strip()))
+
+DEFAULT_AVATAR_SIZE = 128
+
+def avatar_urls(avatar_path: Optional[str]) -> Optional[Dict[str, str]]:
+    """Per-size avatar URLs. avatar_path points at the default-size variant; legacy raw uploads serve every size."""
+    if not avatar_path:
+        return None
+    m = AVATAR_NAME_RE.match(os.path.basename(avatar_path))
+    if not m:
+        url = make_upload_url(avatar_path)
+        return {str(size): url for size in AVATAR_SIZES}
+    d = os.path.dirname(avatar_path)
+    return {str(size): make_upload_url(f"{d}/{m['stem']}_{size}.{m['ext']}") for size in AVATAR_SIZES}
+
+def avatar_fields(avatar_path: Optional[str]) -> dict:
+    urls = avatar_urls(avatar_path)
+    return {
+        "avatarUrl": urls[str(DEFAULT_AVATAR_SIZE)] if urls else None,
+        "avatarUrls": urls
+    }
 
-def get_assigned_projects(conn, user_id: str) -> List[str]:
-    rows = conn.execute("SELECT project_id FROM project_assignments WHERE user_id = ?", (user_id,)).fetchall()
-    return [r["project_id"] for r in rows]
+def project_to_json(p, workers: List[str]) -> dict:
+    return {
+        "id": p["id"],
+        "name": p["name"],
+        "address": p["address"],
+        "customerName": p["customer_name"],
+        "status": p["status"],
+        "createdAt": p["created_at"],
+        "updatedAt": p["updated_at"],
+        "description": p["description"],
+        "imageUrl": p["image_url"],
+        "reportsCount": int(p["reports_count"] or 0),
+        "imagesCount": int(p["images_count"] or 0),
+        "lastReportAt": p["last_report_at"],
+        "assignedWorkers": workers
+    }
+
+def photo_to_json(row) -> dict:
+    """A report photo with the metadata read at upload (None for photos from before that)."""
+    return {
+        "url": make_upload_url(row["file_path"]),
+        "capturedAt": row["captured_at"],
+        "lat": row["lat"],
+        "lon": row["lon"],
+        "width": row["width"],
+        "height": row["height"],
+        "bytes": row["byte_size"],
+    }
 
-def get_assigned_workers(conn, project_id: str) -> List[str]:
-    rows = conn.execute("SELECT user_id FROM project_assignments WHERE project_id = ?", (project_id,)).fetchall()
-    return [r["user_id"] for r in rows]
+def report_to_json(r, photos: List[dict], quick_actions: List[str], with_project: bool = True) -> dict:
+    """photos: photo_to_json() dicts; "images" keeps the plain URL list for older clients."""
+    out = {
+        "id": r["id"],
+        "projectId": r["project_id"],
+        "userId": r["user_id"],
+        "userName": (r["name"] or r["username"]),
+        "text": r["text"],
+        "images": [p["url"] for p in photos],
+        "photos": photos,
+        "quickActions": quick_actions,
+        "weather": r["weather"],
+        "workersPresent": r["workers_present"],
+        "startTime": r["start_time"],
+        "endTime": r["end_time"],
+        "breakMinutes": r["break_minutes"],
+        "createdAt": r["created_at"]
+    }
+    if with_project:
+        out["projectName"] = r["project_name"]
+        out["projectAddress"] = r["project_address"]
+    return out
 
-def get_avatar_url(conn, user_id: str) -> Optional[str]:
-    row = conn.execute("SELECT avatar_path FROM users WHERE id = ?", (user_id,)).fetchone()
-    if row and row["avatar_path"]:
-        return make_upload_url(row["avatar_path"])
-    return None
+def reports_to_json(store, chunks, with_project: bool = True) -> List[dict]:
+    """Serialize report chunks; images and quick actions are loaded once per chunk, not per report."""
+    out = []
+    for rows in chunks:
+        ids = [r["id"] for r in rows]
+        photos = store.images.photos_by_report(ids)
+        quick_actions = store.reports.quick_actions(ids)
+        for r in rows:
+            out.append(report_to_json(r, [photo_to_json(p) for p in photos[r["id"]]], quick_actions[r["id"]], with_project))
+    return out
+
+def cold_report_chunks(store, cold_cfg, **filters) -> Iterator[List[dict]]:
+    """Report rows of cold-archived projects (cold_archive.report_chunks filters), joined with
+    author and project name like the hot report queries."""
+    for rows in cold_archive.report_chunks(cold_cfg, **filters):
+        projects = store.projects.by_ids(r["project_id"] for r in rows)
+        users = store.users.by_ids(r["user_id"] for r in rows)
+        out = []
+        for r in rows:
+            user, project = users.get(r["user_id"]), projects.get(r["project_id"])
+            out.append({**r, "username": user["username"] if user else None, "name": user["name"] if user else None,
+                        "project_name": project["name"] if project else None,
+                        "project_address": project["address"] if project else None})
+        yield out
+
+# photos archived before their metadata columns existed
+_COLD_PHOTO_DEFAULTS = dict.fromkeys(("captured_at", "lat", "lon", "width", "height", "byte_size"))
+
+def cold_reports_to_json(store, visible_to: Optional[str], tags: Sequence[str]) -> List[dict]:
+    """Reports of cold-archived projects for ?archived=1 listings, read from the archive without
+    a restore; their photo URLs are served from the packs by /uploads/."""
+    cold_cfg = storage_config()
+    if cold_archive.stamp(cold_cfg) is None:
+        return []
+    project_ids = None if visible_to is None else store.projects.assigned_to(visible_to)
+    out = []
+    for rows in cold_report_chunks(store, cold_cfg, project_ids=project_ids, tags=tags):
+        photos = cold_archive.photos_by_report(cold_cfg, [r["id"] for r in rows])
+        for r in rows:
+            quick_actions = tags_from_json(r["quick_actions"])
+            out.append(report_to_json(r, [photo_to_json({**_COLD_PHOTO_DEFAULTS, **p}) for p in photos[r["id"]]],
+                                      quick_actions))
+    return out
+
+def full_path(file_path: str, base_dir: Optional[str] = None) -> str:
+    """base_dir: storage_base(), resolved up front by generators that outlive the request context."""
+    if os.path.isabs(file_path):
+        return file_path
+    return os.path.join(base_dir or storage_base(), file_path)
+
+def image_max_pixels() -> int:
+    return int(app.config["IMAGE_MAX_MEGAPIXELS"] * 1_000_000)
+
+def image_too_large(e: ImageTooLarge):
+    return jsonify({"error": f"Bild zu groß: {e}"}), 400
+
+def pdf_image_cache() -> Optional[ImageCache]:
+    cache_dir = app.config["PDF_IMAGE_CACHE_DIR"]
+    if not cache_dir:
+        return None
+    return ImageCache(cache_dir, app.config["PDF_IMAGE_MAX_PX"], max_bytes=app.config["PDF_IMAGE_CACHE_MAX_MB"] * 1024 * 1024)
+
+def emit_event(store, event_type: str, project_id: Optional[str], data: dict, audience: Optional[List[str]] = None) -> dict:
+    """Record an SSE event in the current transaction; publish it with publish_changes after commit."""
+    event = record_event(store, event_type, project_id, data, audience=audience,
+                         retention_days=app.config["CHANGE_LOG_RETENTION_DAYS"])
+    event["tenant"] = tenants.current_name(app.config)
+    return event
+
+def publish_changes(*events: dict) -> None:
+    """Call after commit: drop cached dashboards and push the recorded events to SSE clients."""
+    dashboard_cache.invalidate(tenants.current_name(app.config))
+    broker.publish(*events)
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -54,15 +236,239 @@ app.config["MAX_CONTENT_LENGTH"] = Config.MAX_CONTENT_LENGTH
 
 # Dev-friendly CORS: allow frontend from LAN/localhost.
 CORS(app, resources={r"/api/*": {"origins": "*"}})
-
-ensure_upload_root(app.config["UPLOAD_ROOT"])
-init_db(app.config["DB_FILE"], os.path.join(BASE_DIR, "schema.sql"))
+init_instrumentation(app)
+
+tenants.check_config(app.config)
+if not tenants.enabled(app.config):
+    # tenant databases are migrated on first use (tenants.TenantRegistry)
+    ensure_upload_root(app.config["UPLOAD_ROOT"])
+    init_storage(app.config, BASE_DIR)
+
+@app.errorhandler(tenants.UnknownTenant)
+def unknown_tenant(_e):
+    return jsonify({"error": "Unbekannter Mandant"}), 404
+
+def preload_heavy_modules() -> None:
+    """Load the lazily imported libraries now (PRELOAD_HEAVY_MODULES, see gunicorn.conf.py)."""
+    preload_pdf_modules()
+    preload_image_modules()
+
+if app.config["PRELOAD_HEAVY_MODULES"]:
+    preload_heavy_modules()
+
+def get_store():
+    return tenants.open_request_store(app.config)
+
+def thaw_project(project_id: str) -> bool:
+    """Bring a cold-archived project's reports and photos back (own connection, commits)."""
+    store = get_store()
+    try:
+        return cold_archive.thaw(store, storage_config(), project_id, storage_base())
+    finally:
+        store.close()
+
+def ensure_hot(store, project):
+    """(store, project) with the project's reports in the hot tables. A cold project is restored
+    and then read from the primary: a snapshot/replica doesn't have the restored rows yet."""
+    if not project or not project["cold_at"]:
+        return store, project
+    store.close()
+    thaw_project(project["id"])
+    store = get_store()
+    return store, store.projects.get(project["id"])
+
+def restore_report(report_id: str) -> bool:
+    """True if the report belonged to a cold-archived project, which is now restored."""
+    project_id = cold_archive.project_of_report(storage_config(), report_id)
+    if not project_id:
+        return False
+    thaw_project(project_id)
+    return True
+
+def get_read_store():
+    """Store for heavy read-only work (exports, dashboard, timesheets): SQLite snapshot
+    (see read_snapshot.py) or the Postgres read replica."""
+    return tenants.open_request_store(app.config, read_only=True)
+
+def read_row(fetch: Callable):
+    """(store, row) with row = fetch(read store); falls back to the primary when the row is
+    newer than the snapshot/replica. The caller closes store."""
+    store = get_read_store()
+    row = fetch(store)
+    if row is None and store.stale:
+        store.close()
+        store = get_store()
+        row = fetch(store)
+    return store, row
+
+def tenant_option(fn):
+    """--tenant for CLI commands (required with TENANTS_DIR unless TENANT_DEFAULT is set)."""
+    @click.option("--tenant", default=None, help="Mandant (nur mit TENANTS_DIR)")
+    @functools.wraps(fn)
+    def wrapper(*args, tenant=None, **kwargs):
+        if tenant:
+            g.tenant_name = tenant
+        try:
+            tenants.current(app.config)
+        except tenants.UnknownTenant:
+            raise click.ClickException(f"Unbekannter Mandant: {tenant or '(keiner angegeben)'}")
+        return fn(*args, **kwargs)
+    return wrapper
+
+@app.cli.command("create-tenant")
+@click.argument("name")
+@click.option("--admin-user", default="admin", help="Benutzername des ersten Admins")
+@click.option("--admin-password", prompt=True, hide_input=True, confirmation_prompt=True)
+def create_tenant_command(name, admin_user, admin_password):
+    """Create a tenant directory with a migrated database and a first admin."""
+    if not tenants.enabled(app.config):
+        raise click.ClickException("TENANTS_DIR ist nicht gesetzt")
+    if not tenants.TENANT_NAME_RE.match(name):
+        raise click.ClickException("Name: Kleinbuchstaben, Ziffern, - und _ (max. 63 Zeichen)")
+    os.makedirs(tenants.tenant_dir(app.config, name), exist_ok=True)
+    g.tenant_name = name
+    store = get_store()
+    try:
+        if store.users.by_username(admin_user):
+            raise click.ClickException(f"Benutzer {admin_user} existiert bereits")
+        store.execute(
+            "INSERT INTO users (id, username, name, password_hash, role, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (str(uuid.uuid4()), admin_user, "Admin", hash_password(admin_password), "admin", iso_now())
+        )
+        store.commit()
+    finally:
+        store.close()
+    print(f"Mandant {name} angelegt: {tenants.tenant_dir(app.config, name)}")
+
+@app.cli.command("reconcile-project-stats")
+@tenant_option
+def reconcile_project_stats_command():
+    """Recompute denormalized reports_count/images_count/last_report_at."""
+    store = get_store()
+    n = store.reconcile_project_stats()
+    store.close()
+    print(f"{n} Projekte aktualisiert.")
+
+@app.cli.command("rebuild-report-tags")
+@tenant_option
+def rebuild_report_tags_command():
+    """Refill report_tags from reports.quick_actions."""
+    store = get_store()
+    n = store.rebuild_report_tags()
+    store.close()
+    print(f"{n} Schnellaktionen indiziert.")
+
+@app.cli.command("hash-photos")
+@tenant_option
+def hash_photos_command():
+    """Compute the perceptual hash of photos uploaded before hashing existed."""
+    store = get_store()
+    hashed = after_id = 0
+    try:
+        while True:
+            rows = store.images.unhashed(after_id, 200)
+            if not rows:
+                break
+            for r in rows:
+                phash = photo_hash(full_path(r["file_path"]))
+                if phash is not None:
+                    store.images.set_hash(r["id"], phash)
+                    hashed += 1
+            after_id = rows[-1]["id"]
+            store.commit()
+    finally:
+        store.close()
+    photo_index.invalidate()
+    print(f"{hashed} Fotos gehasht.")
+
+@app.cli.command("export-projects")
+@click.option("--out", "out_path", required=True, help="Zieldatei: .pdf (alles in einer Datei) oder .zip (ein PDF pro Projekt)")
+@click.option("--project", "project_ids", multiple=True, help="Nur diese Projekt-IDs (mehrfach möglich)")
+@click.option("--status", help="Nur Projekte mit diesem Status")
+@click.option("--month", help="Nur Berichte aus diesem Monat (JJJJ-MM)")
+@click.option("--workers", type=int, default=None, help="Prozesse (Standard: PDF_EXPORT_WORKERS bzw. CPU-Kerne)")
+@tenant_option
+def export_projects_command(out_path, project_ids, status, month, workers):
+    """Batch PDF export of many projects (e.g. month-end archive)."""
+    def select(projects):
+        if project_ids:
+            projects = [p for p in projects if p["id"] in set(project_ids)]
+        if status:
+            projects = [p for p in projects if p["status"] == status]
+        return projects
+
+    store = get_read_store()
+    cold = [p["id"] for p in select(store.projects.list_visible()) if p["cold_at"]]
+    if cold:
+        # restored projects are only in the primary until the next snapshot
+        store.close()
+        for project_id in cold:
+            thaw_project(project_id)
+        store = get_store()
+    try:
+        projects = select(store.projects.list_visible())
+        n = export_projects(
+            store, projects, out_path, storage_base(),
+            workers=app.config["PDF_EXPORT_WORKERS"] if workers is None else workers,
+            chunk_size=app.config["PDF_EXPORT_CHUNK_REPORTS"],
+            month=month,
+            cache_dir=app.config["PDF_IMAGE_CACHE_DIR"] or None,
+            max_px=app.config["PDF_IMAGE_MAX_PX"],
+            cache_max_bytes=app.config["PDF_IMAGE_CACHE_MAX_MB"] * 1024 * 1024,
+        )
+    finally:
+        store.close()
+    print(f"{n} Projekte exportiert." if n else "Keine Projekte/Berichte für den Export gefunden.")
+
+@app.cli.command("archive-cold-projects")
+@click.option("--days", type=int, default=None, help="Unverändert seit so vielen Tagen (Standard: ARCHIVE_COLD_AFTER_DAYS)")
+@click.option("--project", "project_ids", multiple=True, help="Nur diese Projekt-IDs, unabhängig vom Alter (mehrfach möglich)")
+@tenant_option
+def archive_cold_projects_command(days, project_ids):
+    """Move reports and photos of archived, inactive projects to the cold archive."""
+    if project_ids:
+        inactive_before = "9999"
+    else:
+        days = app.config["ARCHIVE_COLD_AFTER_DAYS"] if days is None else days
+        inactive_before = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).isoformat() + "Z"
+    store = get_store()
+    moved = 0
+    try:
+        for project_id in store.projects.cold_candidates(inactive_before):
+            if project_ids and project_id not in project_ids:
+                continue
+            result = cold_archive.freeze(store, storage_config(), project_id, storage_base())
+            if result:
+                moved += 1
+                print(f"{project_id}: {result[0]} Berichte, {result[1]} Fotos")
+    finally:
+        store.close()
+    print(f"{moved} Projekte ins Archiv verschoben.")
+
+@app.get("/tenants/<tenant>/uploads/<path:subpath>")
+def serve_tenant_uploads(tenant: str, subpath: str):
+    if not tenants.enabled(app.config):
+        abort(404)
+    g.tenant_name = tenant
+    return serve_uploads(subpath)
 
 @app.get("/uploads/<path:subpath>")
 def serve_uploads(subpath: str):
-    full = os.path.join(BASE_DIR, app.config["UPLOAD_ROOT"], subpath)
+    full = os.path.join(storage_base(), storage_config()["UPLOAD_ROOT"], subpath)
     if not os.path.exists(full):
-        abort(404)
+        # photo of a project in the cold archive: read from its pack, not restored
+        project_id, _, member = subpath.partition("/")
+        data = cold_archive.read_photo(storage_config(), project_id, member) if member else None
+        if data is None:
+            abort(404)
+        return send_file(io.BytesIO(data), mimetype=mimetypes.guess_type(member)[0] or "application/octet-stream",
+                         download_name=os.path.basename(member))
+    if AVATAR_NAME_RE.match(os.path.basename(full)):
+        # content-hashed name: a new avatar gets a new URL
+        resp = send_file(full, max_age=365 * 24 * 3600)
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+        return resp
     return send_file(full)
 
 # -----------------------
@@ -77,41 +483,109 @@ def login():
     if not username or not password:
         return jsonify({"error": "Username und Passwort erforderlich"}), 400
 
-    conn = get_db(app.config["DB_FILE"])
-    user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
-    if not user or not check_password_hash(user["password_hash"], password):
-        conn.close()
+    max_failures = app.config["LOGIN_MAX_FAILURES"]
+    window = app.config["LOGIN_WINDOW_SECONDS"]
+    # per tenant: the same username exists in every company
+    throttle_key = f"{tenants.current_name(app.config) or ''}/{username}"
+    wait = login_throttle.retry_after(throttle_key, max_failures, window)
+    if wait:
+        resp = jsonify({"error": "Zu viele Fehlversuche, bitte später erneut versuchen"})
+        resp.headers["Retry-After"] = str(wait)
+        return resp, 429
+
+    store = get_store()
+    user = store.users.by_username(username)
+    if not user:
+        store.close()
+        login_throttle.record_failure(throttle_key)
+        return jsonify({"error": "Ungültige Anmeldedaten"}), 401
+
+    try:
+        ok, needs_rehash = verify_password(user["password_hash"], password)
+    except HashPoolBusy:
+        store.close()
+        resp = jsonify({"error": "Server ausgelastet, bitte erneut versuchen"})
+        resp.headers["Retry-After"] = "1"
+        return resp, 503
+    if ok and needs_rehash:
+        # best effort: the password is verified, a busy pool just keeps the old hash until next login
+        try:
+            new_hash = hash_password(password)
+        except HashPoolBusy:
+            new_hash = None
+        if new_hash:
+            store.users.set_password_hash(user["id"], new_hash)
+            store.commit()
+            note_rehash(new_hash)
+    if not ok:
+        store.close()
+        login_throttle.record_failure(throttle_key)
         return jsonify({"error": "Ungültige Anmeldedaten"}), 401
+    login_throttle.reset(throttle_key)
 
-    token = create_token(user["id"])
-    assigned = get_assigned_projects(conn, user["id"]) if user["role"] == "worker" else []
-    avatar_url = get_avatar_url(conn, user["id"])
-    conn.close()
+    token = create_token(user["id"], user["role"])
+    refresh_token = issue_refresh_token(store, user["id"])
+    store.commit()
+    assigned = store.projects.assigned_to(user["id"]) if user["role"] == "worker" else []
+    store.close()
 
     return jsonify({
         "token": token,
+        "refreshToken": refresh_token,
+        "expiresIn": app.config["ACCESS_TOKEN_MINUTES"] * 60,
         "user": {
             "id": user["id"],
             "username": user["username"],
             "name": user["name"] or user["username"],
             "role": user["role"],
             "assignedProjects": assigned,
-            "avatarUrl": avatar_url
+            **avatar_fields(user["avatar_path"])
         }
     }), 200
 
+@app.post("/api/auth/refresh")
+def refresh():
+    data = request.get_json(silent=True) or {}
+    raw = (data.get("refreshToken") or "").strip()
+    if not raw:
+        return jsonify({"error": "refreshToken erforderlich"}), 400
+
+    store = get_store()
+    user_id, new_raw = rotate_refresh_token(store, raw)
+    store.commit()
+    user = store.users.get(user_id) if user_id else None
+    store.close()
+    if not user:
+        return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
+
+    return jsonify({
+        "token": create_token(user["id"], user["role"]),
+        "refreshToken": new_raw,
+        "expiresIn": app.config["ACCESS_TOKEN_MINUTES"] * 60
+    }), 200
+
+@app.post("/api/auth/logout")
+def logout():
+    data = request.get_json(silent=True) or {}
+    raw = (data.get("refreshToken") or "").strip()
+    if raw:
+        store = get_store()
+        revoke_refresh_token(store, raw)
+        store.commit()
+        store.close()
+    return jsonify({"ok": True}), 200
+
 @app.get("/api/auth/me")
 @token_required
 def me(current_user_id: str):
-    conn = get_db(app.config["DB_FILE"])
-    user = conn.execute("SELECT id, username, name, role, avatar_path FROM users WHERE id = ?", (current_user_id,)).fetchone()
+    store = get_store()
+    user = store.users.get(current_user_id)
     if not user:
-        conn.close()
+        store.close()
         return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
 
-    assigned = get_assigned_projects(conn, user["id"]) if user["role"] == "worker" else []
-    avatar_url = make_upload_url(user["avatar_path"]) if user["avatar_path"] else None
-    conn.close()
+    assigned = store.projects.assigned_to(user["id"]) if user["role"] == "worker" else []
+    store.close()
 
     return jsonify({
         "id": user["id"],
@@ -119,7 +593,7 @@ def me(current_user_id: str):
         "name": user["name"] or user["username"],
         "role": user["role"],
         "assignedProjects": assigned,
-        "avatarUrl": avatar_url
+        **avatar_fields(user["avatar_path"])
     }), 200
 
 # -----------------------
@@ -127,6 +601,7 @@ def me(current_user_id: str):
 # -----------------------
 @app.put("/api/users/me/avatar")
 @token_required
+@admit("upload")
 def update_avatar(current_user_id: str):
     if "avatar" not in request.files:
         return jsonify({"error": "avatar fehlt"}), 400
@@ -140,21 +615,25 @@ def update_avatar(current_user_id: str):
     if ext not in [".jpg", ".jpeg", ".png", ".webp"]:
         return jsonify({"error": "Nur jpg/png/webp erlaubt"}), 400
 
-    avatars_dir = os.path.join(app.config["UPLOAD_ROOT"], "avatars")
-    os.makedirs(avatars_dir, exist_ok=True)
+    avatars_dir = os.path.join(storage_config()["UPLOAD_ROOT"], "avatars")
+    try:
+        with timed("image"):
+            variants = save_avatar(avatars_dir, f.stream, current_user_id, max_pixels=image_max_pixels())
+    except ImageTooLarge as e:
+        return image_too_large(e)
+    except Exception:
+        return jsonify({"error": "Bild konnte nicht verarbeitet werden"}), 400
 
-    out_name = f"{current_user_id}{ext}"
-    full_path = os.path.join(avatars_dir, out_name)
-    f.save(full_path)
+    rel = _rel_from_base(variants[DEFAULT_AVATAR_SIZE])
 
-    rel = _rel_from_base(full_path)
+    store = get_store()
+    store.users.set_avatar(current_user_id, rel)
+    store.commit()
+    store.close()
 
-    conn = get_db(app.config["DB_FILE"])
-    conn.execute("UPDATE users SET avatar_path = ? WHERE id = ?", (rel, current_user_id))
-    conn.commit()
-    conn.close()
+    remove_stale_avatars(avatars_dir, current_user_id, keep=list(variants.values()))
 
-    return jsonify({"avatarUrl": make_upload_url(rel)}), 200
+    return jsonify(avatar_fields(rel)), 200
 
 
 @app.get("/api/users")
@@ -162,8 +641,8 @@ def update_avatar(current_user_id: str):
 def list_users(current_user_id: str):
     if not require_admin(current_user_id):
         return jsonify({"error": "Keine Berechtigung"}), 403
-    conn = get_db(app.config["DB_FILE"])
-    rows = conn.execute("SELECT id, username, name, role, avatar_path FROM users ORDER BY created_at DESC").fetchall()
+    store = get_store()
+    rows = store.users.list_all()
     out = []
     for u in rows:
         out.append({
@@ -171,9 +650,9 @@ def list_users(current_user_id: str):
             "username": u["username"],
             "name": u["name"] or u["username"],
             "role": u["role"],
-            "avatarUrl": make_upload_url(u["avatar_path"]) if u["avatar_path"] else None
+            **avatar_fields(u["avatar_path"])
         })
-    conn.close()
+    store.close()
     return jsonify(out), 200
 
 
@@ -183,128 +662,121 @@ def list_users(current_user_id: str):
 @app.get("/api/projects")
 @token_required
 def get_projects(current_user_id: str):
-    conn = get_db(app.config["DB_FILE"])
-    user = conn.execute("SELECT role FROM users WHERE id = ?", (current_user_id,)).fetchone()
-    if not user:
-        conn.close()
+    store = get_store()
+    role = current_role(current_user_id, store)
+    if not role:
+        store.close()
         return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
 
-    base_select = """
-        SELECT p.*,
-               (SELECT COUNT(*) FROM reports r WHERE r.project_id = p.id) AS reports_count
-        FROM projects p
-    """
+    projects = store.projects.list_visible(None if role == "admin" else current_user_id)
+    workers = store.projects.workers_by_project([p["id"] for p in projects])
+    result = [project_to_json(p, workers[p["id"]]) for p in projects]
 
-    if user["role"] == "admin":
-        projects = conn.execute(base_select + " ORDER BY p.created_at DESC").fetchall()
-    else:
-        projects = conn.execute(base_select + """
-            JOIN project_assignments pa ON p.id = pa.project_id
-            WHERE pa.user_id = ?
-            ORDER BY p.created_at DESC
-        """, (current_user_id,)).fetchall()
-
-    result = []
-    for p in projects:
-        workers = get_assigned_workers(conn, p["id"])
-        result.append({
-            "id": p["id"],
-            "name": p["name"],
-            "address": p["address"],
-            "customerName": p["customer_name"],
-            "status": p["status"],
-            "createdAt": p["created_at"],
-            "updatedAt": p["updated_at"],
-            "description": p["description"],
-            "imageUrl": p["image_url"],
-            "reportsCount": int(p["reports_count"] or 0),
-            "assignedWorkers": workers
-        })
-
-    conn.close()
+    store.close()
     return jsonify(result), 200
 
 @app.get("/api/projects/<project_id>")
 @token_required
 def get_project(current_user_id: str, project_id: str):
-    conn = get_db(app.config["DB_FILE"])
-    project = conn.execute("""
-        SELECT p.*,
-               (SELECT COUNT(*) FROM reports r WHERE r.project_id = p.id) AS reports_count
-        FROM projects p
-        WHERE p.id = ?
-    """, (project_id,)).fetchone()
+    store = get_store()
+    project = store.projects.get(project_id)
     if not project:
-        conn.close()
+        store.close()
         return jsonify({"error": "Projekt nicht gefunden"}), 404
 
-    user = conn.execute("SELECT role FROM users WHERE id = ?", (current_user_id,)).fetchone()
-    if not user:
-        conn.close()
+    role = current_role(current_user_id, store)
+    if not role:
+        store.close()
         return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
 
-    if user["role"] == "worker":
-        assigned = conn.execute(
-            "SELECT 1 FROM project_assignments WHERE project_id = ? AND user_id = ?",
-            (project_id, current_user_id)
-        ).fetchone()
-        if not assigned:
-            conn.close()
-            return jsonify({"error": "Kein Zugriff auf dieses Projekt"}), 403
+    if role == "worker" and not store.projects.is_assigned(project_id, current_user_id):
+        store.close()
+        return jsonify({"error": "Kein Zugriff auf dieses Projekt"}), 403
 
-    workers = get_assigned_workers(conn, project_id)
-
-    reports_raw = conn.execute("""
-        SELECT r.*, u.username, u.name
-        FROM reports r
-        JOIN users u ON r.user_id = u.id
-        WHERE r.project_id = ?
-        ORDER BY r.created_at DESC
-    """, (project_id,)).fetchall()
-
-    reports = []
-    for r in reports_raw:
-        imgs = conn.execute("SELECT file_path FROM report_images WHERE report_id = ?", (r["id"],)).fetchall()
-        img_urls = [make_upload_url(img["file_path"]) for img in imgs]
-        qas = []
-        if r["quick_actions"]:
-            try:
-                qas = json.loads(r["quick_actions"])
-            except Exception:
-                qas = []
-        reports.append({
-            "id": r["id"],
-            "projectId": r["project_id"],
-            "userId": r["user_id"],
-            "userName": (r["name"] or r["username"]),
-            "text": r["text"],
-            "images": img_urls,
-            "quickActions": qas,
-            "weather": r["weather"],
-            "workersPresent": r["workers_present"],
-            "startTime": r["start_time"],
-            "endTime": r["end_time"],
-            "breakMinutes": r["break_minutes"],
-            "createdAt": r["created_at"]
-        })
+    store, project = ensure_hot(store, project)
+    workers = store.projects.workers(project_id)
 
-    payload = {
-        "id": project["id"],
-        "name": project["name"],
-        "address": project["address"],
-        "customerName": project["customer_name"],
-        "status": project["status"],
-        "createdAt": project["created_at"],
-        "updatedAt": project["updated_at"],
-        "description": project["description"],
-        "imageUrl": project["image_url"],
-        "reportsCount": int(project["reports_count"] or 0),
-        "assignedWorkers": workers,
-        "reports": reports
-    }
-    conn.close()
+    reports = reports_to_json(store, store.reports.chunks(project_id=project_id, tags=requested_tags()),
+                              with_project=False)
+
+    payload = project_to_json(project, workers)
+    payload["reports"] = reports
+    store.close()
     return jsonify(payload), 200
 
+PHOTO_QUERY_LIMIT = 1000
+SIMILAR_PHOTOS_LIMIT = 20
+
+def similar_photos(store, project, hashes: List[Optional[int]], max_distance: int,
+                   exclude: Tuple[int, ...] = ()) -> List[List[dict]]:
+    """Per hash: the project's stored photos within max_distance bits (photo_to_json + reportId
+    and distance), closest first. Answered from the in-memory index (photo_index.py)."""
+    key = (tenants.current_name(app.config), project["id"])
+    queries = [h for h in hashes if h is not None]
+    for _ in range(2):
+        hits = photo_index.search(
+            key, project_stamp(project), lambda: store.images.hashes_for_project(project["id"]), queries,
+            max_distance, limit=SIMILAR_PHOTOS_LIMIT + len(exclude), max_projects=app.config["PHOTO_INDEX_PROJECTS"]
+        )
+        hit_ids = {i for found in hits for i, _ in found}
+        rows = {r["id"]: r for r in store.images.photos_by_ids(sorted(hit_ids))}
+        if len(rows) == len(hit_ids):
+            break
+        # rows gone behind an unchanged stamp (a cold archive round trip renumbers them): reload
+        photo_index.invalidate(key)
+    found_by_hash = iter(hits)
+    out = []
+    for h in hashes:
+        found = next(found_by_hash) if h is not None else []
+        out.append([
+            {"reportId": rows[i]["report_id"], "distance": d, **photo_to_json(rows[i])}
+            for i, d in found if i in rows and i not in exclude
+        ][:SIMILAR_PHOTOS_LIMIT])
+    return out
+
+def _max_distance_arg() -> int:
+    value = _int_or_none(request.args.get("maxDistance"))
+    return app.config["PHOTO_DUPLICATE_DISTANCE"] if value is None else max(0, min(value, 32))
+
+@app.get("/api/projects/<project_id>/photos")
+@token_required
+def project_photos(current_user_id: str, project_id: str):
+    """Photos of a project by capture time (?from=, ?to=, ISO date or date-time, camera local time)
+    and/or area (?bbox=minLat,minLon,maxLat,maxLon). Only photos with that metadata match."""
+    captured_from = (request.args.get("from") or "").strip() or None
+    captured_to = (request.args.get("to") or "").strip() or None
+    if captured_to and len(captured_to) == 10:
+        captured_to += "T23:59:59"  # a date includes the whole day
+    bbox = None
+    if request.args.get("bbox"):
+        try:
+            bbox = tuple(float(v) for v in request.args["bbox"].split(","))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+            return jsonify({"error": "bbox erwartet minLat,minLon,maxLat,maxLon"}), 400
+    limit = max(1, min(_int_or_none(request.args.get("limit")) or PHOTO_QUERY_LIMIT, PHOTO_QUERY_LIMIT))
+
+    store = get_store()
+    project = store.projects.get(project_id)
+    if not project:
+        store.close()
+        return jsonify({"error": "Projekt nicht gefunden"}), 404
+
+    role = current_role(current_user_id, store)
+    if not role:
+        store.close()
+        return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
+
+    if role == "worker" and not store.projects.is_assigned(project_id, current_user_id):
+        store.close()
+        return jsonify({"error": "Kein Zugriff auf dieses Projekt"}), 403
+
+    store, project = ensure_hot(store, project)
+    rows = store.images.for_project(project_id, captured_from, captured_to, bbox, limit)
+    store.close()
+    return jsonify({"photos": [{"reportId": r["report_id"], **photo_to_json(r)} for r in rows]}), 200
+
 @app.post("/api/projects")
 @token_required
 def create_project(current_user_id: str):
@@ -318,28 +790,28 @@ def create_project(current_user_id: str):
     description = (data.get("description") or "").strip() or None
     image_url = (data.get("imageUrl") or "").strip() or None
     status = (data.get("status") or "active").strip()
-    assigned = data.get("assignedWorkers") or []
+    assigned = normalize_worker_ids(data.get("assignedWorkers") or [])
 
     if status not in ("active", "paused", "completed", "archived"):
         status = "active"
 
     if not name or not address or not customer:
         return jsonify({"error": "name, address und customerName sind erforderlich"}), 400
+    if assigned is None:
+        return jsonify({"error": "assignedWorkers muss eine Liste von IDs sein"}), 400
 
     project_id = str(uuid.uuid4())
     now = iso_now()
-    conn = get_db(app.config["DB_FILE"])
-    conn.execute(
-        "INSERT INTO projects (id, name, address, customer_name, status, created_at, description, image_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-        (project_id, name, address, customer, status, now, description, image_url)
-    )
-    for worker_id in assigned:
-        conn.execute(
-            "INSERT OR IGNORE INTO project_assignments (project_id, user_id) VALUES (?, ?)",
-            (project_id, worker_id)
-        )
-    conn.commit()
-    conn.close()
+    store = get_store()
+    unknown = store.users.unknown_ids(assigned)
+    if unknown:
+        store.close()
+        return jsonify({"error": "Unbekannte Benutzer", "unknownUsers": unknown}), 400
+    store.projects.create(project_id, name, address, customer, status, now, description, image_url)
+    store.projects.add_workers(project_id, assigned)
+    store.commit()
+    store.close()
+    publish_changes()
 
     return jsonify({
         "id": project_id,
@@ -351,7 +823,9 @@ def create_project(current_user_id: str):
         "description": description,
         "imageUrl": image_url,
         "reportsCount": 0,
-        "assignedWorkers": list(assigned)
+        "imagesCount": 0,
+        "lastReportAt": None,
+        "assignedWorkers": assigned
     }), 201
 
 @app.patch("/api/projects/<project_id>")
@@ -367,88 +841,124 @@ def patch_project(current_user_id: str, project_id: str):
     if not updates:
         return jsonify({"error": "Keine Änderungen"}), 400
 
-    conn = get_db(app.config["DB_FILE"])
-    proj = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+    store = get_store()
+    proj = store.projects.get(project_id)
     if not proj:
-        conn.close()
+        store.close()
         return jsonify({"error": "Projekt nicht gefunden"}), 404
 
-    fields = []
-    params = []
-
-    if "name" in updates and updates["name"] is not None:
-        fields.append("name = ?")
-        params.append(str(updates["name"]).strip())
-    if "address" in updates and updates["address"] is not None:
-        fields.append("address = ?")
-        params.append(str(updates["address"]).strip())
-    if "customerName" in updates and updates["customerName"] is not None:
-        fields.append("customer_name = ?")
-        params.append(str(updates["customerName"]).strip())
+    values = {}
+
+    for key in ("name", "address", "customerName"):
+        if key in updates and updates[key] is not None:
+            values[key] = str(updates[key]).strip()
     if "status" in updates and updates["status"] is not None:
         st = str(updates["status"]).strip()
         if st not in ("active", "paused", "completed", "archived"):
             st = proj["status"]
-        fields.append("status = ?")
-        params.append(st)
-    if "description" in updates:
-        desc = updates["description"]
-        fields.append("description = ?")
-        params.append((str(desc).strip() if desc is not None and str(desc).strip() else None))
-    if "imageUrl" in updates:
-        iu = updates["imageUrl"]
-        fields.append("image_url = ?")
-        params.append((str(iu).strip() if iu is not None and str(iu).strip() else None))
+        values["status"] = st
+    if proj["cold_at"] and values.get("status", "archived") != "archived":
+        # un-archived: reports and photos come back from the cold archive first
+        thaw_project(project_id)
+    for key in ("description", "imageUrl"):
+        if key in updates:
+            v = updates[key]
+            values[key] = str(v).strip() if v is not None and str(v).strip() else None
 
     if "assignedWorkers" in updates and updates["assignedWorkers"] is not None:
-        conn.execute("DELETE FROM project_assignments WHERE project_id = ?", (project_id,))
-        for uid in updates["assignedWorkers"]:
-            conn.execute(
-                "INSERT OR IGNORE INTO project_assignments (project_id, user_id) VALUES (?, ?)",
-                (project_id, uid)
-            )
+        workers = normalize_worker_ids(updates["assignedWorkers"])
+        if workers is None:
+            store.close()
+            return jsonify({"error": "assignedWorkers muss eine Liste von IDs sein"}), 400
+        unknown = store.users.unknown_ids(workers)
+        if unknown:
+            store.close()
+            return jsonify({"error": "Unbekannte Benutzer", "unknownUsers": unknown}), 400
+        _, removed = store.projects.sync_assignments({project_id: workers})
+        previous_workers = [uid for _, uid in removed]
+    else:
+        previous_workers = []
 
-    fields.append("updated_at = ?")
-    params.append(iso_now())
+    values["updatedAt"] = iso_now()
+    store.projects.update(project_id, values)
 
-    params.append(project_id)
-    conn.execute(f"UPDATE projects SET {', '.join(fields)} WHERE id = ?", params)
-    conn.commit()
+    row = store.projects.get(project_id)
+    workers = store.projects.workers(project_id)
+    payload = project_to_json(row, workers)
+    # workers who just lost the project still get told about it
+    event = emit_event(store, "project.updated", project_id, {"project": payload}, audience=workers + previous_workers)
+    store.commit()
+    store.close()
+    publish_changes(event)
 
-    row = conn.execute("""
-        SELECT p.*, (SELECT COUNT(*) FROM reports r WHERE r.project_id = p.id) AS reports_count
-        FROM projects p WHERE p.id = ?
-    """, (project_id,)).fetchone()
-    workers = get_assigned_workers(conn, project_id)
-    conn.close()
+    return jsonify(payload), 200
 
-    return jsonify({
-        "id": row["id"],
-        "name": row["name"],
-        "address": row["address"],
-        "customerName": row["customer_name"],
-        "status": row["status"],
-        "createdAt": row["created_at"],
-        "updatedAt": row["updated_at"],
-        "description": row["description"],
-        "imageUrl": row["image_url"],
-        "reportsCount": int(row["reports_count"] or 0),
-        "assignedWorkers": workers
-    }), 200
+@app.put("/api/projects/assignments")
+@token_required
+def bulk_assign_projects(current_user_id: str):
+    """Replace the worker lists of many projects at once: {"assignments": {projectId: [userId, ...]}}."""
+    if not require_admin(current_user_id):
+        return jsonify({"error": "Keine Berechtigung"}), 403
+
+    data = request.get_json(silent=True) or {}
+    raw = data.get("assignments")
+    if not isinstance(raw, dict) or not raw:
+        return jsonify({"error": "assignments (Projekt -> Mitarbeiterliste) erforderlich"}), 400
+
+    mapping: Dict[str, List[str]] = {}
+    for pid, workers in raw.items():
+        normalized = normalize_worker_ids(workers)
+        if normalized is None:
+            return jsonify({"error": f"Ungültige Mitarbeiterliste für Projekt {pid}"}), 400
+        mapping[pid] = normalized
+
+    store = get_store()
+    missing = store.projects.missing(mapping)
+    if missing:
+        store.close()
+        return jsonify({"error": "Projekt nicht gefunden", "unknownProjects": missing}), 404
+
+    unknown = store.users.unknown_ids(uid for workers in mapping.values() for uid in workers)
+    if unknown:
+        store.close()
+        return jsonify({"error": "Unbekannte Benutzer", "unknownUsers": unknown}), 400
+
+    try:
+        added, removed = store.projects.sync_assignments(mapping)
+        store.projects.touch(mapping, iso_now())
+        removed_by_project: Dict[str, List[str]] = {}
+        for pid, uid in removed:
+            removed_by_project.setdefault(pid, []).append(uid)
+        events = [
+            emit_event(store, "project.assignments_changed", pid,
+                       {"id": pid, "assignedWorkers": mapping[pid]},
+                       audience=mapping[pid] + removed_by_project.get(pid, []))
+            for pid in sorted({pid for pid, _ in added} | set(removed_by_project))
+        ]
+        store.commit()
+    except Exception:
+        store.rollback()
+        store.close()
+        raise
+    store.close()
+    publish_changes(*events)
+
+    return jsonify({"added": len(added), "removed": len(removed), "projects": mapping}), 200
 
 @app.post("/api/projects/<project_id>/archive")
 @token_required
 def archive_project(current_user_id: str, project_id: str):
     if not require_admin(current_user_id):
         return jsonify({"error": "Keine Berechtigung"}), 403
-    conn = get_db(app.config["DB_FILE"])
-    row = conn.execute("SELECT id FROM projects WHERE id = ?", (project_id,)).fetchone()
-    if not row:
-        conn.close()
+    store = get_store()
+    if not store.projects.exists(project_id):
+        store.close()
         return jsonify({"error": "Projekt nicht gefunden"}), 404
-    conn.execute("UPDATE projects SET status = ?, updated_at = ? WHERE id = ?", ("archived", iso_now(), project_id))
-    conn.commit()
-    conn.close()
+    store.projects.update(project_id, {"status": "archived", "updatedAt": iso_now()})
+    event = emit_event(store, "project.archived", project_id, {"id": project_id, "status": "archived"})
+    store.commit()
+    store.close()
+    publish_changes(event)
     return jsonify({"ok": True}), 200
 
 @app.delete("/api/projects/<project_id>")
@@ -456,16 +966,47 @@ def archive_project(current_user_id: str, project_id: str):
 def delete_project(current_user_id: str, project_id: str):
     if not require_admin(current_user_id):
         return jsonify({"error": "Keine Berechtigung"}), 403
-    conn = get_db(app.config["DB_FILE"])
-    row = conn.execute("SELECT id FROM projects WHERE id = ?", (project_id,)).fetchone()
-    if not row:
-        conn.close()
+    store = get_store()
+    if not store.projects.exists(project_id):
+        store.close()
         return jsonify({"error": "Projekt nicht gefunden"}), 404
-    conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
-    conn.commit()
-    conn.close()
+    # record first: the audience comes from assignments that the delete cascades away
+    event = emit_event(store, "project.deleted", project_id, {"id": project_id})
+    store.projects.delete(project_id)
+    store.commit()
+    store.close()
+    cold_archive.drop(storage_config(), project_id)
+    publish_changes(event)
     return jsonify({"ok": True}), 200
 
+# -----------------------
+# Dashboard
+# -----------------------
+@app.get("/api/dashboard")
+@token_required
+def get_dashboard(current_user_id: str):
+    store = get_store()
+    try:
+        role = current_role(current_user_id, store)
+        stamp = data_stamp(store)
+    finally:
+        store.close()
+    if not role:
+        return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
+    is_admin = role == "admin"
+
+    def compute() -> dict:
+        store = get_read_store()
+        try:
+            return compute_dashboard(store, current_user_id, is_admin, app.config["DASHBOARD_DAYS"], project_to_json,
+                                     storage_config())
+        finally:
+            store.close()
+
+    key = (tenants.current_name(app.config), "admin") if is_admin else (tenants.current_name(app.config), "worker", current_user_id)
+    data = dashboard_cache.get_or_compute(key, app.config["DASHBOARD_CACHE_SECONDS"], compute, stamp)
+    return jsonify(data), 200
+
 # -----------------------
 # Reports
 # -----------------------
@@ -473,134 +1014,99 @@ def delete_project(current_user_id: str, project_id: str):
 @app.get("/api/reports")
 @token_required
 def list_reports(current_user_id: str):
-    conn = get_db(app.config["DB_FILE"])
-    user = conn.execute("SELECT role FROM users WHERE id = ?", (current_user_id,)).fetchone()
-    if not user:
-        conn.close()
+    role = current_role(current_user_id)
+    if not role:
         return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
-
-    base_sql = """
-        SELECT r.*, u.username, u.name, p.name AS project_name, p.address AS project_address
-        FROM reports r
-        JOIN users u ON u.id = r.user_id
-        JOIN projects p ON p.id = r.project_id
-    """
-
-    if user["role"] == "admin":
-        rows = conn.execute(base_sql + " ORDER BY r.created_at DESC").fetchall()
-    else:
-        rows = conn.execute(base_sql + """
-            JOIN project_assignments pa ON pa.project_id = p.id
-            WHERE pa.user_id = ?
-            ORDER BY r.created_at DESC
-        """, (current_user_id,)).fetchall()
-
-    reports = []
-    for r in rows:
-        imgs = conn.execute("SELECT file_path FROM report_images WHERE report_id = ?", (r["id"],)).fetchall()
-        img_urls = [make_upload_url(img["file_path"]) for img in imgs]
-        qas = []
-        if r["quick_actions"]:
-            try:
-                qas = json.loads(r["quick_actions"])
-            except Exception:
-                qas = []
-        reports.append({
-            "id": r["id"],
-            "projectId": r["project_id"],
-            "projectName": r["project_name"],
-            "projectAddress": r["project_address"],
-            "userId": r["user_id"],
-            "userName": (r["name"] or r["username"]),
-            "text": r["text"],
-            "images": img_urls,
-            "quickActions": qas,
-            "weather": r["weather"],
-            "workersPresent": r["workers_present"],
-            "startTime": r["start_time"],
-            "endTime": r["end_time"],
-            "breakMinutes": r["break_minutes"],
-            "createdAt": r["created_at"]
-        })
-
-    conn.close()
+    # ?snapshot=1: the admin timesheet reads the whole history and accepts slightly stale data.
+    # A worker's own list must show the report just submitted, so it stays on the primary.
+    store = get_read_store() if request.args.get("snapshot") == "1" and role == "admin" else get_store()
+
+    visible_to = None if role == "admin" else current_user_id
+    tags = requested_tags()
+    reports = reports_to_json(store, store.reports.chunks(visible_to=visible_to, tags=tags))
+    # ?archived=1: also the reports of cold-archived projects (history views); the default
+    # listing stays proportional to the hot tables
+    cold = cold_reports_to_json(store, visible_to, tags) if request.args.get("archived") == "1" else []
+    if cold:
+        # same order as the query: newest first
+        reports.extend(cold)
+        reports.sort(key=lambda r: (r["createdAt"], r["id"]), reverse=True)
+
+    store.close()
     return jsonify(reports), 200
 
+def readable_report(store, current_user_id: str, report_id: str):
+    """(report row, None) or (None, error response). A report of a cold-archived project is
+    restored only once the caller is known to have access to that project."""
+    role = current_role(current_user_id, store)
+    if not role:
+        return None, (jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401)
+    r = store.reports.get(report_id)
+    project_id = r["project_id"] if r else cold_archive.project_of_report(storage_config(), report_id)
+    if not project_id:
+        return None, (jsonify({"error": "Bericht nicht gefunden"}), 404)
+    if role == "worker" and not store.projects.is_assigned(project_id, current_user_id):
+        return None, (jsonify({"error": "Kein Zugriff"}), 403)
+    if not r:
+        thaw_project(project_id)
+        r = store.reports.get(report_id)
+        if not r:
+            return None, (jsonify({"error": "Bericht nicht gefunden"}), 404)
+    return r, None
+
 @app.get("/api/reports/<report_id>")
 @token_required
 def get_report(current_user_id: str, report_id: str):
-    conn = get_db(app.config["DB_FILE"])
-    r = conn.execute("""
-        SELECT r.*, u.username, u.name, p.name AS project_name, p.address AS project_address
-        FROM reports r
-        JOIN users u ON u.id = r.user_id
-        JOIN projects p ON p.id = r.project_id
-        WHERE r.id = ?
-    """, (report_id,)).fetchone()
-    if not r:
-        conn.close()
-        return jsonify({"error": "Bericht nicht gefunden"}), 404
-
-    user = conn.execute("SELECT role FROM users WHERE id = ?", (current_user_id,)).fetchone()
-    if not user:
-        conn.close()
-        return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
-
-    if user["role"] == "worker":
-        assigned = conn.execute(
-            "SELECT 1 FROM project_assignments WHERE project_id = ? AND user_id = ?",
-            (r["project_id"], current_user_id)
-        ).fetchone()
-        if not assigned:
-            conn.close()
-            return jsonify({"error": "Kein Zugriff"}), 403
-
-    imgs = conn.execute("SELECT file_path FROM report_images WHERE report_id = ?", (report_id,)).fetchall()
-    img_urls = [make_upload_url(img["file_path"]) for img in imgs]
-
-    qas = []
-    if r["quick_actions"]:
-        try:
-            qas = json.loads(r["quick_actions"])
-        except Exception:
-            qas = []
-
-    payload = {
-        "id": r["id"],
-        "projectId": r["project_id"],
-        "projectName": r["project_name"],
-        "projectAddress": r["project_address"],
-        "userId": r["user_id"],
-        "userName": (r["name"] or r["username"]),
-        "text": r["text"],
-        "images": img_urls,
-        "quickActions": qas,
-        "weather": r["weather"],
-        "workersPresent": r["workers_present"],
-        "startTime": r["start_time"],
-        "endTime": r["end_time"],
-        "breakMinutes": r["break_minutes"],
-        "createdAt": r["created_at"]
-    }
-    conn.close()
+    store = get_store()
+    r, error = readable_report(store, current_user_id, report_id)
+    if error:
+        store.close()
+        return error
+
+    photos = [photo_to_json(p) for p in store.images.photos_by_report([report_id])[report_id]]
+    payload = report_to_json(r, photos, store.reports.quick_actions([report_id])[report_id])
+    store.close()
     return jsonify(payload), 200
 
-@app.post("/api/reports")
+@app.get("/api/reports/<report_id>/similar-photos")
 @token_required
-def create_report(current_user_id: str):
-    data = request.get_json(silent=True) if request.is_json else request.form
-    if data is None:
-        data = {}
-    project_id = (data.get("projectId") or "").strip()
-    text = (data.get("text") or "").strip()
+def report_similar_photos(current_user_id: str, report_id: str):
+    """Per photo of the report: near-identical photos elsewhere in its project (?maxDistance=
+    differing bits of 64, default PHOTO_DUPLICATE_DISTANCE). No image file is read."""
+    store = get_store()
+    r, error = readable_report(store, current_user_id, report_id)
+    if error:
+        store.close()
+        return error
+
+    photos = store.images.photos_by_report([report_id])[report_id]
+    found = similar_photos(store, store.projects.get(r["project_id"]), [p["phash"] for p in photos],
+                           _max_distance_arg(), exclude=tuple(p["id"] for p in photos))
+    store.close()
+    return jsonify({"photos": [{**photo_to_json(p), "similar": s} for p, s in zip(photos, found)]}), 200
+
+def _int_or_none(value) -> Optional[int]:
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return int(value)
+    except Exception:
+        return None
+
+CLIENT_KEY_MAX_LENGTH = 100
+
+def _text_field(data, key: str) -> str:
+    value = data.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{key} muss ein Text sein")
+    return value.strip()
+
+def parse_report_fields(data) -> dict:
+    """Report fields from a JSON body, a form or one entry of a batch. Raises ValueError
+    (message for a 400) for values of the wrong type and an overlong clientKey."""
     quick_actions_raw = data.get("quickActions") or ""
-    weather = data.get("weather")
-    workers_present = data.get("workersPresent")
-    start_time = (data.get("startTime") or "").strip() or None
-    end_time = (data.get("endTime") or "").strip() or None
-    break_minutes = data.get("breakMinutes")
-    images = request.files.getlist("images") if not request.is_json else []
-
     qas_list = []
     if quick_actions_raw:
         if isinstance(quick_actions_raw, list):
@@ -612,147 +1118,310 @@ def create_report(current_user_id: str):
                     qas_list = []
             except Exception:
                 qas_list = []
+    # only non-empty strings end up in report_tags, keep the stored JSON identical
+    qas_list = [q.strip() for q in qas_list if isinstance(q, str) and q.strip()]
+    weather = data.get("weather")
+    if weather is not None and not isinstance(weather, str):
+        raise ValueError("weather muss ein Text sein")
+    client_key = data.get("clientKey")
+    client_key = (client_key.strip() or None) if isinstance(client_key, str) else None
+    if client_key and len(client_key) > CLIENT_KEY_MAX_LENGTH:
+        raise ValueError(f"clientKey zu lang: {client_key[:20]}…")
+    return {
+        "project_id": _text_field(data, "projectId"),
+        "text": _text_field(data, "text"),
+        "quick_actions": qas_list,
+        "weather": weather,
+        "workers_present": _int_or_none(data.get("workersPresent")),
+        "start_time": _text_field(data, "startTime") or None,
+        "end_time": _text_field(data, "endTime") or None,
+        "break_minutes": _int_or_none(data.get("breakMinutes")),
+        "client_key": client_key,
+    }
 
-    if not project_id or (not text and not qas_list):
+def insert_report(store, user, fields: dict, photos: List[Tuple[str, dict]]) -> Optional[Tuple[dict, List[dict]]]:
+    """Insert a report with its (already processed) photos, (relative path, metadata) each,
+    and record its events.
+    Returns (payload, events); None if the user already has a report with this clientKey."""
+    report_id = str(uuid.uuid4())
+    now = iso_now()
+    if not store.reports.create(report_id, fields["project_id"], user["id"], fields["text"],
+                                json.dumps(fields["quick_actions"], ensure_ascii=False), fields["weather"],
+                                fields["workers_present"], fields["start_time"], fields["end_time"],
+                                fields["break_minutes"], now, client_key=fields["client_key"]):
+        return None
+    store.images.add(report_id, photos)
+    photos_json = [photo_to_json({"file_path": rel, **meta}) for rel, meta in photos]
+    image_urls = [p["url"] for p in photos_json]
+
+    payload = {
+        "id": report_id,
+        "projectId": fields["project_id"],
+        "userId": user["id"],
+        "userName": (user["name"] or user["username"]),
+        "text": fields["text"],
+        "images": image_urls,
+        "photos": photos_json,
+        "quickActions": fields["quick_actions"],
+        "weather": fields["weather"],
+        "workersPresent": fields["workers_present"],
+        "startTime": fields["start_time"],
+        "endTime": fields["end_time"],
+        "breakMinutes": fields["break_minutes"],
+        "createdAt": now
+    }
+    events = [emit_event(store, "report.created", fields["project_id"], {"report": payload})]
+    if image_urls:
+        events.append(emit_event(store, "report.images_processed", fields["project_id"],
+                                 {"reportId": report_id, "images": image_urls},
+                                 audience=list(events[0]["audience"])))
+    return payload, events
+
+def submitted_reports_json(store, user_id: str, client_keys: List[str]) -> Dict[str, dict]:
+    """Reports already stored under these clientKeys, serialized like a fresh POST response."""
+    rows = store.reports.by_client_keys(user_id, client_keys)
+    ids = [r["id"] for r in rows.values()]
+    photos = store.images.photos_by_report(ids)
+    quick_actions = store.reports.quick_actions(ids)
+    return {
+        key: report_to_json(r, [photo_to_json(p) for p in photos[r["id"]]], quick_actions[r["id"]],
+                            with_project=False)
+        for key, r in rows.items()
+    }
+
+def relative_photos(saved: List[Tuple[str, dict]]) -> List[Tuple[str, dict]]:
+    return [(_rel_from_base(p), meta) for p, meta in saved]
+
+def remove_files(paths: List[str]) -> None:
+    for p in paths:
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+@app.post("/api/reports")
+@token_required
+@admit("upload")
+def create_report(current_user_id: str):
+    data = request.get_json(silent=True) if request.is_json else request.form
+    if data is None:
+        data = {}
+    try:
+        fields = parse_report_fields(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    project_id = fields["project_id"]
+    images = request.files.getlist("images") if not request.is_json else []
+
+    if not project_id or (not fields["text"] and not fields["quick_actions"]):
         return jsonify({"error": "projectId und (text oder quickActions) sind erforderlich"}), 400
 
-    conn = get_db(app.config["DB_FILE"])
-    user = conn.execute("SELECT id, role, username, name FROM users WHERE id = ?", (current_user_id,)).fetchone()
+    store = get_store()
+    user = store.users.get(current_user_id)
     if not user:
-        conn.close()
+        store.close()
         return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
 
-    if user["role"] == "worker":
-        assigned = conn.execute(
-            "SELECT 1 FROM project_assignments WHERE project_id = ? AND user_id = ?",
-            (project_id, current_user_id)
-        ).fetchone()
-        if not assigned:
-            conn.close()
-            return jsonify({"error": "Kein Zugriff auf dieses Projekt"}), 403
+    # retried submission: answer with the stored report, don't process the photos again
+    if fields["client_key"]:
+        existing = submitted_reports_json(store, current_user_id, [fields["client_key"]])
+        if existing:
+            store.close()
+            return jsonify(existing[fields["client_key"]]), 200
 
-    proj = conn.execute("SELECT id FROM projects WHERE id = ?", (project_id,)).fetchone()
-    if not proj:
-        conn.close()
-        return jsonify({"error": "Projekt nicht gefunden"}), 404
+    if user["role"] == "worker" and not store.projects.is_assigned(project_id, current_user_id):
+        store.close()
+        return jsonify({"error": "Kein Zugriff auf dieses Projekt"}), 403
 
-    report_id = str(uuid.uuid4())
-    now = iso_now()
+    project = store.projects.get(project_id)
+    if not project:
+        store.close()
+        return jsonify({"error": "Projekt nicht gefunden"}), 404
 
-    wp_int = None
-    if workers_present is not None and str(workers_present).strip() != "":
+    upload_dir = project_upload_dir(storage_config()["UPLOAD_ROOT"], project_id)
+    with timed("image"):
         try:
-            wp_int = int(workers_present)
-        except Exception:
-            wp_int = None
-
-    break_int = None
-    if break_minutes is not None and str(break_minutes).strip() != "":
+            saved = save_images_for_report(upload_dir, images, apply_scan=True, max_images=10,
+                                           max_pixels=image_max_pixels())
+        except ImageTooLarge as e:
+            store.close()
+            return image_too_large(e)
+    # before the insert: the new photos must not find themselves
+    hashes = [meta["phash"] for _, meta in saved]
+    similar = similar_photos(store, project, hashes, app.config["PHOTO_DUPLICATE_DISTANCE"])
+
+    created = insert_report(store, user, fields, relative_photos(saved))
+    if created is None:
+        # the same clientKey was committed concurrently
+        store.rollback()
+        remove_files([p for p, _ in saved])
+        payload = submitted_reports_json(store, current_user_id, [fields["client_key"]])[fields["client_key"]]
+        store.close()
+        return jsonify(payload), 200
+    payload, events = created
+    store.commit()
+    store.close()
+    publish_changes(*events)
+
+    # shots of this upload repeating each other or photos already in the project (not rejected)
+    max_distance = app.config["PHOTO_DUPLICATE_DISTANCE"]
+    near_duplicates = []
+    for i, photo in enumerate(payload["photos"]):
+        found = []
+        for j in range(i):
+            if hashes[i] is None or hashes[j] is None:
+                continue
+            d = hash_distance(hashes[i], hashes[j])
+            if d <= max_distance:
+                found.append({"reportId": payload["id"], "distance": d, **payload["photos"][j]})
+        found += similar[i]
+        if found:
+            near_duplicates.append({"url": photo["url"], "similar": found})
+    return jsonify({**payload, "nearDuplicates": near_duplicates}), 201
+
+@app.post("/api/reports/batch")
+@token_required
+@admit("upload")
+def create_reports_batch(current_user_id: str):
+    """Upload of an offline queue in one request, all or nothing.
+
+    multipart: field "reports" = JSON list of reports (fields as for POST /api/reports, each
+    with a client-generated "clientKey"), photos as files "images.<clientKey>". JSON bodies
+    ({"reports": [...]}) carry no photos. Keys the user already submitted are answered with
+    the stored report and their photos are not processed again.
+    """
+    if request.is_json:
+        items = (request.get_json(silent=True) or {}).get("reports")
+    else:
         try:
-            break_int = int(break_minutes)
-        except Exception:
-            break_int = None
-
-    conn.execute(
-        "INSERT INTO reports (id, project_id, user_id, text, quick_actions, weather, workers_present, start_time, end_time, break_minutes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (
-            report_id,
-            project_id,
-            current_user_id,
-            text,
-            json.dumps(qas_list, ensure_ascii=False),
-            weather,
-            wp_int,
-            start_time,
-            end_time,
-            break_int,
-            now,
-        )
-    )
+            items = json.loads(request.form.get("reports") or "null")
+        except ValueError:
+            items = None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "reports muss eine nicht-leere Liste sein"}), 400
+    batch_max = app.config["REPORT_BATCH_MAX"]
+    if len(items) > batch_max:
+        return jsonify({"error": f"Höchstens {batch_max} Berichte pro Anfrage"}), 400
+
+    batch = []
+    for n, item in enumerate(items, 1):
+        try:
+            fields = parse_report_fields(item) if isinstance(item, dict) else None
+        except ValueError as e:
+            key = item.get("clientKey")
+            label = key if isinstance(key, str) and len(key) <= CLIENT_KEY_MAX_LENGTH else n
+            return jsonify({"error": f"Bericht {label}: {e}"}), 400
+        if not fields or not fields["client_key"]:
+            return jsonify({"error": "Jeder Bericht braucht einen clientKey"}), 400
+        key = fields["client_key"]
+        if any(f["client_key"] == key for f in batch):
+            return jsonify({"error": f"clientKey doppelt: {key}"}), 400
+        if not fields["project_id"] or (not fields["text"] and not fields["quick_actions"]):
+            return jsonify({"error": f"Bericht {key}: projectId und (text oder quickActions) sind erforderlich"}), 400
+        batch.append(fields)
+
+    store = get_store()
+    user = store.users.get(current_user_id)
+    if not user:
+        store.close()
+        return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
 
-    upload_dir = project_upload_dir(app.config["UPLOAD_ROOT"], project_id)
-    saved_paths = save_images_for_report(upload_dir, images, apply_scan=True, max_images=10)
+    results = submitted_reports_json(store, current_user_id, [f["client_key"] for f in batch])
+    new = [f for f in batch if f["client_key"] not in results]
 
-    image_urls = []
-    for p in saved_paths:
-        rel = _rel_from_base(p)
-        conn.execute("INSERT INTO report_images (report_id, file_path) VALUES (?, ?)", (report_id, rel))
-        image_urls.append(make_upload_url(rel))
+    project_ids = sorted({f["project_id"] for f in new})
+    missing = store.projects.missing(project_ids)
+    if missing:
+        store.close()
+        return jsonify({"error": f"Projekt nicht gefunden: {missing[0]}"}), 404
+    if user["role"] == "worker":
+        assigned = set(store.projects.assigned_to(current_user_id))
+        if any(pid not in assigned for pid in project_ids):
+            store.close()
+            return jsonify({"error": "Kein Zugriff auf dieses Projekt"}), 403
 
-    conn.commit()
-    conn.close()
-
-    return jsonify({
-        "id": report_id,
-        "projectId": project_id,
-        "userId": current_user_id,
-        "userName": (user["name"] or user["username"]),
-        "text": text,
-        "images": image_urls,
-        "quickActions": qas_list,
-        "weather": weather,
-        "workersPresent": wp_int,
-        "startTime": start_time,
-        "endTime": end_time,
-        "breakMinutes": break_int,
-        "createdAt": now
-    }), 201
+    # photos first, so the write transaction below only holds the lock for the inserts
+    saved: Dict[str, List[Tuple[str, dict]]] = {}
+    try:
+        with timed("image"):
+            for f in new:
+                upload_dir = project_upload_dir(storage_config()["UPLOAD_ROOT"], f["project_id"])
+                saved[f["client_key"]] = save_images_for_report(
+                    upload_dir, request.files.getlist(f"images.{f['client_key']}"), apply_scan=True, max_images=10,
+                    max_pixels=image_max_pixels()
+                )
+
+        created, events, raced = set(), [], []
+        for f in new:
+            key = f["client_key"]
+            inserted = insert_report(store, user, f, relative_photos(saved[key]))
+            if inserted is None:
+                # committed concurrently by another submission of the same batch
+                raced.append(key)
+                remove_files([p for p, _ in saved.pop(key)])
+                continue
+            results[key], report_events = inserted
+            created.add(key)
+            events.extend(report_events)
+        store.commit()
+    except Exception as e:
+        store.rollback()
+        store.close()
+        remove_files([p for photos in saved.values() for p, _ in photos])
+        if isinstance(e, ImageTooLarge):
+            return image_too_large(e)
+        raise
+    if raced:
+        results.update(submitted_reports_json(store, current_user_id, raced))
+    store.close()
+    publish_changes(*events)
+
+    payload = {"results": [
+        {"clientKey": f["client_key"], "status": "created" if f["client_key"] in created else "duplicate",
+         "report": results[f["client_key"]]}
+        for f in batch
+    ]}
+    return jsonify(payload), 201 if created else 200
 
 # -----------------------
 # PDF Export
 # -----------------------
 @app.get("/api/projects/<project_id>/export-pdf")
 @token_required
+@admit("export")
 def export_pdf(current_user_id: str, project_id: str):
     if not require_admin(current_user_id):
         return jsonify({"error": "Keine Berechtigung"}), 403
 
-    conn = get_db(app.config["DB_FILE"])
-    project = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+    store, project = read_row(lambda s: s.projects.get(project_id))
     if not project:
-        conn.close()
+        store.close()
         return jsonify({"error": "Projekt nicht gefunden"}), 404
-
-    reports = conn.execute("""
-        SELECT r.*, u.username AS user_name, u.name AS full_name
-        FROM reports r
-        JOIN users u ON u.id = r.user_id
-        WHERE r.project_id = ?
-        ORDER BY r.created_at ASC
-    """, (project_id,)).fetchall()
+    store, project = ensure_hot(store, project)
 
     report_images = {}
-    for r in reports:
-        imgs = conn.execute("SELECT file_path FROM report_images WHERE report_id = ?", (r["id"],)).fetchall()
-        paths = []
-        for img in imgs:
-            p = img["file_path"]
-            full = os.path.join(BASE_DIR, p) if not os.path.isabs(p) else p
-            paths.append(full)
-        report_images[r["id"]] = paths
-
     rep_dicts = []
-    for r in reports:
-        qa = []
-        if r["quick_actions"]:
-            try:
-                qa = json.loads(r["quick_actions"])
-            except Exception:
-                qa = []
-        rep_dicts.append({
-            "id": r["id"],
-            "text": r["text"],
-            "created_at": r["created_at"],
-            "user_name": r["full_name"] or r["user_name"],
-            "quick_actions_list": qa,
-            "start_time": r["start_time"],
-            "end_time": r["end_time"],
-            "break_minutes": r["break_minutes"],
-        })
+    for rows in store.reports.chunks(project_id=project_id, newest_first=False):
+        ids = [r["id"] for r in rows]
+        images = store.images.paths_by_report(ids)
+        quick_actions = store.reports.quick_actions(ids)
+        for r in rows:
+            report_images[r["id"]] = [full_path(p) for p in images[r["id"]]]
+            rep_dicts.append({
+                "id": r["id"],
+                "text": r["text"],
+                "created_at": r["created_at"],
+                "user_name": r["name"] or r["username"],
+                "quick_actions_list": quick_actions[r["id"]],
+                "start_time": r["start_time"],
+                "end_time": r["end_time"],
+                "break_minutes": r["break_minutes"],
+            })
 
     proj_dict = dict(project)
-    buffer = build_project_pdf(proj_dict, rep_dicts, report_images, logo_path=None)
-    conn.close()
+    with timed("pdf"):
+        buffer = build_project_pdf(proj_dict, rep_dicts, report_images, logo_path=None, image_cache=pdf_image_cache())
+    store.close()
 
     safe_name = project["name"].replace(" ", "_")
     return send_file(
@@ -764,41 +1433,28 @@ def export_pdf(current_user_id: str, project_id: str):
 
 @app.get("/api/reports/<report_id>/export-pdf")
 @token_required
+@admit("export")
 def export_report_pdf(current_user_id: str, report_id: str):
     if not require_admin(current_user_id):
         return jsonify({"error": "Keine Berechtigung"}), 403
 
-    conn = get_db(app.config["DB_FILE"])
-    report = conn.execute("""
-        SELECT r.*, u.username AS user_name, u.name AS full_name, p.name AS project_name, p.address AS project_address
-        FROM reports r
-        JOIN users u ON u.id = r.user_id
-        JOIN projects p ON p.id = r.project_id
-        WHERE r.id = ?
-    """, (report_id,)).fetchone()
+    store, report = read_row(lambda s: s.reports.get(report_id))
+    if not report and restore_report(report_id):
+        store.close()
+        store = get_store()
+        report = store.reports.get(report_id)
     if not report:
-        conn.close()
+        store.close()
         return jsonify({"error": "Bericht nicht gefunden"}), 404
 
-    imgs = conn.execute("SELECT file_path FROM report_images WHERE report_id = ?", (report_id,)).fetchall()
-    image_paths = []
-    for img in imgs:
-        p = img["file_path"]
-        full = os.path.join(BASE_DIR, p) if not os.path.isabs(p) else p
-        image_paths.append(full)
-
-    qa = []
-    if report["quick_actions"]:
-        try:
-            qa = json.loads(report["quick_actions"])
-        except Exception:
-            qa = []
+    image_paths = [full_path(p) for p in store.images.paths(report_id)]
+    qa = store.reports.quick_actions([report_id])[report_id]
 
     report_dict = {
         "id": report["id"],
         "text": report["text"],
         "created_at": report["created_at"],
-        "user_name": report["full_name"] or report["user_name"],
+        "user_name": report["name"] or report["username"],
         "quick_actions_list": qa,
         "start_time": report["start_time"],
         "end_time": report["end_time"],
@@ -806,8 +1462,9 @@ def export_report_pdf(current_user_id: str, report_id: str):
     }
     project_dict = {"name": report["project_name"], "address": report["project_address"]}
 
-    buffer = build_report_pdf(project_dict, report_dict, image_paths, logo_path=None)
-    conn.close()
+    with timed("pdf"):
+        buffer = build_report_pdf(project_dict, report_dict, image_paths, logo_path=None, image_cache=pdf_image_cache())
+    store.close()
 
     safe_name = report["project_name"].replace(" ", "_")
     return send_file(
@@ -817,5 +1474,227 @@ def export_report_pdf(current_user_id: str, report_id: str):
         download_name=f"Bericht_{safe_name}_{report_id}.pdf"
     )
 
+# -----------------------
+# Photo export
+# -----------------------
+def _archive_name_part(value: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in value).strip("_") or "unbekannt"
+
+def photo_entries(store, project_id: str, base_dir: str):
+    """(name, path, timestamp) for every photo of a project, oldest report first,
+    named like 2026-09-14_Max_Mustermann_1.jpg."""
+    used = set()
+    for rows in store.reports.chunks(project_id=project_id, newest_first=False):
+        images = store.images.paths_by_report([r["id"] for r in rows])
+        for r in rows:
+            author = _archive_name_part(r["name"] or r["username"])
+            ts = datetime.datetime.fromisoformat(r["created_at"].rstrip("Z"))
+            for p in images[r["id"]]:
+                ext = os.path.splitext(p)[1].lower() or ".jpg"
+                n = 1
+                while f"{ts.date().isoformat()}_{author}_{n}{ext}" in used:
+                    n += 1
+                name = f"{ts.date().isoformat()}_{author}_{n}{ext}"
+                used.add(name)
+                yield name, full_path(p, base_dir), ts
+
+@app.get("/api/projects/<project_id>/export-photos.zip")
+@token_required
+@admit("export")
+def export_photos(current_user_id: str, project_id: str):
+    """All photos of a project as they were uploaded, streamed as an uncompressed ZIP."""
+    if not require_admin(current_user_id):
+        return jsonify({"error": "Keine Berechtigung"}), 403
+
+    store, project = read_row(lambda s: s.projects.get(project_id))
+    if not project:
+        store.close()
+        return jsonify({"error": "Projekt nicht gefunden"}), 404
+    store, project = ensure_hot(store, project)
+
+    resp = Response(stream_zip(photo_entries(store, project_id, storage_base())), mimetype="application/zip",
+                    headers={"X-Accel-Buffering": "no"})
+    # the store stays open while the ZIP streams; closed when the download ends or aborts
+    resp.call_on_close(store.close)
+    download_name = secure_filename(f"Fotos_{project['name']}.zip") or "Fotos.zip"
+    resp.headers.set("Content-Disposition", "attachment", filename=download_name)
+    return resp
+
+# -----------------------
+# Analytics export (CSV/XLSX)
+# -----------------------
+TIME_RE = re.compile(r"^(\d{1,2}):(\d{2})")
+
+def report_hours(start_time: Optional[str], end_time: Optional[str], break_minutes: Optional[int]) -> Optional[float]:
+    """Worked hours as on the timesheet page: end - start - break, at least 0; None without both times."""
+    start = TIME_RE.match(start_time or "")
+    end = TIME_RE.match(end_time or "")
+    if not start or not end:
+        return None
+    minutes = (int(end[1]) * 60 + int(end[2])) - (int(start[1]) * 60 + int(start[2])) - (break_minutes or 0)
+    return round(max(0, minutes) / 60, 2)
+
+def export_reports(store, cold_cfg, created_from: Optional[str], created_before: Optional[str],
+                   project_id: Optional[str] = None):
+    """Report rows with author and project names: hot reports oldest first, then the reports of
+    cold-archived projects (read from the archive, not restored)."""
+    for rows in store.reports.chunks(project_id=project_id, newest_first=False,
+                                     created_from=created_from, created_before=created_before):
+        yield from rows
+    for rows in cold_report_chunks(store, cold_cfg, created_from=created_from,
+                                   created_before=created_before, project_id=project_id):
+        yield from rows
+
+REPORT_EXPORT_HEADER = (
+    "Datum", "Erstellt (UTC)", "Projekt", "Adresse", "Mitarbeiter", "Benutzername", "Beginn", "Ende",
+    "Pause (min)", "Stunden", "Wetter", "Anwesende", "Schnellaktionen", "Text", "Bericht-ID", "Projekt-ID",
+    "Mitarbeiter-ID",
+)
+
+def report_export_rows(store, cold_cfg, created_from, created_before, project_id=None):
+    for r in export_reports(store, cold_cfg, created_from, created_before, project_id):
+        yield (
+            r["created_at"][:10], r["created_at"], r["project_name"], r["project_address"],
+            r["name"] or r["username"], r["username"], r["start_time"], r["end_time"], r["break_minutes"],
+            report_hours(r["start_time"], r["end_time"], r["break_minutes"]), r["weather"],
+            r["workers_present"], ", ".join(tags_from_json(r["quick_actions"])), r["text"], r["id"],
+            r["project_id"], r["user_id"],
+        )
+
+def _totals(store, cold_cfg, created_from, created_before, key: str) -> Dict[str, list]:
+    """{key value: [reports, hours, first created_at, last created_at]}; memory grows with
+    the number of projects/workers, not with the number of reports."""
+    out: Dict[str, list] = {}
+    for r in export_reports(store, cold_cfg, created_from, created_before):
+        t = out.setdefault(r[key], [0, 0.0, r["created_at"], r["created_at"]])
+        t[0] += 1
+        t[1] += report_hours(r["start_time"], r["end_time"], r["break_minutes"]) or 0.0
+        t[2], t[3] = min(t[2], r["created_at"]), max(t[3], r["created_at"])
+    return out
+
+PROJECT_EXPORT_HEADER = (
+    "Projekt-ID", "Name", "Adresse", "Kunde", "Status", "Angelegt", "Zugewiesene Mitarbeiter", "Berichte",
+    "Stunden", "Fotos gesamt", "Letzter Bericht",
+)
+
+def project_export_rows(store, cold_cfg, created_from, created_before):
+    """Berichte/Stunden within the period; Fotos/Letzter Bericht over all time."""
+    totals = _totals(store, cold_cfg, created_from, created_before, "project_id")
+    for rows in store.projects.chunks():
+        workers = store.projects.workers_by_project([p["id"] for p in rows])
+        for p in rows:
+            t = totals.get(p["id"], [0, 0.0])
+            yield (
+                p["id"], p["name"], p["address"], p["customer_name"], p["status"], p["created_at"],
+                len(workers[p["id"]]), t[0], round(t[1], 2), int(p["images_count"] or 0), p["last_report_at"],
+            )
+
+WORKER_EXPORT_HEADER = (
+    "Mitarbeiter-ID", "Benutzername", "Name", "Rolle", "Berichte", "Stunden", "Erster Bericht", "Letzter Bericht",
+)
+
+def worker_export_rows(store, cold_cfg, created_from, created_before):
+    totals = _totals(store, cold_cfg, created_from, created_before, "user_id")
+    for u in store.users.list_all():
+        t = totals.get(u["id"], [0, 0.0, None, None])
+        yield (u["id"], u["username"], u["name"], u["role"], t[0], round(t[1], 2), t[2], t[3])
+
+EXPORT_TABLES = {
+    # kind: (file/sheet name, header, rows(store, cold cfg, created_from, created_before))
+    "reports": ("Berichte", REPORT_EXPORT_HEADER, report_export_rows),
+    "projects": ("Projekte", PROJECT_EXPORT_HEADER, project_export_rows),
+    "workers": ("Mitarbeiter", WORKER_EXPORT_HEADER, worker_export_rows),
+}
+
+EXPORT_MIMETYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+@app.get("/api/exports/<kind>.<fmt>")
+@token_required
+@admit("export")
+def export_table(current_user_id: str, kind: str, fmt: str):
+    """Reports (one row each, with hours), projects or workers (totals) as CSV or XLSX.
+    ?from=/?to= (YYYY-MM-DD, inclusive, report creation date); ?projectId= for reports.
+    Rows are streamed from the read store chunk by chunk."""
+    if not require_admin(current_user_id):
+        return jsonify({"error": "Keine Berechtigung"}), 403
+    if kind not in EXPORT_TABLES or fmt not in EXPORT_MIMETYPES:
+        return jsonify({"error": "Unbekannter Export"}), 404
+
+    try:
+        day_from = datetime.date.fromisoformat(request.args["from"]) if request.args.get("from") else None
+        day_to = datetime.date.fromisoformat(request.args["to"]) if request.args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "from/to erwarten JJJJ-MM-TT"}), 400
+    created_from = day_from.isoformat() if day_from else None
+    created_before = (day_to + datetime.timedelta(days=1)).isoformat() if day_to else None
+
+    title, header, make_rows = EXPORT_TABLES[kind]
+    args = (created_from, created_before)
+    if kind == "reports" and request.args.get("projectId"):
+        args += (request.args["projectId"],)
+
+    store = get_read_store()
+    rows = make_rows(store, storage_config(), *args)
+    body = stream_xlsx(header, rows, sheet_name=title) if fmt == "xlsx" else stream_csv(header, rows)
+    resp = Response(body, mimetype=EXPORT_MIMETYPES[fmt], headers={"X-Accel-Buffering": "no"})
+    # the store stays open while the table streams; closed when the download ends or aborts
+    resp.call_on_close(store.close)
+    period = "_".join(d.isoformat() for d in (day_from, day_to) if d)
+    resp.headers.set("Content-Disposition", "attachment", filename=f"{title}{'_' + period if period else ''}.{fmt}")
+    return resp
+
+# -----------------------
+# Live updates (Server-Sent Events)
+# -----------------------
+@app.get("/api/events")
+@token_required(allow_query_token=True)
+def events_feed(current_user_id: str):
+    """SSE stream of report/project changes the user may see. EventSource cannot send
+    headers, so the access token may also be passed as ?access_token=..."""
+    role = current_role(current_user_id)
+    if not role:
+        return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
+
+    raw_last = request.headers.get("Last-Event-ID") or request.args.get("lastEventId") or ""
+    try:
+        last_event_id = int(raw_last) if raw_last else None
+    except ValueError:
+        last_event_id = None
+
+    # subscribe before replaying so nothing committed in between is lost
+    is_admin = role == "admin"
+    tenant_name = tenants.current_name(app.config)
+    sub = broker.subscribe(current_user_id, is_admin, app.config["SSE_CLIENT_BUFFER"], tenant_name)
+    backlog = []
+    store = get_store()
+    try:
+        if last_event_id is not None:
+            backlog = replay_events(store, last_event_id, current_user_id, is_admin)
+        else:
+            last_event_id = latest_event_id(store)
+    finally:
+        store.close()
+
+    def poll(after: int):
+        # runs outside the request: the tenant is looked up again, it may have been evicted meanwhile
+        if tenant_name:
+            poll_store = tenants.registry.get(app.config, tenant_name, app.root_path).open_store()
+        else:
+            poll_store = open_store(app.config)
+        try:
+            return tail_events(poll_store, after, current_user_id, is_admin)
+        finally:
+            poll_store.close()
+
+    poll_seconds = app.config["SSE_POLL_SECONDS"]
+    return Response(
+        event_stream(sub, backlog, last_event_id, poll if poll_seconds > 0 else None, poll_seconds),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
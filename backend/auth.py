@@ -1,22 +1,94 @@
+import time
+import uuid
+import hashlib
+import secrets
 import datetime
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 import jwt
 from functools import wraps
-from flask import request, jsonify, current_app
-from db import get_db
+from flask import request, jsonify, current_app, g
+import tenants
 
 def _is_local_request() -> bool:
     ip = request.remote_addr or ""
     return ip in ("127.0.0.1", "::1")
 
-def create_token(user_id: str) -> str:
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+def _iso(dt: datetime.datetime) -> str:
+    return dt.isoformat() + "Z"
+
+# -----------------------
+# Access tokens (stateless, short-lived, carry the role)
+# -----------------------
+def create_token(user_id: str, role: str) -> str:
+    now = _utcnow()
     payload = {
         "user_id": user_id,
-        "exp": datetime.datetime.utcnow() + datetime.timedelta(days=7),
-        "iat": datetime.datetime.utcnow(),
+        "role": role,
+        "type": "access",
+        "exp": now + datetime.timedelta(minutes=current_app.config["ACCESS_TOKEN_MINUTES"]),
+        "iat": now,
     }
+    tid = tenants.current_name(current_app.config)
+    if tid:
+        payload["tid"] = tid
     return jwt.encode(payload, current_app.config["SECRET_KEY"], algorithm="HS256")
 
-def token_required(f):
+class _TokenCache:
+    """LRU of already verified tokens -> claims, so repeat requests skip HMAC + JSON decode."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, dict]" = OrderedDict()
+
+    def get(self, raw: str) -> Optional[dict]:
+        with self._lock:
+            claims = self._items.get(raw)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._items[raw]
+                return None
+            self._items.move_to_end(raw)
+            return claims
+
+    def put(self, raw: str, claims: dict, max_size: int) -> None:
+        if max_size <= 0:
+            return
+        with self._lock:
+            self._items[raw] = claims
+            self._items.move_to_end(raw)
+            while len(self._items) > max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+token_cache = _TokenCache()
+
+def decode_token(raw: str) -> dict:
+    cfg = current_app.config
+    claims = token_cache.get(raw)
+    if claims is not None:
+        return claims
+    claims = jwt.decode(raw, cfg["SECRET_KEY"], algorithms=["HS256"])
+    if claims.get("type", "access") != "access":
+        raise jwt.InvalidTokenError("wrong token type")
+    token_cache.put(raw, claims, int(cfg.get("TOKEN_CACHE_SIZE") or 0))
+    return claims
+
+def token_required(f=None, *, allow_query_token: bool = False):
+    """Use as @token_required, or @token_required(allow_query_token=True) for endpoints
+    like EventSource streams where the browser cannot send an Authorization header."""
+    if f is None:
+        return lambda fn: token_required(fn, allow_query_token=allow_query_token)
+
     @wraps(f)
     def decorated(*args, **kwargs):
         cfg = current_app.config
@@ -24,29 +96,118 @@ def token_required(f):
         # Dev shortcut: SOLO_MODE = admin access without token, but ONLY localhost.
         if cfg.get("SOLO_MODE") and (not cfg.get("SOLO_LOCAL_ONLY") or _is_local_request()):
             # pick admin user id
-            conn = get_db(cfg["DB_FILE"])
-            admin = conn.execute("SELECT id FROM users WHERE role='admin' ORDER BY created_at ASC LIMIT 1").fetchone()
-            conn.close()
-            if admin:
-                return f(admin["id"], *args, **kwargs)
+            store = tenants.open_request_store(cfg)
+            admin_id = store.users.first_admin_id()
+            store.close()
+            if admin_id:
+                g.token_claims = {"user_id": admin_id, "role": "admin"}
+                return f(admin_id, *args, **kwargs)
 
         token = request.headers.get("Authorization", "")
+        if allow_query_token and not token and request.args.get("access_token"):
+            token = "Bearer " + request.args["access_token"]
         if not token or not token.startswith("Bearer "):
             return jsonify({"error": "Token fehlt"}), 401
 
         try:
             raw = token.split(" ", 1)[1].strip()
-            data = jwt.decode(raw, cfg["SECRET_KEY"], algorithms=["HS256"])
+            data = decode_token(raw)
             current_user_id = data["user_id"]
         except Exception:
             return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
+        if not tenants.accept_token_claims(cfg, data):
+            return jsonify({"error": "Ungültiger oder abgelaufener Token"}), 401
 
+        g.token_claims = data
         return f(current_user_id, *args, **kwargs)
 
     return decorated
 
+def current_role(current_user_id: str, store=None) -> Optional[str]:
+    """Role from the access token; tokens issued before role claims fall back to the DB."""
+    claims = g.get("token_claims")
+    if claims and claims.get("role") and claims.get("user_id") == current_user_id:
+        return claims["role"]
+    own = store is None
+    if own:
+        store = tenants.open_request_store(current_app.config)
+    role = store.users.role(current_user_id)
+    if own:
+        store.close()
+    return role
+
 def require_admin(current_user_id: str):
-    conn = get_db(current_app.config["DB_FILE"])
-    row = conn.execute("SELECT role FROM users WHERE id = ?", (current_user_id,)).fetchone()
-    conn.close()
-    return row and row["role"] == "admin"
+    return current_role(current_user_id) == "admin"
+
+# -----------------------
+# Refresh tokens (opaque, rotating, stored hashed in the database)
+# -----------------------
+def _hash_refresh(raw: str) -> str:
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def issue_refresh_token(conn, user_id: str, family_id: Optional[str] = None) -> str:
+    """Store a new refresh token and return its raw value. The caller commits."""
+    now = _utcnow()
+    raw = secrets.token_urlsafe(32)
+    conn.execute(
+        "INSERT INTO refresh_tokens (id, user_id, family_id, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            _hash_refresh(raw),
+            user_id,
+            family_id or str(uuid.uuid4()),
+            _iso(now),
+            _iso(now + datetime.timedelta(days=current_app.config["REFRESH_TOKEN_DAYS"])),
+        )
+    )
+    conn.execute("DELETE FROM refresh_tokens WHERE user_id = ? AND expires_at < ?", (user_id, _iso(now)))
+    return raw
+
+def rotate_refresh_token(conn, raw: str) -> Tuple[Optional[str], Optional[str]]:
+    """Exchange a refresh token for a new one. Returns (user_id, new_raw) or (None, None).
+
+    Presenting an already rotated token outside the grace window revokes the whole
+    family (it was most likely stolen). The caller commits.
+    """
+    now = _utcnow()
+    token_id = _hash_refresh(raw)
+    row = conn.execute("SELECT * FROM refresh_tokens WHERE id = ?", (token_id,)).fetchone()
+    if not row or row["expires_at"] < _iso(now):
+        return None, None
+
+    if row["revoked_at"]:
+        grace = datetime.timedelta(seconds=current_app.config["REFRESH_REUSE_GRACE_SECONDS"])
+        # parallel refresh from a second tab: refuse, but don't punish the family
+        if row["replaced_by"] and row["revoked_at"] >= _iso(now - grace):
+            return None, None
+        revoke_refresh_family(conn, row["family_id"])
+        return None, None
+
+    new_raw = secrets.token_urlsafe(32)
+    cur = conn.execute(
+        "UPDATE refresh_tokens SET revoked_at = ?, replaced_by = ? WHERE id = ? AND revoked_at IS NULL",
+        (_iso(now), _hash_refresh(new_raw), token_id)
+    )
+    if cur.rowcount != 1:
+        return None, None  # lost a race against a concurrent rotation
+    conn.execute(
+        "INSERT INTO refresh_tokens (id, user_id, family_id, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            _hash_refresh(new_raw),
+            row["user_id"],
+            row["family_id"],
+            _iso(now),
+            _iso(now + datetime.timedelta(days=current_app.config["REFRESH_TOKEN_DAYS"])),
+        )
+    )
+    return row["user_id"], new_raw
+
+def revoke_refresh_family(conn, family_id: str) -> None:
+    conn.execute(
+        "UPDATE refresh_tokens SET revoked_at = ? WHERE family_id = ? AND revoked_at IS NULL",
+        (_iso(_utcnow()), family_id)
+    )
+
+def revoke_refresh_token(conn, raw: str) -> None:
+    row = conn.execute("SELECT family_id FROM refresh_tokens WHERE id = ?", (_hash_refresh(raw),)).fetchone()
+    if row:
+        revoke_refresh_family(conn, row["family_id"])
@@ -0,0 +1,398 @@
+"""Benchmark for the image and PDF pipeline.
+
+Usage (from backend/):
+    python -m benchmarks.images run --out bench_images.json
+    python -m benchmarks.images run --sizes 2,12 --repeat 5 --stages scan,compress
+    python -m benchmarks.images compare old.json new.json --threshold 0.15
+
+Test images are generated offline (no network). Every stage/image combination runs
+in a fresh child process so peak RSS is attributable to that stage alone.
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import multiprocessing
+from queue import Empty
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = [2, 8, 12, 24, 48]
+KINDS = ["document", "site"]
+STAGES = ["ingest", "scan", "compress", "pdf_report", "pdf_project", "pdf_project_cached"]
+
+# -----------------------
+# Synthetic images
+# -----------------------
+def _dims_for_mp(megapixels: float) -> tuple:
+    # 4:3 like typical phone cameras
+    w = int(round((megapixels * 1_000_000 * 4 / 3) ** 0.5))
+    h = int(round(w * 3 / 4))
+    return w, h
+
+def make_document_image(w: int, h: int, seed: int = 0):
+    """A sheet of paper with text lines, slightly rotated on a textured background."""
+    import numpy as np
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    img = rng.integers(40, 90, size=(h // 8 + 1, w // 8 + 1, 3), dtype=np.uint8)
+    img = cv2.resize(img, (w, h), interpolation=cv2.INTER_LINEAR)
+
+    # paper quad covering ~60% of the frame, perspective-skewed
+    quad = np.array([
+        [w * 0.18, h * 0.12],
+        [w * 0.84, h * 0.16],
+        [w * 0.80, h * 0.90],
+        [w * 0.14, h * 0.86],
+    ], dtype=np.float32)
+    pw, ph = 1000, 1414
+    paper = np.full((ph, pw, 3), 245, dtype=np.uint8)
+    for y in range(120, ph - 120, 38):
+        x_end = int(pw * (0.55 + 0.35 * rng.random()))
+        cv2.rectangle(paper, (90, y), (x_end, y + 14), (40, 40, 40), -1)
+    src = np.array([[0, 0], [pw - 1, 0], [pw - 1, ph - 1], [0, ph - 1]], dtype=np.float32)
+    M = cv2.getPerspectiveTransform(src, quad)
+    warped = cv2.warpPerspective(paper, M, (w, h))
+    mask = cv2.warpPerspective(np.full((ph, pw), 255, dtype=np.uint8), M, (w, h))
+    img[mask > 0] = warped[mask > 0]
+    return img
+
+def make_site_image(w: int, h: int, seed: int = 0):
+    """Sky gradient over noisy 'concrete' ground, no dominant contour."""
+    import numpy as np
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    img = np.empty((h, w, 3), dtype=np.uint8)
+    horizon = int(h * 0.4)
+    sky = np.linspace(235, 170, horizon, dtype=np.float32)[:, None]
+    img[:horizon, :, 0] = np.clip(sky + 15, 0, 255).astype(np.uint8)
+    img[:horizon, :, 1] = np.clip(sky - 10, 0, 255).astype(np.uint8)
+    img[:horizon, :, 2] = np.clip(sky - 40, 0, 255).astype(np.uint8)
+    ground = rng.integers(90, 160, size=((h - horizon) // 4 + 1, w // 4 + 1, 3), dtype=np.uint8)
+    img[horizon:] = cv2.resize(ground, (w, h - horizon), interpolation=cv2.INTER_LINEAR)
+    noise = rng.integers(-12, 12, size=(h, w, 1), dtype=np.int16)
+    img = np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return img
+
+def generate_inputs(cache_dir: str, sizes: List[float], kinds: List[str]) -> Dict[str, str]:
+    import cv2
+
+    os.makedirs(cache_dir, exist_ok=True)
+    out = {}
+    for kind in kinds:
+        for mp in sizes:
+            path = os.path.join(cache_dir, f"{kind}_{mp:g}mp.jpg")
+            if not os.path.exists(path):
+                w, h = _dims_for_mp(mp)
+                maker = make_document_image if kind == "document" else make_site_image
+                cv2.imwrite(path, maker(w, h), [cv2.IMWRITE_JPEG_QUALITY, 92])
+            out[f"{kind}:{mp:g}"] = path
+    return out
+
+# -----------------------
+# Stages
+# -----------------------
+def _copy(src: str, work_dir: str) -> str:
+    dst = os.path.join(work_dir, os.path.basename(src))
+    shutil.copyfile(src, dst)
+    return dst
+
+def _stage_ingest(src: str, work_dir: str) -> Callable[[], int]:
+    from werkzeug.datastructures import FileStorage
+    from image_processing import save_images_for_report
+
+    with open(src, "rb") as fh:
+        data = fh.read()
+
+    def run() -> int:
+        fs = FileStorage(stream=io.BytesIO(data), filename=os.path.basename(src))
+        paths = [p for p, _ in save_images_for_report(work_dir, [fs], apply_scan=True, max_images=10)]
+        size = sum(os.path.getsize(p) for p in paths)
+        for p in paths:
+            os.remove(p)
+        return size
+    return run
+
+def _stage_scan(src: str, work_dir: str) -> Callable[[], int]:
+    from image_processing import _scan_document_opencv
+
+    def run() -> int:
+        p = _copy(src, work_dir)
+        _scan_document_opencv(p)
+        return os.path.getsize(p)
+    return run
+
+def _stage_compress(src: str, work_dir: str) -> Callable[[], int]:
+    from image_processing import _compress_jpeg
+
+    def run() -> int:
+        p = _copy(src, work_dir)
+        _compress_jpeg(p, quality=80)
+        return os.path.getsize(p)
+    return run
+
+def _fake_report(i: int) -> dict:
+    return {
+        "id": f"bench-{i}",
+        "text": "Bodenplatte gegossen. Schalung entfernt, Bewehrung für Wände gestellt.",
+        "created_at": "2024-01-15T07:30:00Z",
+        "user_name": "Benchmark",
+        "quick_actions_list": ["Material geliefert"],
+        "start_time": "07:00",
+        "end_time": "15:30",
+        "break_minutes": 30,
+    }
+
+def _stage_pdf_report(src: str, work_dir: str) -> Callable[[], int]:
+    from pdf_export import build_report_pdf
+
+    project = {"name": "Benchmark", "address": "Musterstraße 1"}
+
+    def run() -> int:
+        return len(build_report_pdf(project, _fake_report(0), [src]).getvalue())
+    return run
+
+def _stage_pdf_project(src: str, work_dir: str, n_reports: int = 5) -> Callable[[], int]:
+    from pdf_export import build_project_pdf
+
+    project = {"name": "Benchmark", "address": "Musterstraße 1", "customer_name": "Bench GmbH", "status": "active"}
+    reports = [_fake_report(i) for i in range(n_reports)]
+    images = {r["id"]: [src, src] for r in reports}
+
+    def run() -> int:
+        return len(build_project_pdf(project, reports, images).getvalue())
+    return run
+
+def _stage_pdf_project_cached(src: str, work_dir: str, n_reports: int = 5) -> Callable[[], int]:
+    """Same PDF with the pre-scaled ImageCache (warm after the first iteration)."""
+    from pdf_export import ImageCache, build_project_pdf
+
+    project = {"name": "Benchmark", "address": "Musterstraße 1", "customer_name": "Bench GmbH", "status": "active"}
+    reports = [_fake_report(i) for i in range(n_reports)]
+    images = {r["id"]: [src, src] for r in reports}
+    cache = ImageCache(os.path.join(work_dir, "pdf_cache"))
+
+    def run() -> int:
+        return len(build_project_pdf(project, reports, images, image_cache=cache).getvalue())
+    return run
+
+STAGE_FACTORIES = {
+    "ingest": _stage_ingest,
+    "scan": _stage_scan,
+    "compress": _stage_compress,
+    "pdf_report": _stage_pdf_report,
+    "pdf_project": _stage_pdf_project,
+    "pdf_project_cached": _stage_pdf_project_cached,
+}
+
+# -----------------------
+# Measurement
+# -----------------------
+def _reset_peak_rss() -> None:
+    # Linux >= 4.0: resets VmHWM so the next reading covers only the stage itself
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _max_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+def _run_case(stage: str, src: str, repeat: int, queue) -> None:
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    work_dir = tempfile.mkdtemp(prefix="bauapp_bench_")
+    try:
+        run = STAGE_FACTORIES[stage](src, work_dir)
+        _reset_peak_rss()
+        baseline_rss = _max_rss_mb()
+        timings = []
+        out_bytes = 0
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out_bytes = run()
+            timings.append((time.perf_counter() - t0) * 1000.0)
+        queue.put({
+            "timings_ms": timings,
+            "output_bytes": out_bytes,
+            "baseline_rss_mb": baseline_rss,
+            "peak_rss_mb": _max_rss_mb(),
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def run_case(stage: str, src: str, repeat: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_case, args=(stage, src, repeat, queue))
+    proc.start()
+    res = None
+    try:
+        # the child may be OOM-killed or crash (what this benchmark provokes): then nothing arrives
+        while res is None:
+            try:
+                res = queue.get(timeout=1.0)
+            except Empty:
+                if not proc.is_alive():
+                    try:
+                        res = queue.get(timeout=1.0)  # result put right before exiting
+                    except Empty:
+                        res = {"error": f"child process died (exit code {proc.exitcode})"}
+    finally:
+        proc.join()
+    if "error" in res:
+        return res
+    t = res.pop("timings_ms")
+    res.update({
+        "latency_ms": {
+            "min": round(min(t), 2),
+            "median": round(statistics.median(t), 2),
+            "mean": round(statistics.mean(t), 2),
+            "max": round(max(t), 2),
+        },
+        "runs": len(t),
+    })
+    return res
+
+def run_suite(sizes: List[float], kinds: List[str], stages: List[str], repeat: int, cache_dir: str) -> dict:
+    inputs = generate_inputs(cache_dir, sizes, kinds)
+    results = []
+    for kind in kinds:
+        for mp in sizes:
+            src = inputs[f"{kind}:{mp:g}"]
+            for stage in stages:
+                res = run_case(stage, src, repeat)
+                res.update({
+                    "stage": stage,
+                    "kind": kind,
+                    "megapixels": mp,
+                    "input_bytes": os.path.getsize(src),
+                })
+                results.append(res)
+                lat = res.get("latency_ms", {}).get("median", "-")
+                print(f"{stage:12s} {kind:9s} {mp:>5g} MP  median {lat} ms  rss {res.get('peak_rss_mb')} MB  out {res.get('output_bytes')} B")
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+# -----------------------
+# Comparison
+# -----------------------
+def _key(r: dict) -> str:
+    return f"{r['stage']}|{r['kind']}|{r['megapixels']:g}"
+
+def compare(old: dict, new: dict, threshold: float) -> List[str]:
+    """Return a list of human-readable regressions (empty list = OK)."""
+    old_by_key = {_key(r): r for r in old.get("results", []) if "error" not in r}
+    regressions = []
+    for r in new.get("results", []):
+        k = _key(r)
+        if "error" in r:
+            regressions.append(f"{k}: Fehler {r['error']}")
+            continue
+        prev = old_by_key.get(k)
+        if not prev:
+            continue
+        metrics = [
+            ("latency_ms.median", prev["latency_ms"]["median"], r["latency_ms"]["median"]),
+            ("peak_rss_mb", prev.get("peak_rss_mb"), r.get("peak_rss_mb")),
+            ("output_bytes", prev.get("output_bytes"), r.get("output_bytes")),
+        ]
+        for name, a, b in metrics:
+            if not a or b is None:
+                continue
+            change = (b - a) / a
+            if change > threshold:
+                regressions.append(f"{k}: {name} {a} -> {b} (+{change * 100:.1f}%)")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="BauAPP Bild-/PDF-Benchmark")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="Benchmark ausführen")
+    p_run.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="Megapixel, kommasepariert")
+    p_run.add_argument("--kinds", default=",".join(KINDS))
+    p_run.add_argument("--stages", default=",".join(STAGES))
+    p_run.add_argument("--repeat", type=int, default=3)
+    p_run.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "bauapp_bench_inputs"))
+    p_run.add_argument("--out", default="bench_images.json")
+    p_run.add_argument("--baseline", help="Ergebnisdatei eines früheren Laufs zum Vergleich")
+    p_run.add_argument("--threshold", type=float, default=0.15)
+
+    p_cmp = sub.add_parser("compare", help="Zwei Ergebnisdateien vergleichen")
+    p_cmp.add_argument("old")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.15)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "run":
+        stages = [s for s in args.stages.split(",") if s]
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            parser.error(f"Unbekannte Stages: {', '.join(sorted(unknown))}")
+        data = run_suite(
+            sizes=[float(s) for s in args.sizes.split(",") if s],
+            kinds=[k for k in args.kinds.split(",") if k],
+            stages=stages,
+            repeat=max(1, args.repeat),
+            cache_dir=args.cache_dir,
+        )
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"Ergebnisse geschrieben: {args.out}")
+        if not args.baseline:
+            return 0
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        new = data
+    else:
+        with open(args.old, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, "r", encoding="utf-8") as f:
+            new = json.load(f)
+
+    regressions = compare(old, new, args.threshold)
+    for line in regressions:
+        print("REGRESSION", line)
+    if not regressions:
+        print("Keine Regressionen.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Latency/query-count load test for the REST API.
+
+Usage (from backend/):
+    python -m benchmarks.seed --db bench.db
+    python -m benchmarks.load_test --db bench.db --requests 100 --out load.json
+    python -m benchmarks.load_test --base-url http://127.0.0.1:5000 --requests 50   # running server
+
+By default the app is driven in-process through Flask's test client, which lets us
+count the SQLite statements each request executes. Against ``--base-url`` only
+latencies and response sizes are available.
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import threading
+import statistics
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+_local = threading.local()
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = (len(s) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+# -----------------------
+# Drivers
+# -----------------------
+class FlaskDriver:
+    """In-process driver (SQLite backend). Wraps db.get_db so every statement is counted per thread."""
+
+    def __init__(self, db_file: str, upload_root: Optional[str]):
+        os.environ["DB_FILE"] = os.path.abspath(db_file)
+        if upload_root:
+            os.environ["UPLOAD_ROOT"] = os.path.abspath(upload_root)
+        import db
+        import app as app_module
+
+        def counting(open_conn: Callable[[str], sqlite3.Connection]) -> Callable[[str], sqlite3.Connection]:
+            def wrapper(db_file: str) -> sqlite3.Connection:
+                conn = open_conn(db_file)
+                conn.set_trace_callback(_count_statement)
+                return conn
+            return wrapper
+
+        # the SQLite store and read snapshots open connections through these
+        db.get_db = counting(db.get_db)
+        db.get_read_only_db = counting(db.get_read_only_db)
+        self.app = app_module.app
+        self.counts_queries = True
+
+    def request(self, method: str, path: str, token: Optional[str] = None, body: Optional[dict] = None) -> Tuple[int, int, bytes]:
+        client = getattr(_local, "client", None)
+        if client is None:
+            client = _local.client = self.app.test_client()
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        _local.queries = 0
+        resp = client.open(path, method=method, headers=headers, json=body)
+        data = resp.get_data()
+        return resp.status_code, _local.queries, data
+
+class HttpDriver:
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.counts_queries = False
+
+    def request(self, method: str, path: str, token: Optional[str] = None, body: Optional[dict] = None) -> Tuple[int, Optional[int], bytes]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(req, timeout=300) as resp:
+                return resp.status, None, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, None, e.read()
+
+def _count_statement(_sql: str) -> None:
+    _local.queries = getattr(_local, "queries", 0) + 1
+
+# -----------------------
+# Scenario
+# -----------------------
+def _login(driver, username: str, password: str) -> str:
+    status, _, data = driver.request("POST", "/api/auth/login", body={"username": username, "password": password})
+    if status != 200:
+        raise SystemExit(f"Login fehlgeschlagen für {username}: {status} {data[:200]!r}")
+    return json.loads(data)["token"]
+
+def build_endpoints(driver, worker_username: Optional[str], rng: random.Random) -> Dict[str, Callable[[], tuple]]:
+    admin_token = _login(driver, "admin", "demo123")
+    worker_token = _login(driver, worker_username, "demo123") if worker_username else None
+
+    _, _, data = driver.request("GET", "/api/projects", admin_token)
+    project_ids = [p["id"] for p in json.loads(data)]
+    _, _, data = driver.request("GET", "/api/reports", admin_token)
+    report_ids = [r["id"] for r in json.loads(data)]
+    if not project_ids or not report_ids:
+        raise SystemExit("Datenbank enthält keine Projekte/Berichte – zuerst benchmarks.seed ausführen.")
+
+    endpoints = {
+        "POST /api/auth/login": lambda: driver.request("POST", "/api/auth/login", body={"username": "admin", "password": "demo123"}),
+        "GET /api/auth/me": lambda: driver.request("GET", "/api/auth/me", admin_token),
+        "GET /api/users": lambda: driver.request("GET", "/api/users", admin_token),
+        "GET /api/projects (admin)": lambda: driver.request("GET", "/api/projects", admin_token),
+        "GET /api/projects/<id>": lambda: driver.request("GET", f"/api/projects/{rng.choice(project_ids)}", admin_token),
+        "GET /api/reports (admin)": lambda: driver.request("GET", "/api/reports", admin_token),
+        "GET /api/reports/<id>": lambda: driver.request("GET", f"/api/reports/{rng.choice(report_ids)}", admin_token),
+        "GET /api/projects/<id>/export-pdf": lambda: driver.request("GET", f"/api/projects/{rng.choice(project_ids)}/export-pdf", admin_token),
+        "GET /api/reports/<id>/export-pdf": lambda: driver.request("GET", f"/api/reports/{rng.choice(report_ids)}/export-pdf", admin_token),
+    }
+    if worker_token:
+        endpoints["GET /api/projects (worker)"] = lambda: driver.request("GET", "/api/projects", worker_token)
+        endpoints["GET /api/reports (worker)"] = lambda: driver.request("GET", "/api/reports", worker_token)
+    return endpoints
+
+def run_endpoint(fn: Callable[[], tuple], n: int, concurrency: int) -> dict:
+    def one(_):
+        t0 = time.perf_counter()
+        status, queries, body = fn()
+        return (time.perf_counter() - t0) * 1000.0, status, queries, len(body)
+
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as ex:
+            samples = list(ex.map(one, range(n)))
+    else:
+        samples = [one(i) for i in range(n)]
+
+    lat = [s[0] for s in samples]
+    queries = [s[2] for s in samples if s[2] is not None]
+    errors = sum(1 for s in samples if s[1] >= 400)
+    return {
+        "requests": n,
+        "errors": errors,
+        "p50_ms": round(_percentile(lat, 50), 2),
+        "p95_ms": round(_percentile(lat, 95), 2),
+        "p99_ms": round(_percentile(lat, 99), 2),
+        "mean_ms": round(statistics.mean(lat), 2),
+        "queries_per_request": round(statistics.mean(queries), 1) if queries else None,
+        "bytes_per_response": int(statistics.mean(s[3] for s in samples)),
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="BauAPP API-Lasttest")
+    parser.add_argument("--db", default="bench.db", help="SQLite-Datei (nur In-Process-Modus)")
+    parser.add_argument("--upload-root", default=os.path.join(BACKEND_DIR, "uploads_bench"))
+    parser.add_argument("--base-url", help="Gegen laufenden Server testen statt Flask-Test-Client")
+    parser.add_argument("--requests", type=int, default=50, help="Requests pro Endpoint")
+    parser.add_argument("--pdf-requests", type=int, default=5, help="Requests pro PDF-Endpoint")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--worker", default="worker0001", help="Worker-Login für rollenbasierte Listen ('' = aus)")
+    parser.add_argument("--only", help="Nur Endpoints, deren Name diesen Text enthält")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Ergebnisse als JSON schreiben")
+    args = parser.parse_args(argv)
+
+    driver = HttpDriver(args.base_url) if args.base_url else FlaskDriver(args.db, args.upload_root)
+    rng = random.Random(args.seed)
+    endpoints = build_endpoints(driver, args.worker or None, rng)
+
+    results = {}
+    print(f"{'Endpoint':40s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'queries':>8s} {'bytes':>10s} {'err':>4s}")
+    for name, fn in endpoints.items():
+        if args.only and args.only not in name:
+            continue
+        n = args.pdf_requests if "export-pdf" in name else args.requests
+        res = run_endpoint(fn, n, args.concurrency)
+        results[name] = res
+        q = "-" if res["queries_per_request"] is None else f"{res['queries_per_request']:.1f}"
+        print(f"{name:40s} {res['p50_ms']:9.1f} {res['p95_ms']:9.1f} {res['p99_ms']:9.1f} {q:>8s} {res['bytes_per_response']:10d} {res['errors']:4d}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "mode": "http" if args.base_url else "test_client",
+                    "concurrency": args.concurrency,
+                },
+                "results": results,
+            }, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Fill a SQLite database with production-sized synthetic data.
+
+Usage (from backend/):
+    python -m benchmarks.seed --db bench.db --projects 300 --workers 80 --reports 50000
+    python -m benchmarks.seed --db bench.db --images-per-report 0   # rows only, no files
+
+All generated workers log in with password ``demo123`` (usernames ``worker0001``...).
+The demo users/projects from ``init_db`` are kept, so ``admin``/``demo123`` works too.
+"""
+import os
+import sys
+import json
+import uuid
+import random
+import shutil
+import argparse
+import datetime
+from typing import List, Optional
+
+from werkzeug.security import generate_password_hash
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from db import get_db, init_db  # noqa: E402
+
+QUICK_ACTIONS = ["Arbeiten abgeschlossen", "Material geliefert", "Material fehlt", "Inspektion", "Sicherheitsproblem"]
+WEATHER = ["Sonnig, 18°C", "Bewölkt, 9°C", "Regen, 6°C", "Schnee, -2°C", "Wind, 12°C"]
+TEXTS = [
+    "Schalung gestellt, Bewehrung eingebaut.",
+    "Estrich im EG eingebracht. Trocknung läuft.",
+    "Fenster im 1. OG montiert, Anschlussfugen offen.",
+    "Dachdämmung verlegt. Material für Attika fehlt noch.",
+    "Elektro-Rohinstallation im Keller abgeschlossen.",
+]
+STATUSES = ["active"] * 6 + ["paused", "completed", "archived"]
+BATCH = 5000
+
+def _rel_from_base(path: str) -> str:
+    rel = os.path.relpath(path, BACKEND_DIR) if os.path.isabs(path) else path
+    return rel.replace("\\", "/")
+
+def _placeholder_jpeg(path: str) -> None:
+    from PIL import Image
+
+    Image.new("RGB", (64, 48), (128, 128, 128)).save(path, format="JPEG", quality=70)
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def _chunks(rows: list, size: int = BATCH):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def seed(db_file: str, upload_root: str, projects: int, workers: int, assignments_per_project: int,
+         reports: int, images_per_report: int, days: int, seed_value: int, write_files: bool) -> dict:
+    rng = random.Random(seed_value)
+    init_db(db_file, os.path.join(BACKEND_DIR, "schema.sql"))
+    conn = get_db(db_file)
+    conn.execute("PRAGMA synchronous = OFF;")
+
+    now = datetime.datetime.utcnow()
+    pw_hash = generate_password_hash("demo123")  # one hash for all, hashing is the slow part
+
+    existing = conn.execute("SELECT COUNT(*) AS c FROM users WHERE username LIKE 'worker%'").fetchone()["c"]
+    worker_rows = []
+    for i in range(existing, existing + workers):
+        created = (now - datetime.timedelta(days=rng.randint(0, days))).isoformat() + "Z"
+        worker_rows.append((str(uuid.uuid4()), f"worker{i + 1:04d}", f"Arbeiter {i + 1}", pw_hash, "worker", created))
+    conn.executemany(
+        "INSERT INTO users (id, username, name, password_hash, role, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        worker_rows
+    )
+    worker_ids: List[str] = [r["id"] for r in conn.execute("SELECT id FROM users WHERE role = 'worker'").fetchall()]
+
+    project_rows = []
+    for i in range(projects):
+        created = (now - datetime.timedelta(days=rng.randint(0, days))).isoformat() + "Z"
+        project_rows.append((
+            str(uuid.uuid4()), f"Bauvorhaben {i + 1}", f"Baustraße {i + 1}, 1010 Wien", f"Kunde {rng.randint(1, 60)} GmbH",
+            rng.choice(STATUSES), created, "Generiert für Lasttests", None,
+        ))
+    conn.executemany(
+        "INSERT INTO projects (id, name, address, customer_name, status, created_at, description, image_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        project_rows
+    )
+    project_ids = [p[0] for p in project_rows]
+
+    assignment_rows = []
+    for pid in project_ids:
+        for uid in rng.sample(worker_ids, min(assignments_per_project, len(worker_ids))):
+            assignment_rows.append((pid, uid))
+    conn.executemany("INSERT OR IGNORE INTO project_assignments (project_id, user_id) VALUES (?, ?)", assignment_rows)
+    conn.commit()
+
+    by_project = {}
+    for pid, uid in assignment_rows:
+        by_project.setdefault(pid, []).append(uid)
+
+    placeholder = None
+    if write_files and images_per_report > 0 and project_ids:
+        os.makedirs(upload_root, exist_ok=True)
+        placeholder = os.path.join(upload_root, "_bench_placeholder.jpg")
+        if not os.path.exists(placeholder):
+            _placeholder_jpeg(placeholder)
+
+    report_count = 0
+    image_count = 0
+    pending_reports = []
+    pending_images = []
+
+    def flush():
+        conn.executemany(
+            "INSERT INTO reports (id, project_id, user_id, text, quick_actions, weather, workers_present, start_time, end_time, break_minutes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            pending_reports
+        )
+        conn.executemany("INSERT INTO report_images (report_id, file_path) VALUES (?, ?)", pending_images)
+        conn.commit()
+        pending_reports.clear()
+        pending_images.clear()
+
+    for _ in range(reports if project_ids else 0):
+        pid = rng.choice(project_ids)
+        uid = rng.choice(by_project.get(pid) or worker_ids)
+        created_dt = now - datetime.timedelta(minutes=rng.randint(0, days * 24 * 60))
+        start_h = rng.randint(6, 9)
+        rid = str(uuid.uuid4())
+        pending_reports.append((
+            rid, pid, uid, rng.choice(TEXTS),
+            json.dumps(rng.sample(QUICK_ACTIONS, rng.randint(0, 2)), ensure_ascii=False),
+            rng.choice(WEATHER), rng.randint(1, 12),
+            f"{start_h:02d}:00", f"{start_h + rng.randint(6, 10):02d}:30", rng.choice([0, 15, 30, 45]),
+            created_dt.isoformat() + "Z",
+        ))
+        for j in range(images_per_report):
+            full = os.path.join(upload_root, pid, f"{created_dt.strftime('%Y-%m-%d_%H%M%S')}_img{j}_{rid[:6]}_processed.jpg")
+            if placeholder:
+                os.makedirs(os.path.dirname(full), exist_ok=True)
+                _link_or_copy(placeholder, full)
+            pending_images.append((rid, _rel_from_base(full)))
+            image_count += 1
+        report_count += 1
+        if len(pending_reports) >= BATCH:
+            flush()
+    flush()
+    conn.close()
+
+    return {
+        "workers": len(worker_rows),
+        "projects": len(project_rows),
+        "assignments": len(assignment_rows),
+        "reports": report_count,
+        "images": image_count,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="BauAPP Testdaten-Generator")
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--upload-root", default=os.path.join(BACKEND_DIR, "uploads_bench"))
+    parser.add_argument("--projects", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--assignments-per-project", type=int, default=5)
+    parser.add_argument("--reports", type=int, default=20000)
+    parser.add_argument("--images-per-report", type=int, default=2)
+    parser.add_argument("--days", type=int, default=365, help="Zeitraum der Berichte in Tagen")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-files", action="store_true", help="Nur DB-Zeilen, keine Platzhalter-Dateien")
+    args = parser.parse_args(argv)
+
+    stats = seed(
+        db_file=args.db,
+        upload_root=os.path.abspath(args.upload_root),
+        projects=args.projects,
+        workers=args.workers,
+        assignments_per_project=args.assignments_per_project,
+        reports=args.reports,
+        images_per_report=args.images_per_report,
+        days=args.days,
+        seed_value=args.seed,
+        write_files=not args.no_files,
+    )
+    print(json.dumps(stats, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Worker startup benchmark: import time and memory per worker process.
+
+Usage (from backend/):
+    python -m benchmarks.startup --workers 4 --out startup.json
+    python -m benchmarks.startup --modes lazy,preload_fork
+
+Modes:
+    lazy          every worker is a fresh interpreter importing app (ReportLab, Pillow,
+                  OpenCV, NumPy load on first use)
+    eager         fresh interpreters with PRELOAD_HEAVY_MODULES=1 (everything at import)
+    preload_fork  one master imports app with PRELOAD_HEAVY_MODULES=1 and forks the
+                  workers, like gunicorn.conf.py (Linux/macOS only)
+
+Each worker reports the time to import app, the time of its first PDF export and its
+memory after both, while all workers of the run are alive (PSS splits shared pages
+between them). Memory figures come from /proc/self/smaps_rollup (Linux); elsewhere only
+peak RSS is available.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+MODES = ["lazy", "eager", "preload_fork"]
+
+# -----------------------
+# Measurements (inside a worker)
+# -----------------------
+def memory_kb() -> Dict[str, int]:
+    try:
+        with open("/proc/self/smaps_rollup", "r", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+        return {
+            key.lower(): int(fields[key].split()[0])
+            for key in ("Rss", "Pss", "Private_Dirty", "Shared_Dirty") if key in fields
+        }
+    except (OSError, ValueError):
+        if resource is None:
+            return {}
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"peak_rss": peak // 1024 if sys.platform == "darwin" else peak}
+
+def first_export() -> float:
+    from pdf_export import build_report_pdf
+
+    started = time.perf_counter()
+    build_report_pdf(
+        {"name": "Benchmark", "address": "Musterstraße 1"},
+        {"created_at": "2026-01-01T08:00:00Z", "user_name": "Max", "text": "Startup-Benchmark"},
+        [],
+    )
+    return round((time.perf_counter() - started) * 1000, 2)
+
+def worker_result(import_ms: float) -> dict:
+    idle = memory_kb()
+    export_ms = first_export()
+    return {"import_ms": import_ms, "first_export_ms": export_ms, "memory_idle_kb": idle, "memory_kb": memory_kb()}
+
+def _import_app() -> float:
+    started = time.perf_counter()
+    import app  # noqa: F401
+    return round((time.perf_counter() - started) * 1000, 2)
+
+def _report_and_wait(result: dict, out=None) -> None:
+    """Hand the result to the driver, then stay alive until it closes stdin."""
+    out = out or sys.stdout
+    out.write(json.dumps(result) + "\n")
+    out.flush()
+    sys.stdin.read()
+
+def run_worker() -> None:
+    _report_and_wait(worker_result(_import_app()))
+
+def run_fork_master(workers: int) -> None:
+    import gc
+
+    master_import_ms = _import_app()
+    gc.freeze()
+    pipes = []
+    for _ in range(workers):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            with os.fdopen(w, "w") as out:
+                _report_and_wait(worker_result(0.0), out)
+            os._exit(0)
+        os.close(w)
+        pipes.append((pid, os.fdopen(r, "r")))
+    results = [json.loads(f.readline()) for _, f in pipes]
+    master = memory_kb()
+    sys.stdout.write(json.dumps({"master_import_ms": master_import_ms, "master_memory_kb": master, "workers": results}) + "\n")
+    sys.stdout.flush()
+    sys.stdin.read()  # children inherited our stdin and exit on the same EOF
+    for pid, f in pipes:
+        f.close()
+        os.waitpid(pid, 0)
+
+# -----------------------
+# Driver
+# -----------------------
+def _env(tmp_dir: str, preload: bool) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DB_FILE": os.path.join(tmp_dir, "startup.db"),
+        "UPLOAD_ROOT": os.path.join(tmp_dir, "uploads"),
+        "PRELOAD_HEAVY_MODULES": "1" if preload else "0",
+    })
+    return env
+
+def _spawn(role: List[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.startup", "--role", *role],
+        cwd=BACKEND_DIR, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+
+def run_mode(mode: str, workers: int, tmp_dir: str) -> dict:
+    env = _env(tmp_dir, preload=mode != "lazy")
+    if mode == "preload_fork":
+        procs = [_spawn(["fork-master", "--workers", str(workers)], env)]
+        data = json.loads(procs[0].stdout.readline())
+        results = data.pop("workers")
+    else:
+        procs = [_spawn(["worker"], env) for _ in range(workers)]
+        results = [json.loads(p.stdout.readline()) for p in procs]
+        data = {}
+    for p in procs:
+        p.stdin.close()
+        p.wait()
+
+    def summary(values: List[float]) -> dict:
+        return {"median": round(statistics.median(values), 2), "max": round(max(values), 2)}
+
+    def memory_sum(key: str) -> Optional[int]:
+        values = [r["memory_kb"].get(key) for r in results]
+        return sum(values) if all(v is not None for v in values) else None
+
+    data.update({
+        "mode": mode,
+        "workers": results,
+        "import_ms": summary([r["import_ms"] for r in results]),
+        "first_export_ms": summary([r["first_export_ms"] for r in results]),
+        "pss_total_kb": memory_sum("pss"),
+        "private_dirty_total_kb": memory_sum("private_dirty"),
+    })
+    if data.get("master_memory_kb", {}).get("pss") is not None and data["pss_total_kb"] is not None:
+        data["pss_total_kb"] += data["master_memory_kb"]["pss"]
+    return data
+
+def run_suite(modes: List[str], workers: int, repeat: int) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="bauapp-startup-")
+    try:
+        # create and seed the database once, so no run pays for it
+        subprocess.run([sys.executable, "-c", "import app"], cwd=BACKEND_DIR, env=_env(tmp_dir, False), check=True)
+        results = []
+        for mode in modes:
+            for run in range(repeat):
+                res = run_mode(mode, workers, tmp_dir)
+                res["run"] = run
+                results.append(res)
+                print(f"{mode:13s} run {run}  import {res['import_ms']['median']} ms  "
+                      f"first export {res['first_export_ms']['median']} ms  "
+                      f"PSS {res['pss_total_kb']} kB  private dirty {res['private_dirty_total_kb']} kB")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workers": workers,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="BauAPP Startup-/Speicher-Benchmark pro Worker")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--out", help="Ergebnisse als JSON schreiben")
+    parser.add_argument("--role", choices=["worker", "fork-master"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.role == "worker":
+        run_worker()
+        return 0
+    if args.role == "fork-master":
+        run_fork_master(args.workers)
+        return 0
+
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"Unbekannte Modi: {', '.join(sorted(unknown))}")
+    if "preload_fork" in modes and not hasattr(os, "fork"):
+        parser.error("preload_fork braucht os.fork (Linux/macOS)")
+    data = run_suite(modes, max(1, args.workers), max(1, args.repeat))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"Ergebnisse geschrieben: {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""Cold archive tier for archived projects.
+
+``flask archive-cold-projects`` moves archived projects without changes for
+ARCHIVE_COLD_AFTER_DAYS out of the hot tables: their report and report_images rows go
+into a separate SQLite database (ARCHIVE_DB_FILE, rows kept as JSON so schema changes
+don't need a migration there), their photos into one ZIP pack per project under
+ARCHIVE_PACK_DIR. The pack's central directory is the index: single photos are read
+without unpacking the rest (``read_photo``, used by /uploads/ for old links). Photos are
+stored as-is when already compressed (JPEG/PNG/WebP), everything else is deflated.
+
+The project row stays hot with ``cold_at`` set and its stats intact. Reading the
+project's reports (project detail, exports, a single report) or un-archiving it calls
+``thaw``, which puts rows and photos back; the next archive run moves it out again.
+
+Each freeze gets its own token (``cold_at``, part of the pack name), so a thaw that
+races a new freeze of the same project never deletes the other's rows or pack.
+"""
+import os
+import json
+import uuid
+import zipfile
+import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import db
+
+STORED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cold_projects (
+    project_id TEXT PRIMARY KEY,
+    cold_at TEXT NOT NULL,
+    pack_file TEXT,
+    reports_count INTEGER NOT NULL,
+    images_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cold_reports (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cold_report_images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id TEXT NOT NULL,
+    report_id TEXT NOT NULL,
+    member TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cold_reports_project ON cold_reports(project_id);
+CREATE INDEX IF NOT EXISTS idx_cold_report_images_project ON cold_report_images(project_id);
+CREATE INDEX IF NOT EXISTS idx_cold_report_images_report ON cold_report_images(report_id);
+"""
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+def _connect(cfg, create: bool = True):
+    path = cfg["ARCHIVE_DB_FILE"]
+    if not create and not os.path.exists(path):
+        return None
+    conn = db.get_db(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+def _pack_dir(cfg) -> str:
+    return cfg["ARCHIVE_PACK_DIR"]
+
+def _full_path(file_path: str, base_dir: str) -> str:
+    return file_path if os.path.isabs(file_path) else os.path.join(base_dir, file_path)
+
+def _member_name(path: str, project_dir: str, image_id) -> str:
+    """Path below the project's upload dir, so /uploads/<project>/<member> finds it."""
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(project_dir))
+    if rel.startswith(".."):
+        rel = f"_{image_id}_{os.path.basename(path)}"
+    return rel.replace("\\", "/")
+
+def _write_pack(out_path: str, files: List[Tuple[str, str]]) -> None:
+    tmp = out_path + ".tmp"
+    with zipfile.ZipFile(tmp, "w", allowZip64=True) as zf:
+        for member, path in files:
+            stored = path.lower().endswith(STORED_EXTENSIONS)
+            zf.write(path, member, compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+    os.replace(tmp, out_path)
+
+def _remove(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# -----------------------
+# Freeze (hot -> cold)
+# -----------------------
+def freeze(store, cfg, project_id: str, base_dir: str) -> Optional[Tuple[int, int]]:
+    """Move an archived project's reports and photos to the cold archive.
+    Returns (reports, images) moved, None if the project is not archived/hot anymore."""
+    project = store.projects.get(project_id)
+    if not project or project["status"] != "archived" or project["cold_at"]:
+        return None
+    reports = [dict(r) for rows in store.reports.rows_for_project(project_id) for r in rows]
+    report_ids = [r["id"] for r in reports]
+    images = [dict(r) for r in store.images.rows_by_report(report_ids)]
+
+    cold_at = _now()
+    project_dir = os.path.join(base_dir, cfg["UPLOAD_ROOT"], project_id)  # as served by /uploads/
+    members: Dict[int, str] = {}
+    files: List[Tuple[str, str]] = []
+    for img in images:
+        path = _full_path(img["file_path"], base_dir)
+        if os.path.isfile(path):
+            members[img["id"]] = _member_name(path, project_dir, img["id"])
+            files.append((members[img["id"]], path))
+
+    pack_file = None
+    if files:
+        os.makedirs(_pack_dir(cfg), exist_ok=True)
+        pack_file = f"{project_id}.{uuid.uuid4().hex[:12]}.zip"
+        _write_pack(os.path.join(_pack_dir(cfg), pack_file), files)
+
+    # 1. archive DB (replaces what an interrupted earlier run may have left)
+    adb = _connect(cfg)
+    try:
+        old = adb.execute("SELECT pack_file FROM cold_projects WHERE project_id = ?", (project_id,)).fetchone()
+        adb.execute("DELETE FROM cold_reports WHERE project_id = ?", (project_id,))
+        adb.execute("DELETE FROM cold_report_images WHERE project_id = ?", (project_id,))
+        adb.executemany(
+            "INSERT INTO cold_reports (id, project_id, data) VALUES (?, ?, ?)",
+            [(r["id"], project_id, json.dumps(r, ensure_ascii=False)) for r in reports]
+        )
+        adb.executemany(
+            "INSERT INTO cold_report_images (project_id, report_id, member, data) VALUES (?, ?, ?, ?)",
+            [(project_id, img["report_id"], members.get(img["id"]), json.dumps(img, ensure_ascii=False))
+             for img in images]
+        )
+        adb.execute(
+            "INSERT OR REPLACE INTO cold_projects (project_id, cold_at, pack_file, reports_count, images_count) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (project_id, cold_at, pack_file, len(reports), len(images))
+        )
+        adb.commit()
+    finally:
+        adb.close()
+    if old and old["pack_file"] and old["pack_file"] != pack_file:
+        _remove(os.path.join(_pack_dir(cfg), old["pack_file"]))
+
+    # 2. hot tables; reports written after the read above stay hot
+    last_report_at = max((r["created_at"] for r in reports), default=None)
+    store.reports.delete_ids(report_ids)
+    if not store.projects.mark_cold(project_id, cold_at, len(reports), len(images), last_report_at):
+        store.rollback()
+        _drop_cold(cfg, project_id, cold_at)
+        return None
+    store.commit()
+
+    # 3. photo files, now only in the pack
+    for _, path in files:
+        _remove(path)
+    return len(reports), len(images)
+
+# -----------------------
+# Thaw (cold -> hot)
+# -----------------------
+def thaw(store, cfg, project_id: str, base_dir: str) -> bool:
+    """Restore a cold project's reports and photos into the hot tables and the upload dir.
+    False if there was nothing to restore (not cold, or restored concurrently)."""
+    adb = _connect(cfg, create=False)
+    if adb is None:
+        return False
+    try:
+        head = adb.execute("SELECT * FROM cold_projects WHERE project_id = ?", (project_id,)).fetchone()
+        if head is None:
+            return False
+        reports = [json.loads(r["data"]) for r in adb.execute(
+            "SELECT data FROM cold_reports WHERE project_id = ?", (project_id,)
+        ).fetchall()]
+        images = adb.execute(
+            "SELECT member, data FROM cold_report_images WHERE project_id = ? ORDER BY id", (project_id,)
+        ).fetchall()
+    finally:
+        adb.close()
+
+    # photos first: once the rows are visible, their files must exist
+    if head["pack_file"]:
+        with zipfile.ZipFile(os.path.join(_pack_dir(cfg), head["pack_file"])) as zf:
+            for img in images:
+                if not img["member"]:
+                    continue
+                target = _full_path(json.loads(img["data"])["file_path"], base_dir)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                tmp = f"{target}.{uuid.uuid4().hex[:6]}.tmp"
+                with zf.open(img["member"]) as src, open(tmp, "wb") as dst:
+                    while True:
+                        block = src.read(256 * 1024)
+                        if not block:
+                            break
+                        dst.write(block)
+                os.replace(tmp, target)
+
+    if not store.projects.clear_cold(project_id, head["cold_at"]):
+        store.rollback()
+        return False
+    restored = set()
+    for r in reports:
+        if store.reports.insert_row(r):
+            restored.add(r["id"])
+    for img in images:
+        row = json.loads(img["data"])
+        row.pop("id", None)
+        if row["report_id"] in restored:
+            store.images.insert_row(row)
+    store.recompute_project_stats(project_id)
+    store.commit()
+
+    _drop_cold(cfg, project_id, head["cold_at"])
+    return True
+
+def _drop_cold(cfg, project_id: str, cold_at: Optional[str] = None) -> None:
+    """Delete a project's archive rows and pack; with cold_at only if they belong to that freeze."""
+    adb = _connect(cfg, create=False)
+    if adb is None:
+        return
+    try:
+        head = adb.execute("SELECT cold_at, pack_file FROM cold_projects WHERE project_id = ?", (project_id,)).fetchone()
+        if head is None or (cold_at is not None and head["cold_at"] != cold_at):
+            return
+        adb.execute("DELETE FROM cold_projects WHERE project_id = ?", (project_id,))
+        adb.execute("DELETE FROM cold_reports WHERE project_id = ?", (project_id,))
+        adb.execute("DELETE FROM cold_report_images WHERE project_id = ?", (project_id,))
+        adb.commit()
+    finally:
+        adb.close()
+    if head["pack_file"]:
+        _remove(os.path.join(_pack_dir(cfg), head["pack_file"]))
+
+def drop(cfg, project_id: str) -> None:
+    """Forget a deleted project's archived data."""
+    _drop_cold(cfg, project_id)
+
+# -----------------------
+# Reads
+# -----------------------
+def project_of_report(cfg, report_id: str) -> Optional[str]:
+    adb = _connect(cfg, create=False)
+    if adb is None:
+        return None
+    try:
+        row = adb.execute("SELECT project_id FROM cold_reports WHERE id = ?", (report_id,)).fetchone()
+        return row["project_id"] if row else None
+    finally:
+        adb.close()
+
+def stamp(cfg) -> Optional[Tuple[int, int]]:
+    """Changes with every write to the archive (freeze, thaw, drop); None without an archive."""
+    try:
+        st = os.stat(cfg["ARCHIVE_DB_FILE"])
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def report_chunks(cfg, created_from: Optional[str] = None, created_before: Optional[str] = None,
+                  project_id: Optional[str] = None, size: int = 500,
+                  project_ids: Optional[List[str]] = None, tags: Sequence[str] = ()) -> Iterator[List[dict]]:
+    """Plain report rows of all cold projects in chunks (listings, dashboard, exports; no restore).
+    Archive order, not by date; created_from/created_before compare the ISO created_at text;
+    project_ids limits the rows to these projects (a worker's); tags: rows with any of these
+    quick actions."""
+    if project_ids is not None and not project_ids:
+        return
+    adb = _connect(cfg, create=False)
+    if adb is None:
+        return
+    try:
+        where, args = ["1 = 1"], []
+        if project_id:
+            where.append("project_id = ?")
+            args.append(project_id)
+        if project_ids is not None:
+            where.append(f"project_id IN ({', '.join('?' for _ in project_ids)})")
+            args.extend(project_ids)
+        if created_from:
+            where.append("json_extract(data, '$.created_at') >= ?")
+            args.append(created_from)
+        if created_before:
+            where.append("json_extract(data, '$.created_at') < ?")
+            args.append(created_before)
+        if tags:
+            where.append(db.tags_match_sql("json_extract(data, '$.quick_actions')", len(tags)))
+            args.extend(tags)
+        cur = adb.execute(f"SELECT data FROM cold_reports WHERE {' AND '.join(where)} ORDER BY rowid", args)
+        while True:
+            rows = cur.fetchmany(size)
+            if not rows:
+                return
+            yield [json.loads(r["data"]) for r in rows]
+    finally:
+        adb.close()
+
+def photos_by_report(cfg, report_ids: List[str]) -> Dict[str, List[dict]]:
+    """Archived report_images rows (as stored at freeze) per report id, upload order."""
+    out: Dict[str, List[dict]] = {rid: [] for rid in report_ids}
+    adb = _connect(cfg, create=False) if report_ids else None
+    if adb is None:
+        return out
+    try:
+        marks = ", ".join("?" for _ in report_ids)
+        for r in adb.execute(f"SELECT report_id, data FROM cold_report_images WHERE report_id IN ({marks}) ORDER BY id",
+                             list(report_ids)):
+            out[r["report_id"]].append(json.loads(r["data"]))
+    finally:
+        adb.close()
+    return out
+
+def read_photo(cfg, project_id: str, member: str) -> Optional[bytes]:
+    """A single photo straight from the project's pack (no restore); None if not archived."""
+    adb = _connect(cfg, create=False)
+    if adb is None:
+        return None
+    try:
+        head = adb.execute("SELECT pack_file FROM cold_projects WHERE project_id = ?", (project_id,)).fetchone()
+    finally:
+        adb.close()
+    if not head or not head["pack_file"]:
+        return None
+    try:
+        with zipfile.ZipFile(os.path.join(_pack_dir(cfg), head["pack_file"])) as zf:
+            return zf.read(member)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
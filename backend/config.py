@@ -3,12 +3,112 @@ import os
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev_secret_key_change_me")
 
+    # Storage backend: "sqlite" (DB_FILE) or "postgres" (DATABASE_URL, optional read replica
+    # DATABASE_READ_URL for exports/dashboard; needs requirements-postgres.txt)
+    DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")
     DB_FILE = os.getenv("DB_FILE", "baustelle.db")
+    DATABASE_URL = os.getenv("DATABASE_URL", "")
+    DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+    PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+    PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+
     UPLOAD_ROOT = os.getenv("UPLOAD_ROOT", "uploads")
     MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(30 * 1024 * 1024)))  # 30MB
 
+    # Access tokens are stateless and carry the role; revocation takes effect when they expire.
+    ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
+    REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "30"))
+    REFRESH_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "10"))
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+
+    # Server-Sent Events (/api/events): per-client buffer before a slow client is dropped;
+    # every SSE_POLL_SECONDS each stream reads change_log for events of other workers (0 = off, one worker)
+    SSE_CLIENT_BUFFER = int(os.getenv("SSE_CLIENT_BUFFER", "100"))
+    SSE_POLL_SECONDS = float(os.getenv("SSE_POLL_SECONDS", "3"))
+    CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "7"))
+
+    # /api/dashboard: aggregates are cached per role/user and dropped on every write
+    DASHBOARD_CACHE_SECONDS = float(os.getenv("DASHBOARD_CACHE_SECONDS", "30"))
+    DASHBOARD_DAYS = int(os.getenv("DASHBOARD_DAYS", "14"))
+
+    # Heavy reads (PDF exports, dashboard, timesheets): "off", "wal" (read-only WAL connections)
+    # or "backup" (periodic snapshot copy, at most READ_SNAPSHOT_MAX_AGE_SECONDS old)
+    READ_SNAPSHOT_MODE = os.getenv("READ_SNAPSHOT_MODE", "off")
+    READ_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("READ_SNAPSHOT_MAX_AGE_SECONDS", "60"))
+    READ_SNAPSHOT_DIR = os.getenv("READ_SNAPSHOT_DIR", "snapshots")
+
+    # PDF exports: photos are embedded as pre-scaled copies cached under PDF_IMAGE_CACHE_DIR ("" = off),
+    # least recently used copies removed beyond PDF_IMAGE_CACHE_MAX_MB (0 = no limit).
+    # flask export-projects renders in PDF_EXPORT_WORKERS processes (0 = one per CPU core).
+    PDF_IMAGE_CACHE_DIR = os.getenv("PDF_IMAGE_CACHE_DIR", "pdf_cache")
+    PDF_IMAGE_CACHE_MAX_MB = int(os.getenv("PDF_IMAGE_CACHE_MAX_MB", "2048"))
+    PDF_IMAGE_MAX_PX = int(os.getenv("PDF_IMAGE_MAX_PX", "1200"))
+    PDF_EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", "0"))
+    PDF_EXPORT_CHUNK_REPORTS = int(os.getenv("PDF_EXPORT_CHUNK_REPORTS", "200"))
+
+    # Admission control (admission.py): per endpoint class, requests running at once, requests
+    # allowed to wait for a slot and how long they wait before a 503. Concurrency 0 = no limit.
+    ADMISSION_UPLOAD_CONCURRENCY = int(os.getenv("ADMISSION_UPLOAD_CONCURRENCY", "4"))
+    ADMISSION_UPLOAD_QUEUE = int(os.getenv("ADMISSION_UPLOAD_QUEUE", "8"))
+    ADMISSION_UPLOAD_WAIT_SECONDS = float(os.getenv("ADMISSION_UPLOAD_WAIT_SECONDS", "10"))
+    ADMISSION_EXPORT_CONCURRENCY = int(os.getenv("ADMISSION_EXPORT_CONCURRENCY", "2"))
+    ADMISSION_EXPORT_QUEUE = int(os.getenv("ADMISSION_EXPORT_QUEUE", "4"))
+    ADMISSION_EXPORT_WAIT_SECONDS = float(os.getenv("ADMISSION_EXPORT_WAIT_SECONDS", "15"))
+
+    # Cold archive (cold_archive.py): `flask archive-cold-projects` moves archived projects unchanged for
+    # ARCHIVE_COLD_AFTER_DAYS into ARCHIVE_DB_FILE, their photos into one pack per project in ARCHIVE_PACK_DIR
+    ARCHIVE_DB_FILE = os.getenv("ARCHIVE_DB_FILE", "archive.db")
+    ARCHIVE_PACK_DIR = os.getenv("ARCHIVE_PACK_DIR", "archive_packs")
+    ARCHIVE_COLD_AFTER_DAYS = int(os.getenv("ARCHIVE_COLD_AFTER_DAYS", "30"))
+
+    # Uploads are decoded within this many megapixels: larger JPEGs are decoded at 1/2-1/8 scale,
+    # larger images in other formats are rejected (image_processing.open_bounded)
+    IMAGE_MAX_MEGAPIXELS = float(os.getenv("IMAGE_MAX_MEGAPIXELS", "24"))
+
+    # Near-duplicate photos (photo_index.py): hashes differing in at most this many of 64 bits count as
+    # the same shot; per-project hash arrays kept in memory per worker
+    PHOTO_DUPLICATE_DISTANCE = int(os.getenv("PHOTO_DUPLICATE_DISTANCE", "6"))
+    PHOTO_INDEX_PROJECTS = int(os.getenv("PHOTO_INDEX_PROJECTS", "64"))
+
+    # POST /api/reports/batch (offline queue): reports per request; MAX_CONTENT_LENGTH applies to the whole batch
+    REPORT_BATCH_MAX = int(os.getenv("REPORT_BATCH_MAX", "20"))
+
+    # Import ReportLab/Pillow/OpenCV/NumPy at startup instead of on first use. Meant for
+    # pre-fork servers (gunicorn.conf.py sets it): the master loads them once, workers share the pages.
+    PRELOAD_HEAVY_MODULES = os.getenv("PRELOAD_HEAVY_MODULES", "0") == "1"
+
+    # Multi-tenancy (tenants.py, SQLite only): one directory per company with its own DB and uploads.
+    # Empty = single installation (DB_FILE/UPLOAD_ROOT as above).
+    TENANTS_DIR = os.getenv("TENANTS_DIR", "")
+    # "bau-mueller.example.com=mueller,..."; unlisted hosts below TENANT_BASE_DOMAIN ("bauapp.example"):
+    # the label in front of it (mueller.bauapp.example). Any other host names no tenant.
+    TENANT_HOSTS = os.getenv("TENANT_HOSTS", "")
+    TENANT_BASE_DOMAIN = os.getenv("TENANT_BASE_DOMAIN", "")
+    # tenant for logins on hosts that name none (localhost, IP); empty = 404
+    TENANT_DEFAULT = os.getenv("TENANT_DEFAULT", "")
+    # tenants kept open per worker, and idle connections kept per open tenant
+    TENANT_CACHE_SIZE = int(os.getenv("TENANT_CACHE_SIZE", "32"))
+    TENANT_IDLE_CONNECTIONS = int(os.getenv("TENANT_IDLE_CONNECTIONS", "4"))
+
     # Dev helper: SOLO_MODE allows admin access WITHOUT token, but ONLY from localhost.
     SOLO_MODE = os.getenv("SOLO_MODE", "0") == "1"
     SOLO_LOCAL_ONLY = os.getenv("SOLO_LOCAL_ONLY", "1") == "1"
 
     FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:3000")
+
+    # Observability (off by default): Server-Timing headers + Prometheus /metrics
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+    # Dump a profile for requests slower than this (ms). 0 = disabled.
+    PROFILE_SLOW_MS = int(os.getenv("PROFILE_SLOW_MS", "0"))
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+    # Password hashing: Werkzeug method ("scrypt", "pbkdf2:sha256:600000") or "argon2" (needs argon2-cffi).
+    # Existing hashes are upgraded to this method on the next successful login.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+    HASH_QUEUE_MAX = int(os.getenv("HASH_QUEUE_MAX", "32"))
+    HASH_TIMEOUT_SECONDS = float(os.getenv("HASH_TIMEOUT_SECONDS", "10"))
+    # Failed logins allowed per username within the window before answering 429
+    LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+    LOGIN_WINDOW_SECONDS = int(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
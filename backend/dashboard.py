@@ -0,0 +1,291 @@
+"""Dashboard aggregates computed in SQL, cached per role/user.
+
+The cache is a small TTL map keyed by (tenant, "admin") or (tenant, "worker", user_id).
+Write endpoints call ``dashboard_cache.invalidate(tenant)`` after committing; the
+generation counter makes sure a computation that started before the write is not stored.
+That only reaches the worker process that handled the write, so every entry also carries
+``data_stamp`` (newest change_log id, project count) read from the primary: another
+worker's write changes it and the entry is recomputed on the next request.
+Reports of cold-archived projects are added from ``cold_summary`` (one pass over the archive
+per change of the archive file).
+"""
+import time
+import datetime
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cold_archive
+from db import tags_from_json
+
+# Same rules the dashboard page used client-side for "Offene Hinweise".
+HINT_QUICK_ACTIONS = ("material fehlt", "inspektion", "sicherheitsproblem")
+HINT_TEXT = ("problem",)
+HINT_LIMIT = 6
+ACTIVE_PROJECTS_LIMIT = 6
+
+class DashboardCache:
+    def __init__(self, max_entries: int = 1024):
+        self._lock = threading.Lock()
+        self._items: Dict[tuple, Tuple[float, object, dict]] = {}
+        self._generation = 0
+        self._max_entries = max_entries
+
+    def get_or_compute(self, key: tuple, ttl: float, compute: Callable[[], dict], stamp=None) -> dict:
+        """stamp: read before compute(); an entry with another stamp is stale."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._items.get(key)
+            if hit and hit[0] > now and hit[1] == stamp:
+                return hit[2]
+            generation = self._generation
+        value = compute()
+        with self._lock:
+            if ttl > 0 and generation == self._generation:
+                if len(self._items) >= self._max_entries:
+                    self._items.clear()
+                self._items[key] = (now + ttl, stamp, value)
+        return value
+
+    def invalidate(self, scope=None) -> None:
+        """scope: drop only the keys starting with it (one tenant's dashboards)."""
+        with self._lock:
+            self._generation += 1
+            if scope is None:
+                self._items.clear()
+            else:
+                for key in [k for k in self._items if k[:1] == (scope,)]:
+                    del self._items[key]
+
+dashboard_cache = DashboardCache()
+
+def data_stamp(conn) -> tuple:
+    """Changes with every write shown on the dashboard, whichever worker made it: writes record
+    a change_log event, except creating a project, which the project count covers."""
+    row = conn.execute(
+        "SELECT (SELECT COALESCE(MAX(id), 0) FROM change_log) AS last_event, (SELECT COUNT(*) FROM projects) AS projects"
+    ).fetchone()
+    return row["last_event"], row["projects"]
+
+def _is_hint(tags: List[str], text: str) -> bool:
+    """The openHints rule of the SQL below, for cold-archived reports."""
+    return (any(term in tag.lower() for tag in tags for term in HINT_QUICK_ACTIONS)
+            or any(term in (text or "").lower() for term in HINT_TEXT))
+
+class ColdReportSummary:
+    """Per-project aggregates of the cold-archived reports. The archive only changes on
+    freeze/thaw, so one pass over it is kept per archive file until its stamp changes.
+    Reports newer than max(days, 7) days at that pass are kept for the time windows, which
+    only move forward."""
+
+    def __init__(self, max_entries: int = 256):
+        self._lock = threading.Lock()
+        self._items: Dict[tuple, Tuple[tuple, Dict[str, dict]]] = {}
+        self._max_entries = max_entries
+
+    def get(self, cold_cfg, days: int) -> Dict[str, dict]:
+        stamp = cold_archive.stamp(cold_cfg)
+        if stamp is None:
+            return {}
+        key = (cold_cfg["ARCHIVE_DB_FILE"], days)
+        with self._lock:
+            hit = self._items.get(key)
+            if hit and hit[0] == stamp:
+                return hit[1]
+        summary = self._summarize(cold_cfg, days)
+        with self._lock:
+            if len(self._items) >= self._max_entries:
+                self._items.clear()
+            self._items[key] = (stamp, summary)
+        return summary
+
+    @staticmethod
+    def _summarize(cold_cfg, days: int) -> Dict[str, dict]:
+        horizon = _iso(datetime.datetime.utcnow() - datetime.timedelta(days=max(days, 7)))
+        out: Dict[str, dict] = {}
+        for rows in cold_archive.report_chunks(cold_cfg):
+            for r in rows:
+                p = out.setdefault(r["project_id"], {
+                    "count": 0, "tags": Counter(), "hint_count": 0, "hints": [], "latest": None, "recent": [],
+                })
+                tags = tags_from_json(r["quick_actions"])
+                row = {k: r[k] for k in ("id", "project_id", "user_id", "text", "created_at")}
+                row["quick_actions"] = tags
+                p["count"] += 1
+                p["tags"].update(tags)
+                if _is_hint(tags, r["text"]):
+                    p["hint_count"] += 1
+                    p["hints"].append(row)
+                    if len(p["hints"]) > 2 * HINT_LIMIT:
+                        p["hints"] = sorted(p["hints"], key=lambda h: h["created_at"], reverse=True)[:HINT_LIMIT]
+                if p["latest"] is None or r["created_at"] > p["latest"]["created_at"]:
+                    p["latest"] = row
+                if r["created_at"] >= horizon:
+                    p["recent"].append((r["created_at"], r["user_id"]))
+        return out
+
+cold_summary = ColdReportSummary()
+
+def _scope(is_admin: bool, user_id: str, column: str) -> Tuple[str, tuple]:
+    """WHERE fragment limiting `column` (a project id) to the user's projects."""
+    if is_admin:
+        return "1 = 1", ()
+    return f"{column} IN (SELECT project_id FROM project_assignments WHERE user_id = ?)", (user_id,)
+
+def _iso(dt: datetime.datetime) -> str:
+    return dt.isoformat() + "Z"
+
+def compute_dashboard(store, user_id: str, is_admin: bool, days: int, project_to_json: Callable,
+                      cold_cfg=None) -> dict:
+    """cold_cfg: archive settings; reports of cold-archived projects count as well."""
+    now = datetime.datetime.utcnow()
+    day_ago = _iso(now - datetime.timedelta(days=1))
+    week_ago = _iso(now - datetime.timedelta(days=7))
+    first_day = (now - datetime.timedelta(days=max(days, 1) - 1)).date().isoformat()
+
+    p_where, p_args = _scope(is_admin, user_id, "p.id")
+    r_where, r_args = _scope(is_admin, user_id, "r.project_id")
+
+    by_status = {
+        row["status"]: row["n"]
+        for row in store.execute(f"SELECT p.status, COUNT(*) AS n FROM projects p WHERE {p_where} GROUP BY p.status", p_args)
+    }
+
+    totals = store.execute(f"""
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(CASE WHEN r.created_at >= ? THEN 1 ELSE 0 END), 0) AS last_24h,
+               COUNT(DISTINCT CASE WHEN r.created_at >= ? THEN r.user_id END) AS active_workers
+        FROM reports r WHERE {r_where}
+    """, (day_ago, week_ago) + r_args).fetchone()
+
+    per_day_rows = store.execute(f"""
+        SELECT substr(r.created_at, 1, 10) AS day, COUNT(*) AS n
+        FROM reports r
+        WHERE r.created_at >= ? AND {r_where}
+        GROUP BY day
+    """, (first_day,) + r_args).fetchall()
+    counts = {row["day"]: row["n"] for row in per_day_rows}
+    reports_per_day = []
+    for i in range(max(days, 1) - 1, -1, -1):
+        day = (now - datetime.timedelta(days=i)).date().isoformat()
+        reports_per_day.append({"date": day, "count": counts.get(day, 0)})
+
+    quick_actions = [
+        {"action": row["action"], "count": row["n"]}
+        for row in store.execute(f"""
+            SELECT t.tag AS action, COUNT(*) AS n
+            FROM report_tags t JOIN reports r ON r.id = t.report_id
+            WHERE {r_where}
+            GROUP BY t.tag
+            ORDER BY n DESC, t.tag ASC
+        """, r_args)
+    ]
+
+    report_cols = """
+        r.id, r.project_id, r.user_id, r.text, r.created_at,
+        u.username, u.name, p.name AS project_name
+    """
+    report_join = "FROM reports r JOIN users u ON u.id = r.user_id JOIN projects p ON p.id = r.project_id"
+
+    latest = store.execute(
+        f"SELECT {report_cols} {report_join} WHERE {r_where} ORDER BY r.created_at DESC LIMIT 1", r_args
+    ).fetchone()
+
+    hint_terms = [f"%{t}%" for t in HINT_QUICK_ACTIONS]
+    tag_match = " OR ".join(["lower(t.tag) LIKE ?"] * len(HINT_QUICK_ACTIONS))
+    hint_where = (f"EXISTS (SELECT 1 FROM report_tags t WHERE t.report_id = r.id AND ({tag_match}))"
+                  + "".join(" OR lower(r.text) LIKE ?" for _ in HINT_TEXT))
+    hint_args = tuple(hint_terms) + tuple(f"%{t}%" for t in HINT_TEXT)
+    hint_count = store.execute(
+        f"SELECT COUNT(*) FROM reports r WHERE ({hint_where}) AND {r_where}", hint_args + r_args
+    ).fetchone()[0]
+    hint_rows = store.execute(
+        f"SELECT {report_cols} {report_join} WHERE ({hint_where}) AND {r_where} ORDER BY r.created_at DESC LIMIT ?",
+        hint_args + r_args + (HINT_LIMIT,)
+    ).fetchall()
+
+    active_rows = store.execute(
+        f"SELECT p.* FROM projects p WHERE p.status = 'active' AND {p_where} ORDER BY p.created_at DESC LIMIT ?",
+        p_args + (ACTIVE_PROJECTS_LIMIT,)
+    ).fetchall()
+
+    quick_actions_by_id = store.reports.quick_actions([r["id"] for r in hint_rows] + ([latest["id"]] if latest else []))
+    workers = store.projects.workers_by_project([p["id"] for p in active_rows])
+
+    total, last_24h, active_workers = totals["total"], totals["last_24h"], totals["active_workers"]
+    summary = cold_summary.get(cold_cfg, days) if cold_cfg else {}
+    if summary and not is_admin:
+        visible = set(store.projects.assigned_to(user_id))
+        summary = {pid: c for pid, c in summary.items() if pid in visible}
+    if summary:
+        cold = summary.values()
+        recent = [t for c in cold for t in c["recent"]]
+        total += sum(c["count"] for c in cold)
+        last_24h += sum(1 for created_at, _ in recent if created_at >= day_ago)
+        cold_workers = {uid for created_at, uid in recent if created_at >= week_ago}
+        if cold_workers:
+            active_workers = len(cold_workers | {row["user_id"] for row in store.execute(
+                f"SELECT DISTINCT r.user_id FROM reports r WHERE r.created_at >= ? AND {r_where}", (week_ago,) + r_args
+            )})
+        for entry in reports_per_day:
+            entry["count"] += sum(1 for created_at, _ in recent if created_at[:10] == entry["date"])
+
+        tag_counts = Counter({qa["action"]: qa["count"] for qa in quick_actions})
+        for c in cold:
+            tag_counts.update(c["tags"])
+        quick_actions = [{"action": tag, "count": n} for tag, n in sorted(tag_counts.items(), key=lambda x: (-x[1], x[0]))]
+
+        cold_rows = [c["latest"] for c in cold] + [h for c in cold for h in c["hints"]]
+        named = _with_names(store, cold_rows)
+        quick_actions_by_id.update({r["id"]: r["quick_actions"] for r in cold_rows})
+        cold_latest = max(named[:len(summary)], key=lambda r: r["created_at"], default=None)
+        if cold_latest and (latest is None or cold_latest["created_at"] > latest["created_at"]):
+            latest = cold_latest
+        hint_count += sum(c["hint_count"] for c in cold)
+        hint_rows = sorted(list(hint_rows) + named[len(summary):], key=lambda r: r["created_at"], reverse=True)[:HINT_LIMIT]
+
+    return {
+        "generatedAt": _iso(now),
+        "projects": {
+            "byStatus": by_status,
+            "total": sum(by_status.values()),
+            "active": [project_to_json(p, workers[p["id"]]) for p in active_rows],
+        },
+        "reports": {
+            "total": total,
+            "last24h": last_24h,
+            "perDay": reports_per_day,
+            "latest": _report_summary(latest, quick_actions_by_id) if latest else None,
+        },
+        "activeWorkers": active_workers,
+        "quickActions": quick_actions,
+        "openHints": {
+            "count": hint_count,
+            "items": [_report_summary(r, quick_actions_by_id) for r in hint_rows],
+        },
+    }
+
+def _with_names(store, rows: List[dict]) -> List[dict]:
+    """Cold report rows with the author and project columns of report_cols above."""
+    users: Dict[str, Optional[object]] = {}
+    projects = store.projects.by_ids(r["project_id"] for r in rows)
+    out = []
+    for r in rows:
+        if r["user_id"] not in users:
+            users[r["user_id"]] = store.users.get(r["user_id"])
+        user, project = users[r["user_id"]], projects.get(r["project_id"])
+        out.append({**r, "username": user["username"] if user else None, "name": user["name"] if user else None,
+                    "project_name": project["name"] if project else None})
+    return out
+
+def _report_summary(r, quick_actions_by_id: Dict[str, List[str]]) -> dict:
+    return {
+        "id": r["id"],
+        "projectId": r["project_id"],
+        "projectName": r["project_name"],
+        "userId": r["user_id"],
+        "userName": (r["name"] or r["username"]),
+        "text": r["text"],
+        "quickActions": quick_actions_by_id.get(r["id"], []),
+        "createdAt": r["created_at"],
+    }
@@ -1,19 +1,57 @@
 import os
 import json
 import sqlite3
+import pathlib
 import uuid
 import datetime
+from typing import List
 from werkzeug.security import generate_password_hash
 
-def get_db(db_file: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_file)
+# Swapped by instrumentation.init_instrumentation when metrics/profiling is enabled.
+_connection_factory = sqlite3.Connection
+
+def set_connection_factory(factory) -> None:
+    global _connection_factory
+    _connection_factory = factory
+
+def get_db(db_file: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """check_same_thread=False for pooled connections (tenants.py) handed from thread to thread."""
+    conn = sqlite3.connect(db_file, factory=_connection_factory, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
-def init_db(db_file: str, schema_path: str) -> None:
+def get_read_only_db(db_file: str) -> sqlite3.Connection:
+    uri = pathlib.Path(db_file).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, factory=_connection_factory)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def enable_wal(db_file: str) -> None:
+    """Persistent: readers stop blocking the writer (and vice versa)."""
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.close()
+
+# Bump with every migration below. Stored in the database (PRAGMA user_version), so a
+# database that is already current skips the migrations: each tenant DB (tenants.py) is
+# migrated on its first use, wherever it is hosted.
+SCHEMA_VERSION = 4
+
+def init_db(db_file: str, schema_path: str, seed: bool = True) -> None:
+    """Create/migrate the schema; seed=False for tenant databases (no demo logins)."""
     os.makedirs(os.path.dirname(os.path.abspath(db_file)) if os.path.dirname(db_file) else ".", exist_ok=True)
     conn = get_db(db_file)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        conn.close()
+        raise RuntimeError(f"{db_file}: Schema-Version {version} ist neuer als diese BauAPP-Version ({SCHEMA_VERSION})")
+    if version == SCHEMA_VERSION:
+        if seed:
+            seed_demo_data(conn)
+        conn.close()
+        return
+
     with open(schema_path, "r", encoding="utf-8") as f:
         conn.executescript(f.read())
     
@@ -61,6 +99,7 @@ def init_db(db_file: str, schema_path: str) -> None:
     for col, ddl in [
         ("description", "ALTER TABLE projects ADD COLUMN description TEXT;"),
         ("image_url", "ALTER TABLE projects ADD COLUMN image_url TEXT;"),
+        ("cold_at", "ALTER TABLE projects ADD COLUMN cold_at TEXT;"),
     ]:
         if not column_exists("projects", col):
             conn.execute(ddl)
@@ -70,24 +109,75 @@ def init_db(db_file: str, schema_path: str) -> None:
         ("start_time", "ALTER TABLE reports ADD COLUMN start_time TEXT;"),
         ("end_time", "ALTER TABLE reports ADD COLUMN end_time TEXT;"),
         ("break_minutes", "ALTER TABLE reports ADD COLUMN break_minutes INTEGER;"),
+        ("client_key", "ALTER TABLE reports ADD COLUMN client_key TEXT;"),
     ]:
         if not column_exists("reports", col):
             conn.execute(ddl)
+    # idempotent submissions (POST /api/reports/batch); here because old DBs get the column above
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_reports_client_key ON reports(user_id, client_key) "
+        "WHERE client_key IS NOT NULL;"
+    )
+
+    # photo metadata (captured at upload; older photos keep NULLs)
+    for col, ddl in [
+        ("captured_at", "ALTER TABLE report_images ADD COLUMN captured_at TEXT;"),
+        ("lat", "ALTER TABLE report_images ADD COLUMN lat REAL;"),
+        ("lon", "ALTER TABLE report_images ADD COLUMN lon REAL;"),
+        ("width", "ALTER TABLE report_images ADD COLUMN width INTEGER;"),
+        ("height", "ALTER TABLE report_images ADD COLUMN height INTEGER;"),
+        ("byte_size", "ALTER TABLE report_images ADD COLUMN byte_size INTEGER;"),
+        ("phash", "ALTER TABLE report_images ADD COLUMN phash INTEGER;"),
+    ]:
+        if not column_exists("report_images", col):
+            conn.execute(ddl)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_report_images_captured ON report_images(captured_at) "
+        "WHERE captured_at IS NOT NULL;"
+    )
+    # bounding-box queries: range on lat from the index, lon checked on the index entry
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_report_images_geo ON report_images(lat, lon) WHERE lat IS NOT NULL;")
 
     # archived status: can't change CHECK easily; in dev we accept without enforcing via app logic.
 
+    # denormalized project stats (kept up to date by triggers below)
+    stats_added = False
+    for col, ddl in [
+        ("reports_count", "ALTER TABLE projects ADD COLUMN reports_count INTEGER NOT NULL DEFAULT 0;"),
+        ("images_count", "ALTER TABLE projects ADD COLUMN images_count INTEGER NOT NULL DEFAULT 0;"),
+        ("last_report_at", "ALTER TABLE projects ADD COLUMN last_report_at TEXT;"),
+    ]:
+        if not column_exists("projects", col):
+            conn.execute(ddl)
+            stats_added = True
+    create_project_stats_triggers(conn)
+    if stats_added:
+        reconcile_project_stats(conn)
+
+    # normalized quick actions (report_tags); backfill once when the triggers are new
+    tags_new = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='trg_reports_insert_tags'"
+    ).fetchone() is None
+    create_report_tag_triggers(conn)
+    if tags_new:
+        rebuild_report_tags(conn)
+
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
+    if seed:
+        seed_demo_data(conn)
+    conn.close()
 
+def seed_demo_data(conn) -> None:
+    """Demo users/projects/reports. conn may be a sqlite3 connection or a repositories Store."""
     # Seed users (id stable per run if exists already)
     now = datetime.datetime.utcnow().isoformat() + "Z"
 
     def upsert_user(username: str, name: str, role: str, password: str) -> str:
         row = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
         if row:
-            conn.execute(
-                "UPDATE users SET name = ?, role = ?, password_hash = ? WHERE id = ?",
-                (name, role, generate_password_hash(password), row["id"])
-            )
+            # keep the existing hash: hashing costs ~100 ms per user on every (worker) start
+            conn.execute("UPDATE users SET name = ?, role = ? WHERE id = ?", (name, role, row["id"]))
             return row["id"]
         uid = str(uuid.uuid4())
         conn.execute(
@@ -117,7 +207,7 @@ def init_db(db_file: str, schema_path: str) -> None:
             (pid, name, address, customer, status, now, desc, img)
         )
         conn.execute(
-            "INSERT OR IGNORE INTO project_assignments (project_id, user_id) VALUES (?, ?)",
+            "INSERT INTO project_assignments (project_id, user_id) VALUES (?, ?) ON CONFLICT DO NOTHING",
             (pid, worker_id)
         )
 
@@ -137,7 +227,124 @@ def init_db(db_file: str, schema_path: str) -> None:
             (rid, pid, worker_id, text, json.dumps(qas, ensure_ascii=False), weather, workers, now)
         )
     conn.commit()
-    conn.close()
+
+# Incremental on insert and delete (a bulk delete stays linear). A report's photos are
+# subtracted before the report row goes; the report_images cascade runs after it is gone,
+# so the per-photo trigger only counts photos deleted on their own. last_report_at is
+# looked up again (idx_reports_project_created) only when the newest report was deleted.
+# The full recompute below is for reconcile/repair.
+_RECOMPUTE_PROJECT_STATS = """
+    UPDATE projects SET
+        reports_count = (SELECT COUNT(*) FROM reports r WHERE r.project_id = projects.id),
+        images_count = (SELECT COUNT(*) FROM report_images ri JOIN reports r ON r.id = ri.report_id
+                        WHERE r.project_id = projects.id),
+        last_report_at = (SELECT MAX(r.created_at) FROM reports r WHERE r.project_id = projects.id)
+"""
+
+def create_project_stats_triggers(conn: sqlite3.Connection) -> None:
+    conn.executescript("""
+        -- schema < 4 recomputed the whole project on every delete
+        DROP TRIGGER IF EXISTS trg_reports_delete_stats;
+        DROP TRIGGER IF EXISTS trg_report_images_delete_stats;
+
+        CREATE TRIGGER IF NOT EXISTS trg_reports_insert_stats AFTER INSERT ON reports
+        BEGIN
+            UPDATE projects SET
+                reports_count = reports_count + 1,
+                last_report_at = CASE
+                    WHEN last_report_at IS NULL OR NEW.created_at > last_report_at THEN NEW.created_at
+                    ELSE last_report_at END
+            WHERE id = NEW.project_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_reports_before_delete_stats BEFORE DELETE ON reports
+        BEGIN
+            UPDATE projects SET
+                images_count = images_count - (SELECT COUNT(*) FROM report_images WHERE report_id = OLD.id)
+            WHERE id = OLD.project_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_reports_delete_stats AFTER DELETE ON reports
+        BEGIN
+            UPDATE projects SET
+                reports_count = reports_count - 1,
+                last_report_at = CASE
+                    WHEN OLD.created_at = last_report_at
+                    THEN (SELECT MAX(r.created_at) FROM reports r WHERE r.project_id = OLD.project_id)
+                    ELSE last_report_at END
+            WHERE id = OLD.project_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_report_images_insert_stats AFTER INSERT ON report_images
+        BEGIN
+            UPDATE projects SET images_count = images_count + 1
+            WHERE id = (SELECT project_id FROM reports WHERE id = NEW.report_id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_report_images_delete_stats AFTER DELETE ON report_images
+        BEGIN
+            UPDATE projects SET images_count = images_count - 1
+            WHERE id = (SELECT project_id FROM reports WHERE id = OLD.report_id);
+        END;
+    """)
+
+def reconcile_project_stats(conn: sqlite3.Connection) -> int:
+    """Recompute reports_count/images_count/last_report_at for all projects. Returns rows updated.
+    Projects in the cold archive keep their stats, their reports are not in these tables."""
+    cur = conn.execute(_RECOMPUTE_PROJECT_STATS + " WHERE cold_at IS NULL")
+    conn.commit()
+    return cur.rowcount
+
+def recompute_project_stats(conn: sqlite3.Connection, project_id: str) -> None:
+    conn.execute(_RECOMPUTE_PROJECT_STATS + " WHERE id = ?", (project_id,))
+
+def tags_from_json(raw) -> List[str]:
+    """The report_tags rows of a quick_actions value, for reports outside the hot tables
+    (cold archive) and rows read without the tag join (exports)."""
+    try:
+        values = json.loads(raw or "[]")
+    except ValueError:
+        return []
+    return [v for v in values if isinstance(v, str) and v.strip(" ")] if isinstance(values, list) else []
+
+# Tolerates NULL/invalid JSON and non-array values the same way the old json.loads fallbacks did.
+def _tags_select(report_id: str, quick_actions: str, source: str = "") -> str:
+    qa = f"COALESCE(CASE WHEN json_valid({quick_actions}) THEN CASE WHEN json_type({quick_actions}) = 'array' THEN {quick_actions} END END, '[]')"
+    return f"""
+        SELECT {report_id}, CAST(je.key AS INTEGER), je.value
+        FROM {source}json_each({qa}) je
+        WHERE je.type = 'text' AND trim(je.value) <> ''
+    """
+
+def tags_match_sql(quick_actions: str, count: int) -> str:
+    """Condition: the quick_actions JSON expression has any of `count` tags (? placeholders),
+    by the report_tags rules; for report rows outside the hot tables (cold archive)."""
+    marks = ", ".join("?" for _ in range(count))
+    return f"EXISTS (SELECT 1 FROM ({_tags_select('NULL', quick_actions)}) WHERE value IN ({marks}))"
+
+def create_report_tag_triggers(conn: sqlite3.Connection) -> None:
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_reports_insert_tags AFTER INSERT ON reports
+        BEGIN
+            INSERT INTO report_tags (report_id, position, tag) {_tags_select("NEW.id", "NEW.quick_actions")};
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_reports_update_tags AFTER UPDATE OF quick_actions ON reports
+        BEGIN
+            DELETE FROM report_tags WHERE report_id = NEW.id;
+            INSERT INTO report_tags (report_id, position, tag) {_tags_select("NEW.id", "NEW.quick_actions")};
+        END;
+    """)
+
+def rebuild_report_tags(conn: sqlite3.Connection) -> int:
+    """Refill report_tags from reports.quick_actions. Returns the number of tag rows."""
+    conn.execute("DELETE FROM report_tags")
+    cur = conn.execute(
+        "INSERT INTO report_tags (report_id, position, tag) "
+        + _tags_select("r.id", "r.quick_actions", source="reports r, ")
+    )
+    conn.commit()
+    return cur.rowcount
 
 def ensure_upload_root(upload_root: str) -> None:
     os.makedirs(upload_root, exist_ok=True)
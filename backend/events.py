@@ -0,0 +1,185 @@
+"""Server-Sent Events: change log + in-process pub/sub.
+
+Write endpoints call ``record_event`` inside their transaction (the change_log row id
+becomes the SSE event id) and ``broker.publish`` after committing. Each connected
+client gets a bounded buffer; a client that falls behind is disconnected and resumes
+from the change log via ``Last-Event-ID`` when the browser reconnects.
+
+``broker.publish`` only reaches streams in the same process. Under several gunicorn workers
+each stream therefore also tails change_log (``id >`` the last one seen, every
+SSE_POLL_SECONDS), so an event written by another worker arrives a few seconds later;
+events seen both ways are sent once.
+
+Each event stores its audience (the workers assigned to the project at that moment),
+so live delivery and replay use the same cheap visibility check. Admins see everything.
+With tenants (tenants.py) events and subscribers carry the tenant; they only meet
+within one tenant.
+"""
+import json
+import queue
+import time
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from instrumentation import Gauge, register_metric
+
+HEARTBEAT_SECONDS = 15
+REPLAY_LIMIT = 1000
+
+def _iso_now() -> str:
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+def record_event(conn, event_type: str, project_id: Optional[str], data: dict,
+                 audience: Optional[List[str]] = None, retention_days: int = 7) -> dict:
+    """Append an event to change_log. The caller commits, then passes the result to broker.publish."""
+    if audience is None:
+        audience = []
+        if project_id:
+            rows = conn.execute("SELECT user_id FROM project_assignments WHERE project_id = ?", (project_id,)).fetchall()
+            audience = [r["user_id"] for r in rows]
+    now = _iso_now()
+    event_id = conn.execute(
+        "INSERT INTO change_log (type, project_id, audience, data, created_at) VALUES (?, ?, ?, ?, ?) RETURNING id",
+        (event_type, project_id, json.dumps(sorted(set(audience))), json.dumps(data, ensure_ascii=False), now)
+    ).fetchone()[0]
+    if event_id % 500 == 0:
+        cutoff = (datetime.datetime.utcnow() - datetime.timedelta(days=retention_days)).isoformat() + "Z"
+        conn.execute("DELETE FROM change_log WHERE created_at < ?", (cutoff,))
+    return {
+        "id": event_id,
+        "type": event_type,
+        "projectId": project_id,
+        "audience": frozenset(audience),
+        "data": data,
+        "createdAt": now,
+    }
+
+def _visible(event: dict, user_id: str, is_admin: bool) -> bool:
+    return is_admin or user_id in event["audience"]
+
+def format_sse(event: dict) -> str:
+    payload = json.dumps({"projectId": event["projectId"], "createdAt": event["createdAt"], **event["data"]}, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+class Subscriber:
+    __slots__ = ("user_id", "is_admin", "tenant", "queue", "overflowed")
+
+    def __init__(self, user_id: str, is_admin: bool, buffer_size: int, tenant: Optional[str] = None):
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.tenant = tenant
+        self.queue: "queue.Queue[dict]" = queue.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, user_id: str, is_admin: bool, buffer_size: int, tenant: Optional[str] = None) -> Subscriber:
+        sub = Subscriber(user_id, is_admin, buffer_size, tenant)
+        with self._lock:
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            try:
+                self._subscribers.remove(sub)
+            except ValueError:
+                pass
+
+    def publish(self, *events: dict) -> None:
+        with self._lock:
+            subs = list(self._subscribers)
+        for event in events:
+            for sub in subs:
+                if sub.overflowed or sub.tenant != event.get("tenant") or not _visible(event, sub.user_id, sub.is_admin):
+                    continue
+                try:
+                    sub.queue.put_nowait(event)
+                except queue.Full:
+                    sub.overflowed = True
+
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+broker = Broker()
+
+register_metric(Gauge("bauapp_sse_clients", "Connected /api/events streams.", (), lambda: {(): broker.client_count()}))
+
+def _events_after(conn, last_event_id: int) -> List[dict]:
+    rows = conn.execute(
+        "SELECT * FROM change_log WHERE id > ? ORDER BY id ASC LIMIT ?", (last_event_id, REPLAY_LIMIT)
+    ).fetchall()
+    return [{
+        "id": r["id"],
+        "type": r["type"],
+        "projectId": r["project_id"],
+        "audience": frozenset(json.loads(r["audience"] or "[]")),
+        "data": json.loads(r["data"] or "{}"),
+        "createdAt": r["created_at"],
+    } for r in rows]
+
+def replay_events(conn, last_event_id: int, user_id: str, is_admin: bool) -> List[dict]:
+    return [e for e in _events_after(conn, last_event_id) if _visible(e, user_id, is_admin)]
+
+def tail_events(conn, last_event_id: int, user_id: str, is_admin: bool) -> Tuple[List[dict], int]:
+    """replay_events plus the id to continue after: the last row read, visible or not."""
+    events = _events_after(conn, last_event_id)
+    return ([e for e in events if _visible(e, user_id, is_admin)],
+            events[-1]["id"] if events else last_event_id)
+
+def latest_event_id(conn) -> int:
+    return conn.execute("SELECT COALESCE(MAX(id), 0) AS id FROM change_log").fetchone()["id"]
+
+def stream(sub: Subscriber, backlog: List[dict], last_event_id: int,
+           poll: Optional[Callable[[int], Tuple[List[dict], int]]] = None,
+           poll_seconds: float = 3) -> Iterator[str]:
+    """Generator for the SSE response body. Always unsubscribes when the client goes away.
+    poll(after_id): tail_events() of the client's database (picks up other workers' events)."""
+    # ids already sent; pushed events may commit out of id order, so this, not last_event_id, dedupes
+    sent: "OrderedDict[int, None]" = OrderedDict()
+
+    def fresh(event: dict) -> bool:
+        if event["id"] in sent:
+            return False
+        sent[event["id"]] = None
+        if len(sent) > REPLAY_LIMIT:
+            sent.popitem(last=False)
+        return True
+
+    try:
+        yield "retry: 3000\n\n"
+        for event in backlog:
+            last_event_id = max(last_event_id, event["id"])
+            fresh(event)
+            yield format_sse(event)
+        now = time.monotonic()
+        next_poll, next_ping = now + poll_seconds, now + HEARTBEAT_SECONDS
+        while True:
+            deadline = min(next_poll, next_ping) if poll else next_ping
+            try:
+                events = [sub.queue.get(timeout=max(0.0, deadline - time.monotonic()))]
+            except queue.Empty:
+                if sub.overflowed:
+                    return
+                events = []
+            if poll and time.monotonic() >= next_poll:
+                polled, last_event_id = poll(last_event_id)
+                events += polled
+                next_poll = time.monotonic() + poll_seconds
+            out = [format_sse(e) for e in events if fresh(e)]
+            if out:
+                next_ping = time.monotonic() + HEARTBEAT_SECONDS
+                yield "".join(out)
+            elif time.monotonic() >= next_ping:
+                next_ping = time.monotonic() + HEARTBEAT_SECONDS
+                yield ": ping\n\n"
+            if sub.overflowed and sub.queue.empty():
+                return  # client was too slow; it reconnects and replays from the change log
+    finally:
+        broker.unsubscribe(sub)
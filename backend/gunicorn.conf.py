@@ -0,0 +1,26 @@
+# Production server: gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported once in the master (preload_app) with PRELOAD_HEAVY_MODULES=1, so
+# ReportLab, Pillow, OpenCV and NumPy are loaded before the workers are forked and their
+# pages are shared copy-on-write instead of being imported again by every worker.
+import gc
+import os
+import sys
+
+os.environ.setdefault("PRELOAD_HEAVY_MODULES", "1")
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# threads: SSE clients (/api/events) hold a thread each for as long as they are connected
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = True
+
+def when_ready(server):
+    # connections opened while importing the app (init_storage) must not be inherited
+    if "repositories.postgres" in sys.modules:
+        sys.modules["repositories.postgres"].close_pools()
+    # objects created so far are never freed; keep the collector from touching (and so
+    # un-sharing) their pages in the workers
+    gc.freeze()
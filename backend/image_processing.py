@@ -1,11 +1,23 @@
 import os
+import io
+import re
 import uuid
+import hashlib
 import datetime
-from typing import List, Tuple
+import functools
+from typing import Dict, List, Optional, Tuple
 from werkzeug.utils import secure_filename
-from PIL import Image
 
+AVATAR_SIZES = (64, 128, 256)
+# <user_id>_<content hash>_<size>.<ext>; the hash makes the URL safe to cache as immutable
+AVATAR_NAME_RE = re.compile(r"^(?P<stem>.+_[0-9a-f]{12})_(?P<size>\d+)\.(?P<ext>webp|jpg)$")
+
+# Pillow (which pulls in NumPy), OpenCV and NumPy are imported on first use, not at app
+# import: workers start faster and processes that never touch images don't pay for them.
+# preload_heavy_modules() in app.py loads them up front for pre-fork servers.
+@functools.lru_cache(maxsize=None)
 def _try_import_cv2():
+    """(cv2, numpy) or (None, None); cached, so a missing OpenCV is only looked up once."""
     try:
         import cv2
         import numpy as np
@@ -13,21 +25,100 @@ def _try_import_cv2():
     except Exception:
         return None, None
 
-def _compress_jpeg(path: str, quality: int = 80) -> None:
-    with Image.open(path) as im:
+def preload() -> None:
+    """Import Pillow (with its format plugins), OpenCV and NumPy now instead of on first use."""
+    from PIL import Image
+
+    Image.init()
+    _try_import_cv2()
+
+# -----------------------
+# Decode guard
+# -----------------------
+# Uploads are decoded only up to a pixel budget (IMAGE_MAX_MEGAPIXELS). The size comes
+# from the file header (Image.open decodes nothing); JPEGs above the budget are decoded
+# at 1/2, 1/4 or 1/8 scale by libjpeg itself (draft), so the full-size bitmap never
+# exists. Other formats can't be scaled while decoding and are rejected above it, as is
+# anything Pillow flags as a decompression bomb.
+DEFAULT_MAX_PIXELS = 24_000_000
+JPEG_DRAFT_SCALES = (2, 4, 8)
+
+class ImageTooLarge(ValueError):
+    def __init__(self, name: str, pixels: int, max_pixels: int):
+        size = f"{pixels / 1e6:.0f} MP" if pixels else "zu groß"
+        super().__init__(f"{name}: {size}, erlaubt {max_pixels / 1e6:.0f} MP")
+        self.name = name
+
+def open_bounded(fp, max_pixels: int = DEFAULT_MAX_PIXELS, name: str = "Bild", draft_size=None):
+    """Image.open() whose decode will stay within max_pixels; raises ImageTooLarge.
+    draft_size: the caller only needs about this size (JPEG decodes at the nearest scale above)."""
+    from PIL import Image
+
+    try:
+        im = Image.open(fp)
+    except Image.DecompressionBombError:
+        raise ImageTooLarge(name, 0, max_pixels) from None
+    if draft_size and im.format == "JPEG":
+        im.draft("RGB", draft_size)  # Pillow applies only the first draft() per image
+    w, h = im.size
+    if w * h <= max_pixels:
+        return im
+    if im.format == "JPEG" and not draft_size:
+        for scale in JPEG_DRAFT_SCALES:
+            dw, dh = -(-w // scale), -(-h // scale)
+            if dw * dh <= max_pixels:
+                im.draft("RGB", (dw, dh))
+                return im
+    im.close()
+    raise ImageTooLarge(name, w * h, max_pixels)
+
+def _header_pixels(path: str) -> int:
+    """Pixel count from the file header; 0 if it isn't an image Pillow can read."""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as im:
+            w, h = im.size
+    except Image.DecompressionBombError:
+        return Image.MAX_IMAGE_PIXELS * 2 + 1
+    except Exception:
+        return 0
+    return w * h
+
+def _compress_jpeg(path: str, quality: int = 80, max_pixels: int = DEFAULT_MAX_PIXELS) -> None:
+    with open_bounded(path, max_pixels) as im:
         im = im.convert("RGB")
         im.save(path, format="JPEG", quality=quality, optimize=True)
 
+SCAN_DETECT_PIXELS = 2_000_000
+
+def _detect_flag(cv2, path: str) -> int:
+    """imread flag for the outline detection: grayscale, reduced (JPEGs decode directly at
+    1/2, 1/4, 1/8 scale) until it is at most SCAN_DETECT_PIXELS."""
+    from PIL import Image
+
+    with Image.open(path) as im:
+        w, h = im.size  # header only
+    for scale, flag in ((1, cv2.IMREAD_GRAYSCALE), (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+                        (4, cv2.IMREAD_REDUCED_GRAYSCALE_4)):
+        if (w // scale) * (h // scale) <= SCAN_DETECT_PIXELS:
+            return flag
+    return cv2.IMREAD_REDUCED_GRAYSCALE_8
+
 def _scan_document_opencv(path: str) -> Tuple[bool, str | None]:
     cv2, np = _try_import_cv2()
     if cv2 is None:
         return False, "OpenCV nicht verfügbar – Scan übersprungen."
 
-    img = cv2.imread(path)
-    if img is None:
+    # outline detection on a grayscale copy decoded at reduced scale (<= SCAN_DETECT_PIXELS);
+    # only the warp below needs the full-resolution color image
+    try:
+        gray = cv2.imread(path, _detect_flag(cv2, path))
+    except Exception:
+        gray = None
+    if gray is None:
         return False, "Bild konnte nicht geladen werden – Scan übersprungen."
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     edges = cv2.Canny(gray, 50, 150)
     contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     if not contours:
@@ -35,7 +126,8 @@ def _scan_document_opencv(path: str) -> Tuple[bool, str | None]:
 
     largest = max(contours, key=cv2.contourArea)
     area = cv2.contourArea(largest)
-    h, w = img.shape[:2]
+    h, w = gray.shape[:2]
+    del edges, gray
     if area < (h * w * 0.30):  # per checklist: 30% threshold
         return False, "Kontur zu klein – Scan übersprungen."
 
@@ -44,7 +136,13 @@ def _scan_document_opencv(path: str) -> Tuple[bool, str | None]:
     if len(approx) != 4:
         return False, "Keine 4 Ecken erkannt – Scan übersprungen."
 
+    img = cv2.imread(path)
+    if img is None:
+        return False, "Bild konnte nicht geladen werden – Scan übersprungen."
+    # corners back to full resolution (the reduced decode rounds its size up)
     pts = approx.reshape(4, 2).astype("float32")
+    pts[:, 0] *= img.shape[1] / w
+    pts[:, 1] *= img.shape[0] / h
 
     # order points
     rect = np.zeros((4, 2), dtype="float32")
@@ -70,9 +168,93 @@ def _scan_document_opencv(path: str) -> Tuple[bool, str | None]:
     cv2.imwrite(path, warped)
     return True, None
 
-def save_images_for_report(upload_dir: str, files, apply_scan: bool = True, max_images: int = 10) -> List[str]:
+# EXIF tags (Pillow's getexif(): base IFD, Exif sub-IFD 0x8769, GPS sub-IFD 0x8825)
+_EXIF_IFD, _GPS_IFD = 0x8769, 0x8825
+_DATETIME, _DATETIME_ORIGINAL = 306, 36867
+_GPS_LAT_REF, _GPS_LAT, _GPS_LON_REF, _GPS_LON = 1, 2, 3, 4
+
+def _exif_datetime(value) -> Optional[str]:
+    """'2026:09:14 07:31:02' -> '2026-09-14T07:31:02' (camera local time, as recorded)."""
+    try:
+        return datetime.datetime.strptime(str(value).strip("\x00 ")[:19], "%Y:%m:%d %H:%M:%S").isoformat()
+    except ValueError:
+        return None
+
+def _gps_degrees(dms, ref) -> Optional[float]:
+    try:
+        d, m, sec = (float(v) for v in dms)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    deg = d + m / 60.0 + sec / 3600.0
+    return round(-deg if str(ref).upper().startswith(("S", "W")) else deg, 7)
+
+def photo_metadata(im) -> dict:
+    """Capture time and GPS position from an opened image's EXIF (before it is re-encoded)."""
+    meta = {"captured_at": None, "lat": None, "lon": None}
+    try:
+        exif = im.getexif()
+    except Exception:
+        return meta
+    meta["captured_at"] = _exif_datetime(
+        exif.get_ifd(_EXIF_IFD).get(_DATETIME_ORIGINAL) or exif.get(_DATETIME) or ""
+    )
+    gps = exif.get_ifd(_GPS_IFD)
+    if gps.get(_GPS_LAT) and gps.get(_GPS_LON):
+        lat = _gps_degrees(gps[_GPS_LAT], gps.get(_GPS_LAT_REF, "N"))
+        lon = _gps_degrees(gps[_GPS_LON], gps.get(_GPS_LON_REF, "E"))
+        if lat is not None and lon is not None and -90 <= lat <= 90 and -180 <= lon <= 180:
+            meta["lat"], meta["lon"] = lat, lon
+    return meta
+
+def _file_metadata(path: str) -> dict:
+    """Size of the stored file and its dimensions (header only, nothing is decoded)."""
+    from PIL import Image
+
+    meta = {"width": None, "height": None, "byte_size": os.path.getsize(path)}
+    try:
+        with Image.open(path) as im:
+            meta["width"], meta["height"] = im.size
+    except Exception:
+        pass
+    return meta
+
+HASH_SIZE = 8  # 8x8 gradient bits = 64-bit hash
+
+def photo_hash(path: str) -> Optional[int]:
+    """Difference hash (dHash) of a stored photo: one bit per horizontal brightness step of a
+    9x8 grayscale thumbnail. Near-identical shots differ in a few bits (photo_index.py).
+    Signed 64-bit so it fits an SQL BIGINT; None if the file can't be read."""
+    import numpy as np
+    from PIL import Image
+
+    try:
+        with Image.open(path) as im:
+            im.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))  # JPEG: decode at 1/8 scale
+            small = im.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    except Exception:
+        return None
+    px = np.asarray(small, dtype=np.int16)
+    value = int(np.packbits(px[:, 1:] > px[:, :-1]).view(">u8")[0])
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _discard(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def save_images_for_report(upload_dir: str, files, apply_scan: bool = True, max_images: int = 10,
+                           max_pixels: int = DEFAULT_MAX_PIXELS) -> List[Tuple[str, dict]]:
+    """Store uploaded photos as upright JPEGs. Returns (path, metadata) per photo; metadata
+    (captured_at, lat, lon, width, height, byte_size, phash) is read here because re-encoding drops EXIF.
+
+    Raises ImageTooLarge (nothing of this call is left on disk) for a photo that can't be
+    decoded within max_pixels; larger JPEGs are stored downscaled."""
+    from PIL import ImageOps
+
     os.makedirs(upload_dir, exist_ok=True)
-    saved_paths: List[str] = []
+    saved: List[Tuple[str, dict]] = []
 
     ts = datetime.datetime.utcnow().strftime("%Y-%m-%d_%H%M%S")
     for i, f in enumerate(files[:max_images]):
@@ -85,30 +267,108 @@ def save_images_for_report(upload_dir: str, files, apply_scan: bool = True, max_
         f.save(raw_path)
 
         # Ensure jpeg + compression
+        meta = {"captured_at": None, "lat": None, "lon": None}
+        processed = False
         try:
-            with Image.open(raw_path) as im:
-                im = im.convert("RGB")
-                jpeg_name = os.path.splitext(fname)[0] + "_processed.jpg"
-                out_path = os.path.join(upload_dir, jpeg_name)
-                im.save(out_path, format="JPEG", quality=90, optimize=True)
+            with open_bounded(raw_path, max_pixels, safe or fname) as im:
+                meta = photo_metadata(im)
+                rgb = im.convert("RGB")  # the (possibly drafted) decode happens here
+            # the EXIF orientation tag is dropped below: rotate the pixels instead
+            rgb = ImageOps.exif_transpose(rgb)
+            jpeg_name = os.path.splitext(fname)[0] + "_processed.jpg"
+            out_path = os.path.join(upload_dir, jpeg_name)
+            rgb.save(out_path, format="JPEG", quality=90, optimize=True)
+            del rgb
+            processed = True
             # remove raw if different
             if out_path != raw_path:
                 try:
                     os.remove(raw_path)
                 except Exception:
                     pass
+        except ImageTooLarge:
+            _discard([raw_path] + [p for p, _ in saved])
+            raise
         except Exception:
-            # keep raw as fallback
+            # keep raw as fallback, but only within the budget: a corrupt oversized JPEG
+            # would otherwise be decoded at full size by everything that reads it later
+            pixels = _header_pixels(raw_path)
+            if pixels > max_pixels:
+                _discard([raw_path] + [p for p, _ in saved])
+                raise ImageTooLarge(safe or fname, pixels, max_pixels) from None
             out_path = raw_path
 
-        if apply_scan:
-            _scan_document_opencv(out_path)
+        # only our own bounded JPEG is decoded again; an unreadable upload stays as it is
+        if processed:
+            if apply_scan:
+                _scan_document_opencv(out_path)
+            try:
+                _compress_jpeg(out_path, quality=80, max_pixels=max_pixels)
+            except Exception:
+                pass
 
-        try:
-            _compress_jpeg(out_path, quality=80)
-        except Exception:
-            pass
+        meta["phash"] = photo_hash(out_path) if processed else None
+        saved.append((out_path, {**meta, **_file_metadata(out_path)}))
+
+    return saved
+
+def _avatar_format() -> Tuple[str, str]:
+    from PIL import features
+
+    return ("WEBP", "webp") if features.check("webp") else ("JPEG", "jpg")
+
+def save_avatar(avatars_dir: str, stream, user_id: str, max_pixels: int = DEFAULT_MAX_PIXELS) -> Dict[int, str]:
+    """Center-crop an uploaded avatar and write fixed-size variants. Returns {size: path}.
 
-        saved_paths.append(out_path)
+    Raises on unreadable images (ImageTooLarge above max_pixels).
+    """
+    from PIL import Image, ImageOps
 
-    return saved_paths
+    os.makedirs(avatars_dir, exist_ok=True)
+    fmt, ext = _avatar_format()
+    biggest = AVATAR_SIZES[-1]
+
+    # JPEG only: decode at reduced scale, a 12 MP photo never gets fully decoded
+    with open_bounded(stream, max_pixels, "Avatar", draft_size=(biggest * 2, biggest * 2)) as im:
+        im = ImageOps.exif_transpose(im)
+        im = im.convert("RGB")
+        w, h = im.size
+        side = min(w, h)
+        left = (w - side) // 2
+        top = (h - side) // 2
+        square = im.crop((left, top, left + side, top + side))
+
+    encoded: Dict[int, bytes] = {}
+    for size in AVATAR_SIZES:
+        variant = square.resize((size, size), Image.LANCZOS) if side != size else square
+        buf = io.BytesIO()
+        if fmt == "WEBP":
+            variant.save(buf, format=fmt, quality=82, method=4)
+        else:
+            variant.save(buf, format=fmt, quality=85, optimize=True)
+        encoded[size] = buf.getvalue()
+
+    digest = hashlib.sha256(b"".join(encoded[s] for s in AVATAR_SIZES)).hexdigest()[:12]
+    paths: Dict[int, str] = {}
+    for size, data in encoded.items():
+        path = os.path.join(avatars_dir, f"{user_id}_{digest}_{size}.{ext}")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths[size] = path
+    return paths
+
+def remove_stale_avatars(avatars_dir: str, user_id: str, keep: List[str]) -> None:
+    keep_names = {os.path.basename(p) for p in keep}
+    try:
+        names = os.listdir(avatars_dir)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name in keep_names:
+            continue
+        # legacy "<user_id>.<ext>" and older hashed variants
+        if os.path.splitext(name)[0] == user_id or name.startswith(f"{user_id}_"):
+            try:
+                os.remove(os.path.join(avatars_dir, name))
+            except Exception:
+                pass
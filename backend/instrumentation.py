@@ -0,0 +1,326 @@
+"""Optional request instrumentation: SQL counters, stage timings, /metrics, slow-request profiles.
+
+Everything here is off unless METRICS_ENABLED=1 or PROFILE_SLOW_MS>0. When off,
+``init_instrumentation`` registers nothing and ``db.get_db`` keeps returning plain
+``sqlite3.Connection`` objects, so there is no overhead.
+"""
+import os
+import time
+import random
+import sqlite3
+import threading
+import contextlib
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, Response, g, has_request_context, request
+
+import db
+
+# Seconds. Covers cheap lookups up to multi-second PDF exports.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000, 5000)
+
+class RequestStats:
+    __slots__ = ("start", "queries", "db_seconds", "stages")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.stages: Dict[str, float] = {}
+
+def current_stats() -> Optional[RequestStats]:
+    if not has_request_context():
+        return None
+    return g.get("_req_stats")
+
+@contextlib.contextmanager
+def timed(stage: str):
+    """Time a named stage (image, pdf, ...) of the current request; no-op outside requests."""
+    stats = current_stats()
+    if stats is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.stages[stage] = stats.stages.get(stage, 0.0) + (time.perf_counter() - t0)
+
+# -----------------------
+# SQLite
+# -----------------------
+def _add_db_time(t0: float) -> None:
+    stats = current_stats()
+    if stats is not None:
+        stats.db_seconds += time.perf_counter() - t0
+
+def _count_statement(_sql: str) -> None:
+    stats = current_stats()
+    if stats is not None:
+        stats.queries += 1
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(*args, **kwargs)
+        finally:
+            _add_db_time(t0)
+
+    def executemany(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(*args, **kwargs)
+        finally:
+            _add_db_time(t0)
+
+    def executescript(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().executescript(*args, **kwargs)
+        finally:
+            _add_db_time(t0)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _add_db_time(t0)
+
+    def fetchmany(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            _add_db_time(t0)
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _add_db_time(t0)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose statements are counted (trace callback) and timed (cursor wrappers)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_count_statement)
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+    # sqlite3.Connection.execute* do not go through cursor(), so route them explicitly
+    def execute(self, *args, **kwargs):
+        return self.cursor().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self.cursor().executemany(*args, **kwargs)
+
+    def executescript(self, *args, **kwargs):
+        return self.cursor().executescript(*args, **kwargs)
+
+    def commit(self):
+        t0 = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _add_db_time(t0)
+
+# -----------------------
+# Prometheus-style metrics
+# -----------------------
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], labels: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._series: Dict[tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, s in items:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+            sep = "," if base else ""
+            for i, b in enumerate(self.buckets):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{b:g}"}} {s[i]}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {s[-1]}')
+            plain = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{plain} {s[-2]:.6f}")
+            lines.append(f"{self.name}_count{plain} {s[-1]}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, v in items:
+            lines.append(f"{self.name}{_label_str(self.labels, label_values)} {v:g}")
+        return lines
+
+class Gauge:
+    """Sampled at scrape time through a callback returning {label values: value}."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], sample):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.sample = sample
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for label_values, v in sorted(self.sample().items()):
+            lines.append(f"{self.name}{_label_str(self.labels, label_values)} {v:g}")
+        return lines
+
+def _label_str(labels: Tuple[str, ...], values: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in zip(labels, values)) + "}"
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+REQUEST_SECONDS = Histogram("bauapp_request_duration_seconds", "Request latency per route.", LATENCY_BUCKETS, ("method", "route", "status"))
+DB_SECONDS = Histogram("bauapp_request_db_seconds", "SQLite time per request.", LATENCY_BUCKETS, ("method", "route"))
+DB_QUERIES = Histogram("bauapp_request_db_queries", "SQL statements per request.", QUERY_BUCKETS, ("method", "route"))
+STAGE_SECONDS = Histogram("bauapp_stage_duration_seconds", "Image/PDF processing stages.", LATENCY_BUCKETS, ("stage", "route"))
+
+METRICS = [REQUEST_SECONDS, DB_SECONDS, DB_QUERIES, STAGE_SECONDS]
+
+def register_metric(metric):
+    """Other modules add their own metrics here so /metrics picks them up."""
+    METRICS.append(metric)
+    return metric
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for m in METRICS:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+# -----------------------
+# Profiling
+# -----------------------
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler  # sampling, low overhead
+        prof = Profiler()
+        prof.start()
+        return ("pyinstrument", prof)
+    except ImportError:
+        import cProfile
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            return None  # another profiler already active in this thread
+        return ("cprofile", prof)
+
+def _dump_profile(handle, profile_dir: str, route: str, elapsed_ms: float) -> None:
+    kind, prof = handle
+    os.makedirs(profile_dir, exist_ok=True)
+    safe_route = "".join(c if c.isalnum() else "_" for c in route).strip("_") or "root"
+    base = os.path.join(profile_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{request.method}_{safe_route}_{int(elapsed_ms)}ms")
+    if kind == "pyinstrument":
+        with open(base + ".html", "w", encoding="utf-8") as f:
+            f.write(prof.output_html())
+    else:
+        prof.dump_stats(base + ".prof")
+
+def _stop_profiler(handle) -> None:
+    kind, prof = handle
+    if kind == "pyinstrument":
+        prof.stop()
+    else:
+        prof.disable()
+
+# -----------------------
+# Flask wiring
+# -----------------------
+def _route_label() -> str:
+    rule = request.url_rule
+    return rule.rule if rule is not None else "<unmatched>"
+
+def init_instrumentation(app: Flask) -> None:
+    cfg = app.config
+    metrics_enabled = bool(cfg.get("METRICS_ENABLED"))
+    slow_ms = int(cfg.get("PROFILE_SLOW_MS") or 0)
+    sample_rate = float(cfg.get("PROFILE_SAMPLE_RATE") or 0.0)
+    profile_dir = cfg.get("PROFILE_DIR") or "profiles"
+
+    if not metrics_enabled and slow_ms <= 0:
+        return
+
+    db.set_connection_factory(InstrumentedConnection)
+
+    @app.before_request
+    def _instrument_start():
+        g._req_stats = RequestStats()
+        if slow_ms > 0 and random.random() < sample_rate:
+            g._req_profiler = _start_profiler()
+
+    @app.after_request
+    def _instrument_finish(response):
+        stats = current_stats()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.start
+        route = _route_label()
+
+        handle = g.pop("_req_profiler", None)
+        if handle is not None:
+            _stop_profiler(handle)
+            if elapsed * 1000.0 >= slow_ms:
+                try:
+                    _dump_profile(handle, profile_dir, route, elapsed * 1000.0)
+                except Exception:
+                    app.logger.exception("Profil konnte nicht gespeichert werden")
+
+        if metrics_enabled:
+            REQUEST_SECONDS.observe(elapsed, request.method, route, str(response.status_code))
+            DB_SECONDS.observe(stats.db_seconds, request.method, route)
+            DB_QUERIES.observe(stats.queries, request.method, route)
+            for stage, secs in stats.stages.items():
+                STAGE_SECONDS.observe(secs, stage, route)
+
+            parts = [f'db;dur={stats.db_seconds * 1000.0:.1f};desc="{stats.queries} queries"']
+            parts += [f"{stage};dur={secs * 1000.0:.1f}" for stage, secs in stats.stages.items()]
+            parts.append(f"total;dur={elapsed * 1000.0:.1f}")
+            response.headers["Server-Timing"] = ", ".join(parts)
+        return response
+
+    if metrics_enabled:
+        @app.get("/metrics")
+        def metrics():
+            return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,191 @@
+"""Password hashing off the request threads.
+
+- Hashes are computed/verified on a small dedicated thread pool (hashlib's scrypt/PBKDF2
+  release the GIL), so a login burst occupies at most HASH_WORKERS cores. When more than
+  HASH_QUEUE_MAX checks are waiting, ``HashPoolBusy`` is raised and the caller answers 503.
+- PASSWORD_HASH_METHOD selects the algorithm for new hashes (any Werkzeug method, or
+  ``argon2`` if argon2-cffi is installed). Older hashes keep working and are upgraded on
+  the next successful login.
+- ``LoginThrottle`` limits failed attempts per username before any hashing happens.
+"""
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from instrumentation import Counter, Gauge, Histogram, register_metric, timed
+
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HASH_SECONDS = register_metric(Histogram(
+    "bauapp_password_hash_seconds", "Time spent hashing/verifying passwords (excl. queueing).",
+    HASH_BUCKETS, ("op", "algorithm")
+))
+HASH_WAIT_SECONDS = register_metric(Histogram(
+    "bauapp_password_hash_wait_seconds", "Time a hash job waited for a pool worker.", HASH_BUCKETS, ()
+))
+HASH_REJECTED = register_metric(Counter("bauapp_password_hash_rejected_total", "Hash jobs rejected because the pool queue was full."))
+LOGIN_THROTTLED = register_metric(Counter("bauapp_login_throttled_total", "Logins refused by the per-username throttle."))
+PASSWORD_REHASHED = register_metric(Counter("bauapp_password_rehashed_total", "Stored hashes upgraded on login.", ("algorithm",)))
+
+class HashPoolBusy(Exception):
+    pass
+
+# -----------------------
+# Algorithms
+# -----------------------
+def _algorithm(stored_hash: str) -> str:
+    if stored_hash.startswith("$argon2"):
+        return "argon2"
+    return stored_hash.split(":", 1)[0].split("$", 1)[0] or "unknown"
+
+def _argon2_hasher():
+    from argon2 import PasswordHasher
+    return PasswordHasher()
+
+def _hash(password: str, method: str) -> str:
+    if method == "argon2":
+        return _argon2_hasher().hash(password)
+    return generate_password_hash(password, method=method)
+
+def _verify(stored_hash: str, password: str) -> bool:
+    if stored_hash.startswith("$argon2"):
+        from argon2.exceptions import VerificationError, InvalidHashError
+        try:
+            return _argon2_hasher().verify(stored_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(stored_hash, password)
+
+_method_prefix_cache: Dict[str, str] = {}
+
+def _needs_rehash(stored_hash: str, method: str) -> bool:
+    if method == "argon2":
+        if not stored_hash.startswith("$argon2"):
+            return True
+        return _argon2_hasher().check_needs_rehash(stored_hash)
+    # Werkzeug expands "scrypt" to "scrypt:32768:8:1" etc.; compare against what it produces today
+    prefix = _method_prefix_cache.get(method)
+    if prefix is None:
+        prefix = _method_prefix_cache[method] = generate_password_hash("probe", method=method).split("$", 1)[0]
+    return stored_hash.split("$", 1)[0] != prefix
+
+# -----------------------
+# Pool
+# -----------------------
+_pool_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+_pending = 0
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = max(1, int(current_app.config.get("HASH_WORKERS") or 1))
+                _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+    return _pool
+
+def pending_hash_jobs() -> int:
+    return _pending
+
+register_metric(Gauge(
+    "bauapp_password_hash_pending", "Hash jobs queued or running.", (), lambda: {(): pending_hash_jobs()}
+))
+
+def _run_in_pool(op: str, fn, *args):
+    global _pending
+    cfg = current_app.config
+    limit = max(1, int(cfg.get("HASH_WORKERS") or 1)) + int(cfg.get("HASH_QUEUE_MAX") or 0)
+    with _pool_lock:
+        if _pending >= limit:
+            HASH_REJECTED.inc()
+            raise HashPoolBusy()
+        _pending += 1
+
+    submitted = time.perf_counter()
+
+    def job():
+        global _pending
+        started = time.perf_counter()
+        HASH_WAIT_SECONDS.observe(started - submitted)
+        try:
+            return fn(*args), time.perf_counter() - started
+        finally:
+            with _pool_lock:
+                _pending -= 1
+
+    try:
+        future = _get_pool().submit(job)
+    except Exception:
+        with _pool_lock:
+            _pending -= 1
+        raise
+    with timed("hash"):
+        try:
+            result, took = future.result(timeout=float(cfg.get("HASH_TIMEOUT_SECONDS") or 10))
+        except FutureTimeout:
+            raise HashPoolBusy()
+    HASH_SECONDS.observe(took, op, _algorithm(args[0]) if op == "verify" else str(args[1]).split(":", 1)[0])
+    return result
+
+def hash_password(password: str) -> str:
+    return _run_in_pool("hash", _hash, password, current_app.config.get("PASSWORD_HASH_METHOD") or "scrypt")
+
+def verify_password(stored_hash: str, password: str) -> Tuple[bool, bool]:
+    """Returns (valid, needs_rehash). May raise HashPoolBusy."""
+    ok = _run_in_pool("verify", _verify, stored_hash, password)
+    if not ok:
+        return False, False
+    return True, _needs_rehash(stored_hash, current_app.config.get("PASSWORD_HASH_METHOD") or "scrypt")
+
+def note_rehash(new_hash: str) -> None:
+    PASSWORD_REHASHED.inc(_algorithm(new_hash))
+
+# -----------------------
+# Throttle
+# -----------------------
+class LoginThrottle:
+    """Sliding-window limit on failed logins per username (in-process)."""
+
+    def __init__(self, max_entries: int = 10000):
+        self._lock = threading.Lock()
+        self._failures: Dict[str, deque] = {}
+        self._max_entries = max_entries
+
+    def retry_after(self, username: str, max_failures: int, window: float) -> int:
+        """Seconds until the next attempt is allowed, 0 if allowed now."""
+        if max_failures <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            q = self._failures.get(username.lower())
+            if not q:
+                return 0
+            while q and q[0] <= now - window:
+                q.popleft()
+            if len(q) < max_failures:
+                return 0
+            wait = int(q[0] + window - now) + 1
+        LOGIN_THROTTLED.inc()
+        return wait
+
+    def record_failure(self, username: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) >= self._max_entries:
+                # drop the stalest half instead of growing without bound during a spray
+                oldest = sorted(self._failures.items(), key=lambda kv: kv[1][-1] if kv[1] else 0)
+                for key, _ in oldest[: self._max_entries // 2]:
+                    del self._failures[key]
+            self._failures.setdefault(username.lower(), deque()).append(now)
+
+    def reset(self, username: str) -> None:
+        with self._lock:
+            self._failures.pop(username.lower(), None)
+
+login_throttle = LoginThrottle()
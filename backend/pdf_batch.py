@@ -0,0 +1,137 @@
+"""Batch PDF export for many projects (month-end archives).
+
+The main process reads projects/reports from the read store and splits every project
+into parts of at most `chunk_size` reports. Parts are rendered in a process pool
+(ReportLab is pure Python and holds the GIL), each into its own temp file, and then
+merged in order: into one PDF, or into a ZIP with one PDF per project. Photos go
+through the shared ImageCache, so a second run only re-renders text and layout.
+At most two parts per worker are queued ahead of rendering, so memory stays bounded by
+the pool size rather than the size of the export.
+"""
+import os
+import shutil
+import zipfile
+import tempfile
+import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Sequence
+
+from pdf_export import ImageCache, build_project_pdf
+
+def month_range(month: str):
+    """month "2026-09" -> ("2026-09-01", "2026-10-01"), comparable with the ISO created_at text."""
+    start = datetime.datetime.strptime(month, "%Y-%m").date()
+    end = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return start.isoformat(), end.isoformat()
+
+def _report_dict(r, quick_actions: List[str]) -> dict:
+    return {
+        "id": r["id"],
+        "text": r["text"],
+        "created_at": r["created_at"],
+        "user_name": r["name"] or r["username"],
+        "quick_actions_list": quick_actions,
+        "start_time": r["start_time"],
+        "end_time": r["end_time"],
+        "break_minutes": r["break_minutes"],
+    }
+
+def plan_parts(store, projects: Sequence, base_dir: str, chunk_size: int,
+               month: Optional[str] = None) -> Iterator[dict]:
+    """Render jobs in output order. With a month, projects without reports in it are skipped."""
+    created_from, created_before = month_range(month) if month else (None, None)
+    for index, project in enumerate(projects):
+        proj = dict(project)
+        part = 0
+        for rows in store.reports.chunks(project_id=proj["id"], newest_first=False, size=chunk_size,
+                                         created_from=created_from, created_before=created_before):
+            ids = [r["id"] for r in rows]
+            images = store.images.paths_by_report(ids)
+            quick_actions = store.reports.quick_actions(ids)
+            yield {
+                "project_index": index,
+                "part": part,
+                "project": proj,
+                "reports": [_report_dict(r, quick_actions[r["id"]]) for r in rows],
+                "images": {rid: [p if os.path.isabs(p) else os.path.join(base_dir, p) for p in paths]
+                           for rid, paths in images.items()},
+            }
+            part += 1
+        if part == 0 and not month:
+            yield {"project_index": index, "part": 0, "project": proj, "reports": [], "images": {}}
+
+def _render_part(job: dict, out_dir: str, cache_dir: Optional[str], max_px: int, cache_max_bytes: int) -> str:
+    """Runs in a worker process."""
+    image_cache = ImageCache(cache_dir, max_px, max_bytes=cache_max_bytes) if cache_dir else None
+    buffer = build_project_pdf(job["project"], job["reports"], job["images"],
+                               image_cache=image_cache, header=job["part"] == 0)
+    path = os.path.join(out_dir, f"{job['project_index']:05d}-{job['part']:05d}.pdf")
+    with open(path, "wb") as f:
+        f.write(buffer.getbuffer())
+    return path
+
+def _merge(paths: List[str], out_path: str) -> None:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for p in paths:
+        writer.append(p)
+    writer.write(out_path)
+    writer.close()
+
+def _project_file_name(project: dict) -> str:
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in project["name"])
+    return f"Projekt_{safe_name}_{project['id'][:8]}.pdf"
+
+def export_projects(store, projects: Sequence, out_path: str, base_dir: str, workers: int = 0,
+                    chunk_size: int = 200, month: Optional[str] = None, cache_dir: Optional[str] = None,
+                    max_px: int = 1200, cache_max_bytes: int = 0) -> int:
+    """Write all `projects` to out_path (.zip: one PDF per project, otherwise one merged PDF).
+    Returns the number of projects written (0: nothing to export, no file). workers=0 uses one
+    process per CPU core; cache_max_bytes > 0 prunes the image cache to that size afterwards."""
+    as_zip = out_path.lower().endswith(".zip")
+    workers = workers or os.cpu_count() or 1
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_dir = tempfile.mkdtemp(prefix="bauapp-pdf-")
+    try:
+        parts_by_project = {}
+        pending = deque()
+
+        def collect_oldest():
+            index, fut = pending.popleft()
+            parts_by_project.setdefault(index, []).append(fut.result())
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # submitted while the store is still being read, so rendering starts right away;
+            # each queued job holds its reports, so reading waits once 2 x workers are in flight
+            for job in plan_parts(store, projects, base_dir, chunk_size, month):
+                if len(pending) >= 2 * workers:
+                    collect_oldest()
+                pending.append((job["project_index"], pool.submit(_render_part, job, tmp_dir, cache_dir,
+                                                                  max_px, cache_max_bytes)))
+            while pending:
+                collect_oldest()
+        if cache_dir and cache_max_bytes:
+            ImageCache(cache_dir, max_bytes=cache_max_bytes).prune()
+
+        if not parts_by_project:
+            return 0
+        tmp_out = out_path + ".tmp"
+        if as_zip:
+            with zipfile.ZipFile(tmp_out, "w", compression=zipfile.ZIP_STORED) as zf:
+                for index, parts in sorted(parts_by_project.items()):
+                    name = _project_file_name(dict(projects[index]))
+                    if len(parts) > 1:
+                        merged = os.path.join(tmp_dir, f"{index:05d}.pdf")
+                        _merge(parts, merged)
+                        parts = [merged]
+                    zf.write(parts[0], name)
+        else:
+            _merge([p for _, parts in sorted(parts_by_project.items()) for p in parts], tmp_out)
+        os.replace(tmp_out, out_path)
+        return len(parts_by_project)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
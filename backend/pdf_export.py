@@ -1,25 +1,124 @@
 import os
 import io
-from typing import List
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import cm
+import hashlib
+import functools
+from typing import List, Optional
 
-def build_project_pdf(project: dict, reports: List[dict], report_images: dict, logo_path: str | None = None) -> io.BytesIO:
+# Photos are drawn at 15 x 10 cm; 1200 px on the long edge is ~200 dpi there.
+DEFAULT_IMAGE_MAX_PX = 1200
+
+@functools.lru_cache(maxsize=None)
+def _reportlab():
+    """ReportLab (~100 ms to import) is loaded on the first export, not at app start; the
+    sample stylesheet is built once and shared, the builders only read it."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    return A4, SimpleDocTemplate, Paragraph, Spacer, RLImage, PageBreak, cm, getSampleStyleSheet()
+
+def preload() -> None:
+    """Import ReportLab and build the stylesheet now instead of on the first export."""
+    _reportlab()
+
+# new copies written per process between two prunes of a size-limited cache
+PRUNE_EVERY = 200
+
+class ImageCache:
+    """Pre-scaled JPEG copies of report photos, so a PDF embeds and decodes ~200 KB instead of
+    the full upload. Keyed by path, mtime and size; shared by requests, runs and processes.
+
+    max_bytes > 0 caps the directory: the least recently used copies (a hit refreshes the
+    file's mtime) are removed every PRUNE_EVERY new copies and after each batch run."""
+
+    _written = 0  # per process, approximate across threads
+
+    def __init__(self, cache_dir: str, max_px: int = DEFAULT_IMAGE_MAX_PX, quality: int = 85, max_bytes: int = 0):
+        self.cache_dir = cache_dir
+        self.max_px = max_px
+        self.quality = quality
+        self.max_bytes = max_bytes
+
+    def get(self, path: str) -> str:
+        """Path of the scaled copy (created on first use); the original if scaling is not possible/needed."""
+        try:
+            st = os.stat(path)
+            key = hashlib.sha1(f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{self.max_px}".encode("utf-8")).hexdigest()
+            out = os.path.join(self.cache_dir, key[:2], key + ".jpg")
+            if os.path.exists(out):
+                if self.max_bytes:
+                    os.utime(out)
+                return out
+            from PIL import Image
+
+            with Image.open(path) as im:
+                if im.format == "JPEG" and max(im.size) <= self.max_px:
+                    return path
+                # JPEG: let the decoder downscale (DCT scaling) instead of decoding every pixel
+                im.draft("RGB", (self.max_px, self.max_px))
+                small = im.convert("RGB")
+                small.thumbnail((self.max_px, self.max_px), Image.BICUBIC)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            tmp = f"{out}.{os.getpid()}.tmp"
+            small.save(tmp, format="JPEG", quality=self.quality)
+            os.replace(tmp, out)
+            if self.max_bytes:
+                ImageCache._written += 1
+                if ImageCache._written % PRUNE_EVERY == 0:
+                    self.prune()
+            return out
+        except Exception:
+            return path
+
+    def prune(self) -> int:
+        """Remove the least recently used copies until the directory fits max_bytes. Returns
+        the number of files removed."""
+        if not self.max_bytes:
+            return 0
+        entries, total = [], 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                p = os.path.join(root, name)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue  # removed by another process meanwhile
+                entries.append((st.st_mtime_ns, st.st_size, p))
+                total += st.st_size
+        removed = 0
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+def _photo(path: str, image_cache: Optional[ImageCache]):
+    _, _, _, _, RLImage, _, cm, _ = _reportlab()
+    src = image_cache.get(path) if image_cache else path
+    return RLImage(src, width=15*cm, height=10*cm, kind="proportional")
+
+def build_project_pdf(project: dict, reports: List[dict], report_images: dict, logo_path: str | None = None,
+                      image_cache: Optional[ImageCache] = None, header: bool = True) -> io.BytesIO:
+    """header=False renders only the report pages (later parts of a project split by pdf_batch)."""
+    A4, SimpleDocTemplate, Paragraph, Spacer, _, PageBreak, cm, styles = _reportlab()
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
     story = []
 
-    # Title
-    story.append(Paragraph(f"<b>Projektdokumentation: {project['name']}</b>", styles["Title"]))
-    story.append(Spacer(1, 0.4 * cm))
+    if header:
+        # Title
+        story.append(Paragraph(f"<b>Projektdokumentation: {project['name']}</b>", styles["Title"]))
+        story.append(Spacer(1, 0.4 * cm))
 
-    story.append(Paragraph(f"<b>Kunde:</b> {project.get('customer_name','')}", styles["Normal"]))
-    story.append(Paragraph(f"<b>Adresse:</b> {project.get('address','')}", styles["Normal"]))
-    story.append(Paragraph(f"<b>Status:</b> {project.get('status','')}", styles["Normal"]))
-    story.append(Spacer(1, 0.8 * cm))
+        story.append(Paragraph(f"<b>Kunde:</b> {project.get('customer_name','')}", styles["Normal"]))
+        story.append(Paragraph(f"<b>Adresse:</b> {project.get('address','')}", styles["Normal"]))
+        story.append(Paragraph(f"<b>Status:</b> {project.get('status','')}", styles["Normal"]))
+        story.append(Spacer(1, 0.8 * cm))
 
     for rep in reports:
         story.append(Paragraph(f"<b>{rep['created_at'][:10]} - {rep.get('user_name','')}</b>", styles["Heading2"]))
@@ -40,7 +139,7 @@ def build_project_pdf(project: dict, reports: List[dict], report_images: dict, l
         for p in imgs:
             if os.path.exists(p):
                 story.append(Spacer(1, 0.35 * cm))
-                story.append(RLImage(p, width=15*cm, height=10*cm, kind="proportional"))
+                story.append(_photo(p, image_cache))
 
         story.append(Spacer(1, 0.6 * cm))
         story.append(PageBreak())
@@ -49,10 +148,11 @@ def build_project_pdf(project: dict, reports: List[dict], report_images: dict, l
     buffer.seek(0)
     return buffer
 
-def build_report_pdf(project: dict, report: dict, report_images: List[str], logo_path: str | None = None) -> io.BytesIO:
+def build_report_pdf(project: dict, report: dict, report_images: List[str], logo_path: str | None = None,
+                     image_cache: Optional[ImageCache] = None) -> io.BytesIO:
+    A4, SimpleDocTemplate, Paragraph, Spacer, _, PageBreak, cm, styles = _reportlab()
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
     story = []
 
     story.append(Paragraph("<b>Baustellenbericht</b>", styles["Title"]))
@@ -84,7 +184,7 @@ def build_report_pdf(project: dict, report: dict, report_images: List[str], logo
     for p in report_images:
         if os.path.exists(p):
             story.append(Spacer(1, 0.35 * cm))
-            story.append(RLImage(p, width=15*cm, height=10*cm, kind="proportional"))
+            story.append(_photo(p, image_cache))
 
     doc.build(story)
     buffer.seek(0)
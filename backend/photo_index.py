@@ -0,0 +1,90 @@
+"""Near-duplicate photo lookup by perceptual hash.
+
+Every stored photo gets a 64-bit difference hash at upload (``image_processing.photo_hash``,
+column report_images.phash; ``flask hash-photos`` fills it for older photos). Two shots of
+the same wall seconds apart differ in a handful of bits, different motifs in about half.
+
+Per project the hashes are held in memory as one NumPy uint64 array. A query XORs the whole
+array with the photo's hash and counts the differing bits (byte lookup table) in one pass:
+no image file is opened and no SQL runs beyond loading the array. Each worker keeps the
+last PHOTO_INDEX_PROJECTS projects. An entry is stamped with the project's images_count and
+last_report_at; when they changed (photos added or removed, by any worker) the project's
+hashes are loaded again, one indexed query.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+_popcount_table = None
+
+def _popcount(values):
+    """Set bits per uint64 element."""
+    import numpy as np
+
+    global _popcount_table
+    if _popcount_table is None:
+        _popcount_table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return _popcount_table[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+def _unsigned(hashes: Sequence[int]):
+    """Signed 64-bit hashes as stored in SQL -> uint64 array."""
+    import numpy as np
+
+    return np.asarray(hashes, dtype=np.int64).view(np.uint64)
+
+def distance(a: int, b: int) -> int:
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+class PhotoHashIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def _entry(self, key: tuple, stamp: tuple, load: Callable[[], list], max_projects: int):
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is not None and hit[0] == stamp:
+                self._items.move_to_end(key)
+                return hit[1], hit[2]
+        import numpy as np
+
+        rows = load()
+        ids = np.array([r["id"] for r in rows], dtype=np.int64)
+        hashes = _unsigned([r["phash"] for r in rows])
+        with self._lock:
+            self._items[key] = (stamp, ids, hashes)
+            self._items.move_to_end(key)
+            while len(self._items) > max(1, max_projects):
+                self._items.popitem(last=False)
+        return ids, hashes
+
+    def search(self, key: tuple, stamp: tuple, load: Callable[[], list], queries: Sequence[int],
+               max_distance: int, limit: int = 50, max_projects: int = 64) -> List[List[Tuple[int, int]]]:
+        """Photos within max_distance bits of each query hash: [(image id, distance)] per
+        query, closest first. key: (tenant, project_id); stamp: see module docstring; load:
+        returns the project's (id, phash) rows; max_projects: entries kept (LRU)."""
+        import numpy as np
+
+        ids, hashes = self._entry(key, stamp, load, max_projects)
+        if not len(queries) or not len(ids):
+            return [[] for _ in queries]
+        dist = _popcount(hashes[None, :] ^ _unsigned(queries)[:, None])  # queries x photos
+        out = []
+        for row in dist:
+            hits = np.flatnonzero(row <= max_distance)
+            hits = hits[np.argsort(row[hits], kind="stable")][:limit]
+            out.append([(int(ids[i]), int(row[i])) for i in hits])
+        return out
+
+    def invalidate(self, key: Optional[tuple] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._items.clear()
+            else:
+                self._items.pop(key, None)
+
+photo_index = PhotoHashIndex()
+
+def project_stamp(project) -> tuple:
+    """Changes whenever photos of the project are added or removed (denormalized stats)."""
+    return (int(project["images_count"] or 0), project["last_report_at"])
@@ -0,0 +1,167 @@
+"""Read-only connections for heavy reads (PDF exports, dashboard, timesheet listings).
+
+READ_SNAPSHOT_MODE selects where those reads go:
+
+- ``off``    the live database, same as every other request
+- ``wal``    the live database in WAL mode, opened with ``mode=ro``; readers see the
+             last committed state and never block ``create_report`` (no staleness)
+- ``backup`` a copy made with SQLite's online backup API, refreshed in the background
+             every READ_SNAPSHOT_MAX_AGE_SECONDS / 2; a snapshot older than the bound is
+             refreshed synchronously before use
+
+In ``backup`` mode rows written after the last snapshot are not visible yet, so callers
+that look up a single row fall back to the live database when it is missing.
+
+Snapshots are shared by all processes on the host (gunicorn workers): one file per
+database, named after the time it was taken, written under a file lock so only one
+process copies at a time; the others pick up the newest file. The live database is
+switched to WAL for ``backup`` as well, so the copy never holds off writers.
+"""
+import os
+import glob
+import time
+import sqlite3
+import threading
+import contextlib
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no pre-fork server there, processes don't share snapshots
+    fcntl = None
+
+import db
+
+MODES = ("off", "wal", "backup")
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _copy(db_file: str, path: str) -> None:
+    """Backup of db_file into path, written under a temporary name and renamed when complete."""
+    tmp = path + ".tmp"
+    src = sqlite3.connect(db_file)
+    dst = sqlite3.connect(tmp)
+    try:
+        # in WAL the backup's read transaction doesn't hold off writers; init_sqlite has switched
+        # the database already, this covers one replaced since (the switch is persistent)
+        src.execute("PRAGMA journal_mode = WAL")
+        # one step: a multi-step backup restarts whenever a writer commits in between
+        src.backup(dst)
+        # opened read-only afterwards: no -wal/-shm files next to the snapshot
+        dst.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp, path)
+
+class SnapshotManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+        self._taken_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def mode(self, cfg) -> str:
+        mode = (cfg.get("READ_SNAPSHOT_MODE") or "off").lower()
+        return mode if mode in MODES else "off"
+
+    def connect(self, cfg) -> sqlite3.Connection:
+        mode = self.mode(cfg)
+        if mode == "off":
+            return db.get_db(cfg["DB_FILE"])
+        if mode == "wal":
+            return db.get_read_only_db(cfg["DB_FILE"])
+
+        max_age = float(cfg.get("READ_SNAPSHOT_MAX_AGE_SECONDS") or 60)
+        self._ensure_refresher(cfg, max_age)
+        if self._path is None or time.time() - self._taken_at > max_age:
+            self.refresh(cfg, max_age)
+        try:
+            return db.get_read_only_db(self._path)
+        except sqlite3.OperationalError:
+            # replaced and removed (by any process) between reading the path and opening it
+            return db.get_read_only_db(self.refresh(cfg, max_age))
+
+    def refresh(self, cfg, max_age: float = 0.0) -> str:
+        """Path of a snapshot at most max_age seconds old (0: take a new one)."""
+        with self._lock:
+            # another thread may have refreshed while we waited for the lock
+            if self._fresh(self._path, self._taken_at, max_age):
+                return self._path
+            snap_dir = cfg.get("READ_SNAPSHOT_DIR") or "snapshots"
+            os.makedirs(snap_dir, exist_ok=True)
+            base = os.path.splitext(os.path.basename(cfg["DB_FILE"]))[0]
+            with _file_lock(os.path.join(snap_dir, f"{base}.lock")):
+                # or another process, while we waited for the file lock
+                taken_at, path = self._newest(snap_dir, base)
+                if not self._fresh(path, taken_at, max_age):
+                    taken_ns = time.time_ns()
+                    path = os.path.join(snap_dir, f"{base}-{taken_ns}.db")
+                    _copy(cfg["DB_FILE"], path)
+                    taken_at = taken_ns / 1e9
+                    self._remove_old(snap_dir, base, keep=path)
+            self._path, self._taken_at = path, taken_at
+            return path
+
+    @staticmethod
+    def _fresh(path: Optional[str], taken_at: float, max_age: float) -> bool:
+        return bool(path and max_age and time.time() - taken_at <= max_age and os.path.exists(path))
+
+    @staticmethod
+    def _newest(snap_dir: str, base: str) -> Tuple[float, Optional[str]]:
+        newest = (0.0, None)
+        for path in glob.glob(os.path.join(snap_dir, f"{base}-*.db")):
+            stamp = os.path.basename(path)[len(base) + 1:-3]
+            if stamp.isdigit() and int(stamp) / 1e9 > newest[0]:
+                newest = (int(stamp) / 1e9, path)
+        return newest
+
+    def _remove_old(self, snap_dir: str, base: str, keep: str) -> None:
+        for old in glob.glob(os.path.join(snap_dir, f"{base}-*.db")):
+            if os.path.abspath(old) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(old)
+            except OSError:
+                pass  # still open by a running export (Windows); removed on the next refresh
+
+    def _ensure_refresher(self, cfg, max_age: float) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            settings = {k: cfg.get(k) for k in ("DB_FILE", "READ_SNAPSHOT_DIR")}
+
+            def loop():
+                while not self._stopped.wait(max(max_age / 2.0, 1.0)):
+                    try:
+                        # a copy only if no process took one within the half period
+                        self.refresh(settings, max_age / 2.0)
+                    except Exception:
+                        pass  # next connect() refreshes synchronously if we fall behind
+
+            self._thread = threading.Thread(target=loop, name="read-snapshot", daemon=True)
+            self._thread.start()
+
+    def may_be_stale(self, cfg) -> bool:
+        return self.mode(cfg) == "backup"
+
+    def close(self) -> None:
+        """Stop the refresher (tenant evicted from the LRU). The snapshot file stays: other
+        processes may be reading it, and the next refresh replaces it."""
+        self._stopped.set()
+        with self._lock:
+            self._path = None
+
+read_snapshots = SnapshotManager()
@@ -0,0 +1,35 @@
+"""Data-access layer. ``open_store(cfg)`` returns a Store for the backend chosen by
+DB_BACKEND ("sqlite" or "postgres"); handlers use its repositories
+(``store.users``, ``store.projects``, ``store.reports``, ``store.images``) and call
+``commit()``/``close()`` like they did with the raw connection.
+"""
+import os
+
+from repositories.base import CHUNK_SIZE, PROJECT_COLUMNS, Store
+
+BACKENDS = ("sqlite", "postgres")
+
+def backend_name(cfg) -> str:
+    name = (cfg.get("DB_BACKEND") or "sqlite").lower()
+    if name not in BACKENDS:
+        raise RuntimeError(f"Unbekanntes DB_BACKEND: {name}")
+    return name
+
+def open_store(cfg, read_only: bool = False) -> Store:
+    """read_only=True: connection for heavy reads (SQLite snapshot / Postgres replica if configured)."""
+    if backend_name(cfg) == "postgres":
+        from repositories.postgres import open_postgres_store
+        return open_postgres_store(cfg, read_only)
+    from repositories.sqlite import open_sqlite_store
+    return open_sqlite_store(cfg, read_only)
+
+def init_storage(cfg, base_dir: str, seed: bool = True) -> None:
+    """Create/migrate the schema and seed demo data (seed=False: tenant databases)."""
+    if backend_name(cfg) == "postgres":
+        from repositories.postgres import init_postgres
+        init_postgres(cfg, os.path.join(base_dir, "schema_pg.sql"))
+    else:
+        from repositories.sqlite import init_sqlite
+        init_sqlite(cfg, os.path.join(base_dir, "schema.sql"), seed=seed)
+
+__all__ = ["CHUNK_SIZE", "PROJECT_COLUMNS", "Store", "backend_name", "open_store", "init_storage"]
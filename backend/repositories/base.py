@@ -0,0 +1,466 @@
+"""Backend-neutral store + repositories.
+
+SQL here is written with "?" placeholders and only uses syntax both SQLite and
+PostgreSQL understand. The few differences (id-list parameters, chunked reads,
+maintenance) live in the Store subclasses in sqlite.py / postgres.py.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+CHUNK_SIZE = 500
+
+# report_images columns filled at upload (image_processing.photo_metadata)
+PHOTO_META_COLUMNS = ("captured_at", "lat", "lon", "width", "height", "byte_size", "phash")
+
+class Store:
+    """One connection plus the repositories bound to it.
+
+    Also accepted wherever the older helpers expect a connection (auth, events,
+    dashboard): ``execute``/``executemany``/``commit``/``close`` behave like sqlite3's,
+    and rows support both ``row["col"]`` and ``row[0]``.
+    """
+    backend = ""
+    # True for read stores that may lag behind the primary (SQLite backup snapshots)
+    stale = False
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.users = UserRepository(self)
+        self.projects = ProjectRepository(self)
+        self.reports = ReportRepository(self)
+        self.images = ImageRepository(self)
+
+    def execute(self, sql: str, args: Sequence = ()):
+        return self.conn.execute(sql, tuple(args))
+
+    def executemany(self, sql: str, seq: Iterable[Sequence]):
+        return self.conn.executemany(sql, seq)
+
+    def chunks(self, sql: str, args: Sequence = (), size: int = CHUNK_SIZE) -> Iterator[list]:
+        """Yield result rows in lists of `size` without materializing the whole result."""
+        raise NotImplementedError
+
+    def in_list(self, column: str, values: Iterable) -> Tuple[str, tuple]:
+        """SQL fragment + args for `column IN (values)` with a single parameter."""
+        raise NotImplementedError
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def rollback(self) -> None:
+        self.conn.rollback()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def reconcile_project_stats(self) -> int:
+        raise NotImplementedError
+
+    def recompute_project_stats(self, project_id: str) -> None:
+        """Recount one project's stats from its hot rows (in the current transaction)."""
+        raise NotImplementedError
+
+    def rebuild_report_tags(self) -> int:
+        raise NotImplementedError
+
+class _Repository:
+    def __init__(self, store: Store):
+        self.s = store
+
+    def _insert_row(self, table: str, row: Dict[str, object]) -> bool:
+        """Insert a full row as read with SELECT * (cold archive restore); False on conflict."""
+        cols = list(row)
+        cur = self.s.execute(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) ON CONFLICT DO NOTHING",
+            tuple(row.values())
+        )
+        return cur.rowcount == 1
+
+# -----------------------
+# Users
+# -----------------------
+class UserRepository(_Repository):
+    def get(self, user_id: str):
+        return self.s.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+    def by_username(self, username: str):
+        return self.s.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+
+    def list_all(self) -> list:
+        return self.s.execute("SELECT id, username, name, role, avatar_path FROM users ORDER BY created_at DESC").fetchall()
+
+    def by_ids(self, user_ids: Iterable[str]) -> Dict[str, object]:
+        ids = sorted(set(user_ids))
+        if not ids:
+            return {}
+        cond, args = self.s.in_list("id", ids)
+        return {r["id"]: r for r in self.s.execute(
+            f"SELECT id, username, name, role, avatar_path FROM users WHERE {cond}", args).fetchall()}
+
+    def role(self, user_id: str) -> Optional[str]:
+        row = self.s.execute("SELECT role FROM users WHERE id = ?", (user_id,)).fetchone()
+        return row["role"] if row else None
+
+    def first_admin_id(self) -> Optional[str]:
+        row = self.s.execute("SELECT id FROM users WHERE role = 'admin' ORDER BY created_at ASC LIMIT 1").fetchone()
+        return row["id"] if row else None
+
+    def unknown_ids(self, user_ids: Iterable[str]) -> List[str]:
+        ids = sorted(set(user_ids))
+        if not ids:
+            return []
+        cond, args = self.s.in_list("id", ids)
+        known = {r["id"] for r in self.s.execute(f"SELECT id FROM users WHERE {cond}", args).fetchall()}
+        return [u for u in ids if u not in known]
+
+    def set_password_hash(self, user_id: str, password_hash: str) -> None:
+        self.s.execute("UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id))
+
+    def set_avatar(self, user_id: str, avatar_path: str) -> None:
+        self.s.execute("UPDATE users SET avatar_path = ? WHERE id = ?", (avatar_path, user_id))
+
+# -----------------------
+# Projects
+# -----------------------
+# API field -> column, for partial updates
+PROJECT_COLUMNS = {
+    "name": "name",
+    "address": "address",
+    "customerName": "customer_name",
+    "status": "status",
+    "description": "description",
+    "imageUrl": "image_url",
+    "updatedAt": "updated_at",
+}
+
+class ProjectRepository(_Repository):
+    def get(self, project_id: str):
+        return self.s.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+
+    def exists(self, project_id: str) -> bool:
+        return self.s.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is not None
+
+    def missing(self, project_ids: Iterable[str]) -> List[str]:
+        ids = sorted(set(project_ids))
+        if not ids:
+            return []
+        cond, args = self.s.in_list("id", ids)
+        found = {r["id"] for r in self.s.execute(f"SELECT id FROM projects WHERE {cond}", args).fetchall()}
+        return [p for p in ids if p not in found]
+
+    def list_visible(self, worker_id: Optional[str] = None) -> list:
+        """All projects (worker_id=None, admins) or the ones assigned to a worker, newest first."""
+        if worker_id is None:
+            return self.s.execute("SELECT p.* FROM projects p ORDER BY p.created_at DESC").fetchall()
+        return self.s.execute("""
+            SELECT p.* FROM projects p
+            JOIN project_assignments pa ON p.id = pa.project_id
+            WHERE pa.user_id = ?
+            ORDER BY p.created_at DESC
+        """, (worker_id,)).fetchall()
+
+    def by_ids(self, project_ids: Iterable[str]) -> Dict[str, object]:
+        ids = sorted(set(project_ids))
+        if not ids:
+            return {}
+        cond, args = self.s.in_list("id", ids)
+        return {r["id"]: r for r in self.s.execute(f"SELECT * FROM projects WHERE {cond}", args).fetchall()}
+
+    def chunks(self) -> Iterator[list]:
+        """All projects in chunks, oldest first (exports)."""
+        return self.s.chunks("SELECT * FROM projects ORDER BY created_at, id")
+
+    def workers(self, project_id: str) -> List[str]:
+        rows = self.s.execute("SELECT user_id FROM project_assignments WHERE project_id = ?", (project_id,)).fetchall()
+        return [r["user_id"] for r in rows]
+
+    def workers_by_project(self, project_ids: Sequence[str]) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {pid: [] for pid in project_ids}
+        if not project_ids:
+            return out
+        cond, args = self.s.in_list("project_id", project_ids)
+        for r in self.s.execute(f"SELECT project_id, user_id FROM project_assignments WHERE {cond}", args).fetchall():
+            out[r["project_id"]].append(r["user_id"])
+        return out
+
+    def assigned_to(self, user_id: str) -> List[str]:
+        rows = self.s.execute("SELECT project_id FROM project_assignments WHERE user_id = ?", (user_id,)).fetchall()
+        return [r["project_id"] for r in rows]
+
+    def is_assigned(self, project_id: str, user_id: str) -> bool:
+        return self.s.execute(
+            "SELECT 1 FROM project_assignments WHERE project_id = ? AND user_id = ?", (project_id, user_id)
+        ).fetchone() is not None
+
+    def create(self, project_id: str, name: str, address: str, customer_name: str, status: str,
+               created_at: str, description: Optional[str], image_url: Optional[str]) -> None:
+        self.s.execute(
+            "INSERT INTO projects (id, name, address, customer_name, status, created_at, description, image_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (project_id, name, address, customer_name, status, created_at, description, image_url)
+        )
+
+    def add_workers(self, project_id: str, worker_ids: Iterable[str]) -> None:
+        self.s.executemany(
+            "INSERT INTO project_assignments (project_id, user_id) VALUES (?, ?) ON CONFLICT DO NOTHING",
+            [(project_id, uid) for uid in worker_ids]
+        )
+
+    def update(self, project_id: str, values: Dict[str, object]) -> None:
+        """values: API field names (see PROJECT_COLUMNS) -> new value."""
+        if not values:
+            return
+        cols = [PROJECT_COLUMNS[k] for k in values]
+        self.s.execute(
+            f"UPDATE projects SET {', '.join(c + ' = ?' for c in cols)} WHERE id = ?",
+            tuple(values.values()) + (project_id,)
+        )
+
+    def touch(self, project_ids: Iterable[str], updated_at: str) -> None:
+        self.s.executemany("UPDATE projects SET updated_at = ? WHERE id = ?", [(updated_at, pid) for pid in project_ids])
+
+    def sync_assignments(self, mapping: Dict[str, List[str]]) -> Tuple[List[tuple], List[tuple]]:
+        """Make each project's assignments equal the given worker list, writing only the difference.
+
+        Returns the (project_id, user_id) pairs added and removed. The caller commits.
+        """
+        if not mapping:
+            return [], []
+        current: Dict[str, set] = {pid: set() for pid in mapping}
+        cond, args = self.s.in_list("project_id", list(mapping))
+        for r in self.s.execute(f"SELECT project_id, user_id FROM project_assignments WHERE {cond}", args).fetchall():
+            current[r["project_id"]].add(r["user_id"])
+
+        to_add = []
+        to_remove = []
+        for pid, workers in mapping.items():
+            wanted = set(workers)
+            to_add.extend((pid, uid) for uid in workers if uid not in current[pid])
+            to_remove.extend((pid, uid) for uid in current[pid] - wanted)
+
+        if to_remove:
+            self.s.executemany("DELETE FROM project_assignments WHERE project_id = ? AND user_id = ?", to_remove)
+        if to_add:
+            self.s.executemany(
+                "INSERT INTO project_assignments (project_id, user_id) VALUES (?, ?) ON CONFLICT DO NOTHING", to_add
+            )
+        return to_add, to_remove
+
+    def delete(self, project_id: str) -> None:
+        self.s.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+
+    def cold_candidates(self, inactive_before: str) -> List[str]:
+        """Archived projects still in the hot tables and unchanged since inactive_before."""
+        rows = self.s.execute(
+            "SELECT id FROM projects WHERE status = 'archived' AND cold_at IS NULL AND reports_count > 0 "
+            "AND COALESCE(updated_at, created_at) < ? ORDER BY id",
+            (inactive_before,)
+        ).fetchall()
+        return [r["id"] for r in rows]
+
+    def mark_cold(self, project_id: str, cold_at: str, reports: int, images: int,
+                  last_report_at: Optional[str]) -> bool:
+        """Flag an archived project as moved to the cold archive and keep the moved rows in its
+        stats (the delete triggers only count what is left). False if it changed meanwhile."""
+        cur = self.s.execute(
+            "UPDATE projects SET cold_at = ?, reports_count = reports_count + ?, images_count = images_count + ?, "
+            "last_report_at = CASE WHEN last_report_at IS NULL OR last_report_at < ? THEN ? ELSE last_report_at END "
+            "WHERE id = ? AND status = 'archived' AND cold_at IS NULL",
+            (cold_at, reports, images, last_report_at, last_report_at, project_id)
+        )
+        return cur.rowcount == 1
+
+    def clear_cold(self, project_id: str, cold_at: str) -> bool:
+        """False if the project is not (or no longer) cold with this cold_at."""
+        cur = self.s.execute("UPDATE projects SET cold_at = NULL WHERE id = ? AND cold_at = ?", (project_id, cold_at))
+        return cur.rowcount == 1
+
+# -----------------------
+# Reports
+# -----------------------
+REPORT_SELECT = """
+    SELECT r.*, u.username, u.name, p.name AS project_name, p.address AS project_address
+    FROM reports r
+    JOIN users u ON u.id = r.user_id
+    JOIN projects p ON p.id = r.project_id
+"""
+
+class ReportRepository(_Repository):
+    def get(self, report_id: str):
+        return self.s.execute(REPORT_SELECT + " WHERE r.id = ?", (report_id,)).fetchone()
+
+    def chunks(self, visible_to: Optional[str] = None, project_id: Optional[str] = None,
+               tags: Sequence[str] = (), newest_first: bool = True, size: int = CHUNK_SIZE,
+               created_from: Optional[str] = None, created_before: Optional[str] = None) -> Iterator[list]:
+        """Joined report rows in chunks. visible_to=None means no assignment check (admins);
+        created_from/created_before compare against the ISO created_at text."""
+        where = ["1 = 1"]
+        args: tuple = ()
+        if created_from:
+            where.append("r.created_at >= ?")
+            args += (created_from,)
+        if created_before:
+            where.append("r.created_at < ?")
+            args += (created_before,)
+        if visible_to is not None:
+            where.append("r.project_id IN (SELECT project_id FROM project_assignments WHERE user_id = ?)")
+            args += (visible_to,)
+        if project_id is not None:
+            where.append("r.project_id = ?")
+            args += (project_id,)
+        if tags:
+            cond, tag_args = self.s.in_list("tag", list(tags))
+            where.append(f"r.id IN (SELECT report_id FROM report_tags WHERE {cond})")
+            args += tag_args
+        order = "DESC" if newest_first else "ASC"
+        sql = REPORT_SELECT + f" WHERE {' AND '.join(where)} ORDER BY r.created_at {order}, r.id {order}"
+        return self.s.chunks(sql, args, size)
+
+    def rows_for_project(self, project_id: str) -> Iterator[list]:
+        """Plain report rows (SELECT *) of a project in chunks, oldest first."""
+        return self.s.chunks("SELECT * FROM reports WHERE project_id = ? ORDER BY created_at, id", (project_id,))
+
+    def insert_row(self, row: Dict[str, object]) -> bool:
+        return self._insert_row("reports", row)
+
+    def delete_ids(self, report_ids: Sequence[str]) -> None:
+        """Delete reports (images and tags cascade)."""
+        if report_ids:
+            cond, args = self.s.in_list("id", list(report_ids))
+            self.s.execute(f"DELETE FROM reports WHERE {cond}", args)
+
+    def by_client_keys(self, user_id: str, client_keys: Sequence[str]) -> Dict[str, object]:
+        """Reports the user already submitted with these idempotency keys, by key."""
+        if not client_keys:
+            return {}
+        cond, args = self.s.in_list("r.client_key", list(client_keys))
+        rows = self.s.execute(REPORT_SELECT + f" WHERE r.user_id = ? AND {cond}", (user_id,) + args).fetchall()
+        return {r["client_key"]: r for r in rows}
+
+    def create(self, report_id: str, project_id: str, user_id: str, text: str, quick_actions_json: str,
+               weather: Optional[str], workers_present: Optional[int], start_time: Optional[str],
+               end_time: Optional[str], break_minutes: Optional[int], created_at: str,
+               client_key: Optional[str] = None) -> bool:
+        """False: the user already has a report with client_key (nothing inserted)."""
+        cur = self.s.execute(
+            "INSERT INTO reports (id, project_id, user_id, text, quick_actions, weather, workers_present, start_time, end_time, break_minutes, created_at, client_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING",
+            (report_id, project_id, user_id, text, quick_actions_json, weather, workers_present,
+             start_time, end_time, break_minutes, created_at, client_key)
+        )
+        return cur.rowcount == 1
+
+    def quick_actions(self, report_ids: Sequence[str]) -> Dict[str, List[str]]:
+        """quickActions for a page of reports from report_tags, one query for all ids."""
+        out: Dict[str, List[str]] = {rid: [] for rid in report_ids}
+        if not report_ids:
+            return out
+        cond, args = self.s.in_list("report_id", list(out))
+        rows = self.s.execute(
+            f"SELECT report_id, tag FROM report_tags WHERE {cond} ORDER BY report_id, position", args
+        ).fetchall()
+        for row in rows:
+            out[row["report_id"]].append(row["tag"])
+        return out
+
+# -----------------------
+# Images
+# -----------------------
+class ImageRepository(_Repository):
+    def paths(self, report_id: str) -> List[str]:
+        rows = self.s.execute("SELECT file_path FROM report_images WHERE report_id = ? ORDER BY id", (report_id,)).fetchall()
+        return [r["file_path"] for r in rows]
+
+    def paths_by_report(self, report_ids: Sequence[str]) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {rid: [] for rid in report_ids}
+        if not report_ids:
+            return out
+        cond, args = self.s.in_list("report_id", list(out))
+        for r in self.s.execute(f"SELECT report_id, file_path FROM report_images WHERE {cond} ORDER BY id", args).fetchall():
+            out[r["report_id"]].append(r["file_path"])
+        return out
+
+    def rows_by_report(self, report_ids: Sequence[str]) -> list:
+        """Plain report_images rows (SELECT *), in insertion order."""
+        if not report_ids:
+            return []
+        cond, args = self.s.in_list("report_id", list(report_ids))
+        return self.s.execute(f"SELECT * FROM report_images WHERE {cond} ORDER BY id", args).fetchall()
+
+    def insert_row(self, row: Dict[str, object]) -> bool:
+        return self._insert_row("report_images", row)
+
+    def photos_by_report(self, report_ids: Sequence[str]) -> Dict[str, list]:
+        """id, file_path + PHOTO_META_COLUMNS per report, in upload order."""
+        out: Dict[str, list] = {rid: [] for rid in report_ids}
+        if not report_ids:
+            return out
+        cond, args = self.s.in_list("report_id", list(out))
+        rows = self.s.execute(
+            f"SELECT id, report_id, file_path, {', '.join(PHOTO_META_COLUMNS)} FROM report_images WHERE {cond} ORDER BY id",
+            args
+        ).fetchall()
+        for r in rows:
+            out[r["report_id"]].append(r)
+        return out
+
+    def for_project(self, project_id: str, captured_from: Optional[str] = None, captured_to: Optional[str] = None,
+                    bbox: Optional[Tuple[float, float, float, float]] = None, limit: int = 1000) -> list:
+        """Photos of a project by capture time (inclusive ISO bounds) and/or bounding box
+        (min_lat, min_lon, max_lat, max_lon), answered from the metadata columns alone."""
+        where, args = ["r.project_id = ?"], [project_id]
+        if captured_from:
+            where.append("ri.captured_at >= ?")
+            args.append(captured_from)
+        if captured_to:
+            where.append("ri.captured_at <= ?")
+            args.append(captured_to)
+        if bbox:
+            where.append("ri.lat >= ? AND ri.lat <= ? AND ri.lon >= ? AND ri.lon <= ?")
+            args.extend([bbox[0], bbox[2], bbox[1], bbox[3]])
+        meta = ", ".join(f"ri.{c}" for c in PHOTO_META_COLUMNS)
+        return self.s.execute(
+            f"""
+            SELECT ri.id, ri.report_id, ri.file_path, {meta}
+            FROM report_images ri
+            JOIN reports r ON r.id = ri.report_id
+            WHERE {' AND '.join(where)}
+            ORDER BY ri.captured_at, ri.id
+            LIMIT ?
+            """,
+            (*args, limit)
+        ).fetchall()
+
+    def photos_by_ids(self, image_ids: Sequence[int]) -> list:
+        if not image_ids:
+            return []
+        cond, args = self.s.in_list("id", list(image_ids))
+        return self.s.execute(
+            f"SELECT id, report_id, file_path, {', '.join(PHOTO_META_COLUMNS)} FROM report_images WHERE {cond}", args
+        ).fetchall()
+
+    def hashes_for_project(self, project_id: str) -> list:
+        """(id, phash) of a project's hashed photos, for photo_index."""
+        return self.s.execute(
+            """
+            SELECT ri.id, ri.phash FROM report_images ri
+            JOIN reports r ON r.id = ri.report_id
+            WHERE r.project_id = ? AND ri.phash IS NOT NULL
+            """,
+            (project_id,)
+        ).fetchall()
+
+    def unhashed(self, after_id: int, limit: int) -> list:
+        """Photos without phash (uploaded before hashing existed), by id from after_id on."""
+        return self.s.execute(
+            "SELECT id, file_path FROM report_images WHERE phash IS NULL AND id > ? ORDER BY id LIMIT ?",
+            (after_id, limit)
+        ).fetchall()
+
+    def set_hash(self, image_id: int, phash: int) -> None:
+        self.s.execute("UPDATE report_images SET phash = ? WHERE id = ?", (phash, image_id))
+
+    def add(self, report_id: str, photos: Iterable[Tuple[str, dict]]) -> None:
+        """photos: (file_path, metadata) as returned by image_processing.save_images_for_report."""
+        self.s.executemany(
+            f"INSERT INTO report_images (report_id, file_path, {', '.join(PHOTO_META_COLUMNS)}) "
+            f"VALUES (?, ?{', ?' * len(PHOTO_META_COLUMNS)})",
+            [(report_id, path, *(meta.get(c) for c in PHOTO_META_COLUMNS)) for path, meta in photos]
+        )
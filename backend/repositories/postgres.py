@@ -0,0 +1,160 @@
+"""PostgreSQL store (DB_BACKEND=postgres). Needs ``psycopg[binary]`` and ``psycopg_pool``.
+
+Connections come from a per-URL pool; large listings use server-side (named) cursors
+so a month of reports is streamed in chunks instead of loaded at once. Queries keep the
+"?" placeholders used everywhere else and are translated here.
+"""
+import os
+import uuid
+import threading
+from typing import Dict, Iterable, Iterator, Sequence, Tuple
+
+from repositories.base import CHUNK_SIZE, Store
+
+_pools: Dict[Tuple[str, bool], object] = {}
+_pools_lock = threading.Lock()
+_sql_cache: Dict[str, str] = {}
+
+def _translate(sql: str) -> str:
+    out = _sql_cache.get(sql)
+    if out is None:
+        out = _sql_cache[sql] = sql.replace("%", "%%").replace("?", "%s")
+    return out
+
+class Row(dict):
+    """dict row that also answers row[0], like sqlite3.Row."""
+    __slots__ = ("_values",)
+
+    def __init__(self, names, values):
+        super().__init__(zip(names, values))
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._values[key]
+        return dict.__getitem__(self, key)
+
+def _row_factory(cursor):
+    names = [c.name for c in cursor.description] if cursor.description else []
+
+    def make(values):
+        return Row(names, values)
+    return make
+
+class PostgresStore(Store):
+    backend = "postgres"
+
+    def __init__(self, conn, pool):
+        super().__init__(conn)
+        self._pool = pool
+
+    def execute(self, sql: str, args: Sequence = ()):
+        return self.conn.execute(_translate(sql), tuple(args))
+
+    def executemany(self, sql: str, seq: Iterable[Sequence]):
+        cur = self.conn.cursor()
+        cur.executemany(_translate(sql), [tuple(a) for a in seq])
+        return cur
+
+    def chunks(self, sql: str, args: Sequence = (), size: int = CHUNK_SIZE) -> Iterator[list]:
+        cur = self.conn.cursor(name=f"chunks_{uuid.uuid4().hex[:12]}")
+        try:
+            cur.itersize = size
+            cur.execute(_translate(sql), tuple(args))
+            while True:
+                rows = cur.fetchmany(size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cur.close()
+
+    def in_list(self, column: str, values: Iterable) -> Tuple[str, tuple]:
+        return f"{column} = ANY(?)", (list(values),)
+
+    def close(self) -> None:
+        # drop whatever the handler left uncommitted (no-op when idle)
+        self.conn.rollback()
+        self._pool.putconn(self.conn)
+
+    def reconcile_project_stats(self) -> int:
+        cur = self.execute("""
+            UPDATE projects SET
+                reports_count = (SELECT COUNT(*) FROM reports r WHERE r.project_id = projects.id),
+                images_count = (SELECT COUNT(*) FROM report_images ri JOIN reports r ON r.id = ri.report_id
+                                WHERE r.project_id = projects.id),
+                last_report_at = (SELECT MAX(r.created_at) FROM reports r WHERE r.project_id = projects.id)
+            WHERE cold_at IS NULL
+        """)
+        self.commit()
+        return cur.rowcount
+
+    def recompute_project_stats(self, project_id: str) -> None:
+        self.execute("SELECT bauapp_recompute_project_stats(?)", (project_id,))
+
+    def rebuild_report_tags(self) -> int:
+        self.execute("DELETE FROM report_tags")
+        # fires trg_reports_tags for every row
+        self.execute("UPDATE reports SET quick_actions = quick_actions")
+        n = self.execute("SELECT COUNT(*) FROM report_tags").fetchone()[0]
+        self.commit()
+        return n
+
+def _get_pool(cfg, read_only: bool):
+    from psycopg_pool import ConnectionPool
+
+    url = (cfg.get("DATABASE_READ_URL") if read_only else None) or cfg.get("DATABASE_URL")
+    if not url:
+        raise RuntimeError("DB_BACKEND=postgres braucht DATABASE_URL")
+    replica = read_only and bool(cfg.get("DATABASE_READ_URL"))
+    key = (url, replica)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                def configure(conn):
+                    conn.row_factory = _row_factory
+                    if replica:
+                        conn.read_only = True
+
+                pool = ConnectionPool(
+                    url,
+                    min_size=int(cfg.get("PG_POOL_MIN") or 1),
+                    max_size=int(cfg.get("PG_POOL_MAX") or 10),
+                    configure=configure,
+                    name="bauapp-ro" if replica else "bauapp",
+                    open=True,
+                )
+                _pools[key] = pool
+    return pool
+
+def open_postgres_store(cfg, read_only: bool = False) -> PostgresStore:
+    pool = _get_pool(cfg, read_only)
+    store = PostgresStore(pool.getconn(), pool)
+    # a replica may lag behind the primary
+    store.stale = read_only and bool(cfg.get("DATABASE_READ_URL"))
+    return store
+
+def init_postgres(cfg, schema_path: str) -> None:
+    from db import seed_demo_data
+
+    store = open_postgres_store(cfg)
+    try:
+        with open(schema_path, "r", encoding="utf-8") as f:
+            # no parameters: psycopg sends the script as-is, several statements allowed
+            store.conn.execute(f.read())
+        seed_demo_data(store)
+        store.commit()
+    finally:
+        store.close()
+
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+# Forked workers (gunicorn --preload) must not share the parent's sockets.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: _pools.clear())
@@ -0,0 +1,55 @@
+import json
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+import db
+from read_snapshot import SnapshotManager, read_snapshots
+from repositories.base import CHUNK_SIZE, Store
+
+class SqliteStore(Store):
+    backend = "sqlite"
+
+    def __init__(self, conn, release: Optional[Callable] = None):
+        super().__init__(conn)
+        # pooled connection (tenants.py): close() hands it back instead of closing it
+        self._release = release
+
+    def close(self) -> None:
+        if self._release is None:
+            self.conn.close()
+        else:
+            self._release(self.conn)
+
+    def chunks(self, sql: str, args: Sequence = (), size: int = CHUNK_SIZE) -> Iterator[list]:
+        # sqlite3 cursors step lazily, so this never holds more than one chunk in memory
+        cur = self.conn.execute(sql, tuple(args))
+        while True:
+            rows = cur.fetchmany(size)
+            if not rows:
+                return
+            yield rows
+
+    def in_list(self, column: str, values: Iterable) -> Tuple[str, tuple]:
+        return f"{column} IN (SELECT value FROM json_each(?))", (json.dumps(list(values)),)
+
+    def reconcile_project_stats(self) -> int:
+        return db.reconcile_project_stats(self.conn)
+
+    def recompute_project_stats(self, project_id: str) -> None:
+        db.recompute_project_stats(self.conn, project_id)
+
+    def rebuild_report_tags(self) -> int:
+        return db.rebuild_report_tags(self.conn)
+
+def open_sqlite_store(cfg, read_only: bool = False, snapshots: Optional[SnapshotManager] = None) -> SqliteStore:
+    """snapshots: the tenant's own SnapshotManager; default is the process-wide one."""
+    if read_only:
+        snapshots = snapshots or read_snapshots
+        store = SqliteStore(snapshots.connect(cfg))
+        store.stale = snapshots.may_be_stale(cfg)
+        return store
+    return SqliteStore(db.get_db(cfg["DB_FILE"]))
+
+def init_sqlite(cfg, schema_path: str, seed: bool = True) -> None:
+    db.init_db(cfg["DB_FILE"], schema_path, seed=seed)
+    if read_snapshots.mode(cfg) in ("wal", "backup"):
+        db.enable_wal(cfg["DB_FILE"])
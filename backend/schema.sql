@@ -19,7 +19,11 @@ CREATE TABLE IF NOT EXISTS projects (
     description TEXT,
     image_url TEXT,
     created_at TEXT NOT NULL,
-    updated_at TEXT
+    updated_at TEXT,
+    reports_count INTEGER NOT NULL DEFAULT 0,
+    images_count INTEGER NOT NULL DEFAULT 0,
+    last_report_at TEXT,
+    cold_at TEXT                      -- set while reports/photos live in the cold archive (cold_archive.py)
 );
 
 CREATE TABLE IF NOT EXISTS project_assignments (
@@ -43,6 +47,7 @@ CREATE TABLE IF NOT EXISTS reports (
     end_time TEXT,
     break_minutes INTEGER,
     created_at TEXT NOT NULL,
+    client_key TEXT,                  -- idempotency key from offline clients (unique per user)
     FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
@@ -51,11 +56,55 @@ CREATE TABLE IF NOT EXISTS report_images (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     report_id TEXT NOT NULL,
     file_path TEXT NOT NULL,
+    -- read once at upload (image_processing.photo_metadata); indexed in db.py
+    captured_at TEXT,                 -- EXIF capture time, camera local time
+    lat REAL,
+    lon REAL,
+    width INTEGER,
+    height INTEGER,
+    byte_size INTEGER,
+    phash INTEGER,                    -- 64-bit difference hash (photo_index.py)
     FOREIGN KEY (report_id) REFERENCES reports(id) ON DELETE CASCADE
 );
 
+-- quick actions, one row per tag (filled from reports.quick_actions by triggers, see db.py)
+CREATE TABLE IF NOT EXISTS report_tags (
+    report_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (report_id, position),
+    FOREIGN KEY (report_id) REFERENCES reports(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id TEXT PRIMARY KEY,              -- sha256 of the opaque token
+    user_id TEXT NOT NULL,
+    family_id TEXT NOT NULL,          -- all rotations of one login
+    created_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    revoked_at TEXT,
+    replaced_by TEXT,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- SSE feed / Last-Event-ID resume; audience = JSON list of worker ids that may see the event
+CREATE TABLE IF NOT EXISTS change_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    project_id TEXT,
+    audience TEXT NOT NULL DEFAULT '[]',
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
 CREATE INDEX IF NOT EXISTS idx_reports_project ON reports(project_id);
+CREATE INDEX IF NOT EXISTS idx_reports_project_created ON reports(project_id, created_at);
 CREATE INDEX IF NOT EXISTS idx_reports_user ON reports(user_id);
+CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at);
 CREATE INDEX IF NOT EXISTS idx_assignments_project ON project_assignments(project_id);
 CREATE INDEX IF NOT EXISTS idx_assignments_user ON project_assignments(user_id);
 CREATE INDEX IF NOT EXISTS idx_report_images_report ON report_images(report_id);
+CREATE INDEX IF NOT EXISTS idx_report_tags_tag ON report_tags(tag, report_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens(user_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens(family_id);
+CREATE INDEX IF NOT EXISTS idx_change_log_created ON change_log(created_at);
@@ -0,0 +1,202 @@
+-- PostgreSQL schema (DB_BACKEND=postgres). Mirrors schema.sql; timestamps stay ISO-8601 text
+-- so both backends return identical JSON. Idempotent: runs on every start.
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    password_hash TEXT NOT NULL,
+    role TEXT NOT NULL CHECK(role IN ('admin', 'worker')),
+    created_at TEXT NOT NULL,
+    avatar_path TEXT
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT NOT NULL,
+    customer_name TEXT NOT NULL,
+    status TEXT NOT NULL CHECK(status IN ('active', 'completed', 'paused', 'archived')),
+    description TEXT,
+    image_url TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT,
+    reports_count INTEGER NOT NULL DEFAULT 0,
+    images_count INTEGER NOT NULL DEFAULT 0,
+    last_report_at TEXT,
+    cold_at TEXT
+);
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS cold_at TEXT;
+
+CREATE TABLE IF NOT EXISTS project_assignments (
+    id BIGSERIAL PRIMARY KEY,
+    project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(project_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    text TEXT NOT NULL,
+    quick_actions TEXT,
+    weather TEXT,
+    workers_present INTEGER,
+    start_time TEXT,
+    end_time TEXT,
+    break_minutes INTEGER,
+    created_at TEXT NOT NULL,
+    client_key TEXT
+);
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS client_key TEXT;
+
+CREATE TABLE IF NOT EXISTS report_images (
+    id BIGSERIAL PRIMARY KEY,
+    report_id TEXT NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    file_path TEXT NOT NULL,
+    captured_at TEXT,
+    lat DOUBLE PRECISION,
+    lon DOUBLE PRECISION,
+    width INTEGER,
+    height INTEGER,
+    byte_size BIGINT,
+    phash BIGINT
+);
+ALTER TABLE report_images ADD COLUMN IF NOT EXISTS captured_at TEXT;
+ALTER TABLE report_images ADD COLUMN IF NOT EXISTS lat DOUBLE PRECISION;
+ALTER TABLE report_images ADD COLUMN IF NOT EXISTS lon DOUBLE PRECISION;
+ALTER TABLE report_images ADD COLUMN IF NOT EXISTS width INTEGER;
+ALTER TABLE report_images ADD COLUMN IF NOT EXISTS height INTEGER;
+ALTER TABLE report_images ADD COLUMN IF NOT EXISTS byte_size BIGINT;
+ALTER TABLE report_images ADD COLUMN IF NOT EXISTS phash BIGINT;
+
+CREATE TABLE IF NOT EXISTS report_tags (
+    report_id TEXT NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (report_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    family_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    revoked_at TEXT,
+    replaced_by TEXT
+);
+
+CREATE TABLE IF NOT EXISTS change_log (
+    id BIGSERIAL PRIMARY KEY,
+    type TEXT NOT NULL,
+    project_id TEXT,
+    audience TEXT NOT NULL DEFAULT '[]',
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_reports_project ON reports(project_id);
+CREATE INDEX IF NOT EXISTS idx_reports_project_created ON reports(project_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_user ON reports(user_id);
+CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reports_client_key ON reports(user_id, client_key) WHERE client_key IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_assignments_project ON project_assignments(project_id);
+CREATE INDEX IF NOT EXISTS idx_assignments_user ON project_assignments(user_id);
+CREATE INDEX IF NOT EXISTS idx_report_images_report ON report_images(report_id);
+CREATE INDEX IF NOT EXISTS idx_report_images_captured ON report_images(captured_at) WHERE captured_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_report_images_geo ON report_images(lat, lon) WHERE lat IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_report_tags_tag ON report_tags(tag, report_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens(user_id);
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_family ON refresh_tokens(family_id);
+CREATE INDEX IF NOT EXISTS idx_change_log_created ON change_log(created_at);
+
+-- Denormalized project stats, same rules as the SQLite triggers in db.py
+CREATE OR REPLACE FUNCTION bauapp_recompute_project_stats(pid TEXT) RETURNS void AS $$
+    UPDATE projects SET
+        reports_count = (SELECT COUNT(*) FROM reports r WHERE r.project_id = pid),
+        images_count = (SELECT COUNT(*) FROM report_images ri JOIN reports r ON r.id = ri.report_id
+                        WHERE r.project_id = pid),
+        last_report_at = (SELECT MAX(r.created_at) FROM reports r WHERE r.project_id = pid)
+    WHERE id = pid;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION bauapp_reports_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE projects SET
+            reports_count = reports_count + 1,
+            last_report_at = CASE
+                WHEN last_report_at IS NULL OR NEW.created_at > last_report_at THEN NEW.created_at
+                ELSE last_report_at END
+        WHERE id = NEW.project_id;
+        RETURN NEW;
+    END IF;
+    IF TG_WHEN = 'BEFORE' THEN
+        -- the report_images cascade runs once the report is gone, see bauapp_report_images_stats
+        UPDATE projects SET
+            images_count = images_count - (SELECT COUNT(*) FROM report_images WHERE report_id = OLD.id)
+        WHERE id = OLD.project_id;
+        RETURN OLD;
+    END IF;
+    UPDATE projects SET
+        reports_count = reports_count - 1,
+        last_report_at = CASE
+            WHEN OLD.created_at = last_report_at
+            THEN (SELECT MAX(r.created_at) FROM reports r WHERE r.project_id = OLD.project_id)
+            ELSE last_report_at END
+    WHERE id = OLD.project_id;
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bauapp_report_images_stats() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE projects SET images_count = images_count + 1
+        WHERE id = (SELECT project_id FROM reports WHERE id = NEW.report_id);
+        RETURN NEW;
+    END IF;
+    -- no-op for photos deleted with their report (already subtracted before the report went)
+    UPDATE projects SET images_count = images_count - 1
+    WHERE id = (SELECT project_id FROM reports WHERE id = OLD.report_id);
+    RETURN OLD;
+END $$ LANGUAGE plpgsql;
+
+-- report_tags from reports.quick_actions (JSON array of strings; anything else -> no tags)
+CREATE OR REPLACE FUNCTION bauapp_report_tags() RETURNS trigger AS $$
+DECLARE
+    qa jsonb;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM report_tags WHERE report_id = NEW.id;
+    END IF;
+    BEGIN
+        qa := NEW.quick_actions::jsonb;
+    EXCEPTION WHEN others THEN
+        qa := NULL;
+    END;
+    IF qa IS NOT NULL AND jsonb_typeof(qa) = 'array' THEN
+        INSERT INTO report_tags (report_id, position, tag)
+        SELECT NEW.id, (e.ord - 1)::int, e.value #>> '{}'
+        FROM jsonb_array_elements(qa) WITH ORDINALITY AS e(value, ord)
+        WHERE jsonb_typeof(e.value) = 'string' AND trim(e.value #>> '{}') <> '';
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_reports_stats ON reports;
+CREATE TRIGGER trg_reports_stats AFTER INSERT OR DELETE ON reports
+    FOR EACH ROW EXECUTE FUNCTION bauapp_reports_stats();
+
+DROP TRIGGER IF EXISTS trg_reports_before_delete_stats ON reports;
+CREATE TRIGGER trg_reports_before_delete_stats BEFORE DELETE ON reports
+    FOR EACH ROW EXECUTE FUNCTION bauapp_reports_stats();
+
+DROP TRIGGER IF EXISTS trg_report_images_stats ON report_images;
+CREATE TRIGGER trg_report_images_stats AFTER INSERT OR DELETE ON report_images
+    FOR EACH ROW EXECUTE FUNCTION bauapp_report_images_stats();
+
+DROP TRIGGER IF EXISTS trg_reports_tags ON reports;
+CREATE TRIGGER trg_reports_tags AFTER INSERT OR UPDATE OF quick_actions ON reports
+    FOR EACH ROW EXECUTE FUNCTION bauapp_report_tags();
@@ -0,0 +1,131 @@
+"""CSV and XLSX tables written on the fly for streaming responses.
+
+Rows come from an iterator (usually store chunks) and go out in blocks of FLUSH_ROWS, so
+memory stays flat however long the table is and the download starts with the header row.
+
+CSV is what German Excel opens with a double click: UTF-8 with BOM, ``;`` between fields,
+decimal comma. Text starting with = + - @ gets a leading apostrophe so it can't run as a
+formula. XLSX is written without a spreadsheet library: one worksheet of inline strings
+and plain numbers, deflated through zipfile in its non-seekable mode (see zip_stream.py).
+"""
+import io
+import re
+import csv
+import zipfile
+from typing import Iterable, Iterator, Sequence
+from xml.sax.saxutils import escape
+
+from zip_stream import StreamSink
+
+FLUSH_ROWS = 500
+
+_FORMULA_START = ("=", "+", "-", "@")
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}".replace(".", ",")
+    if isinstance(value, str) and value.startswith(_FORMULA_START):
+        return "'" + value
+    return str(value)
+
+def stream_csv(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=";", lineterminator="\r\n")
+    writer.writerow(header)
+    yield ("\ufeff" + buf.getvalue()).encode("utf-8")
+    buf.seek(0)
+    buf.truncate()
+    for n, row in enumerate(rows, 1):
+        writer.writerow([_csv_value(v) for v in row])
+        if n % FLUSH_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+# -----------------------
+# XLSX
+# -----------------------
+_XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_STATIC_PARTS = (
+    ("[Content_Types].xml",
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ("_rels/.rels",
+     f'<Relationships xmlns="{_PKG_REL_NS}">'
+     f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ("xl/_rels/workbook.xml.rels",
+     f'<Relationships xmlns="{_PKG_REL_NS}">'
+     f'<Relationship Id="rId1" Type="{_REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+     '</Relationships>'),
+)
+
+# characters XML 1.0 doesn't allow (control characters pasted into report texts)
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+def _column(index: int) -> str:
+    name = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+def _row_xml(r: int, row: Sequence, columns: Sequence[str]) -> str:
+    cells = []
+    for col, value in zip(columns, row):
+        if value is None or value == "":
+            continue
+        ref = f"{col}{r}"
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = escape(_XML_INVALID.sub("", str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{r}">{"".join(cells)}</row>'
+
+def stream_xlsx(header: Sequence[str], rows: Iterable[Sequence], sheet_name: str = "Tabelle1") -> Iterator[bytes]:
+    """A one-sheet workbook; sheet_name at most 31 characters, no []:*?/\\."""
+    columns = [_column(i) for i in range(len(header))]
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for name, xml in _STATIC_PARTS:
+            zf.writestr(name, _XML_HEAD + xml)
+        zf.writestr(
+            "xl/workbook.xml",
+            _XML_HEAD + f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>'
+            f'<sheet name="{escape(sheet_name, {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        )
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            # frozen header row
+            sheet.write((
+                _XML_HEAD + f'<worksheet xmlns="{_MAIN_NS}"><sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                '</sheetView></sheetViews><sheetData>' + _row_xml(1, header, columns)
+            ).encode("utf-8"))
+            yield sink.drain()
+            part = []
+            for r, row in enumerate(rows, 2):
+                part.append(_row_xml(r, row, columns))
+                if len(part) >= FLUSH_ROWS:
+                    sheet.write("".join(part).encode("utf-8"))
+                    part.clear()
+                    data = sink.drain()
+                    if data:
+                        yield data
+            sheet.write(("".join(part) + "</sheetData></worksheet>").encode("utf-8"))
+    yield sink.drain()
@@ -0,0 +1,246 @@
+"""Per-tenant storage: several construction companies on one installation.
+
+With TENANTS_DIR set, every tenant has its own directory ``<TENANTS_DIR>/<tenant>/``
+holding its SQLite database, uploads, read snapshots and cold archive. Queries, backups
+and migrations of one tenant never touch another one's files, and a tenant moves to
+another host by copying its directory (the database is migrated on first use there,
+see ``db.SCHEMA_VERSION``). ``flask create-tenant`` creates the directory.
+
+The tenant of a request comes from the access token (``tid`` claim); requests without
+a token (login, refresh, /uploads/) use the host name: TENANT_HOSTS ("host=tenant,...")
+or the label directly below TENANT_BASE_DOMAIN (mueller.bau.example -> mueller with
+TENANT_BASE_DOMAIN=bau.example), else TENANT_DEFAULT. Other hosts (a shared API host)
+name no tenant. A token is rejected on another tenant's host.
+
+Each worker keeps the last TENANT_CACHE_SIZE tenants open in an LRU: their config,
+read-snapshot manager and a few idle connections. Tenancy is SQLite only.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from flask import current_app, g, has_request_context, request
+
+import db
+from instrumentation import Gauge, register_metric
+
+TENANT_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+# settings rewritten per tenant: (config key, file/dir name inside the tenant directory)
+TENANT_PATHS = (
+    ("DB_FILE", "baustelle.db"),
+    ("UPLOAD_ROOT", "uploads"),
+    ("READ_SNAPSHOT_DIR", "snapshots"),
+    ("ARCHIVE_DB_FILE", "archive.db"),
+    ("ARCHIVE_PACK_DIR", "archive_packs"),
+)
+
+class UnknownTenant(Exception):
+    pass
+
+def enabled(cfg) -> bool:
+    return bool(cfg.get("TENANTS_DIR"))
+
+def check_config(cfg) -> None:
+    if enabled(cfg) and (cfg.get("DB_BACKEND") or "sqlite").lower() != "sqlite":
+        raise RuntimeError("TENANTS_DIR geht nur mit DB_BACKEND=sqlite")
+
+def tenant_dir(cfg, name: str) -> str:
+    if not TENANT_NAME_RE.match(name or ""):
+        raise UnknownTenant(name)
+    return os.path.join(os.path.abspath(cfg["TENANTS_DIR"]), name)
+
+def tenant_config(cfg, name: str) -> dict:
+    base = tenant_dir(cfg, name)
+    out = dict(cfg)
+    out.update({key: os.path.join(base, rel) for key, rel in TENANT_PATHS})
+    return out
+
+class Tenant:
+    """One open tenant: its config, snapshot manager and idle connections."""
+
+    def __init__(self, name: str, cfg: dict, base_dir: str, max_idle: int):
+        from read_snapshot import SnapshotManager
+
+        self.name = name
+        self.cfg = cfg
+        self.base_dir = base_dir  # stored file paths are relative to this
+        self.snapshots = SnapshotManager()
+        self._max_idle = max_idle
+        self._idle: List = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def open_store(self, read_only: bool = False):
+        from repositories.sqlite import SqliteStore, open_sqlite_store
+
+        if read_only:
+            return open_sqlite_store(self.cfg, read_only=True, snapshots=self.snapshots)
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = db.get_db(self.cfg["DB_FILE"], check_same_thread=False)
+        return SqliteStore(conn, release=self._release)
+
+    def _release(self, conn) -> None:
+        try:
+            conn.rollback()  # whatever the request did not commit
+        except Exception:
+            conn.close()
+            return
+        with self._lock:
+            if not self._closed and len(self._idle) < self._max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+        self.snapshots.close()
+
+class TenantRegistry:
+    """LRU of open tenants per process; opening one runs its migrations if needed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._opening: Dict[str, threading.Lock] = {}
+
+    def _cached(self, name: str) -> Optional[Tenant]:
+        with self._lock:
+            tenant = self._items.get(name)
+            if tenant is not None:
+                self._items.move_to_end(name)
+            return tenant
+
+    def get(self, cfg, name: str, schema_dir: str) -> Tenant:
+        tenant = self._cached(name)
+        if tenant is not None:
+            return tenant
+        base = tenant_dir(cfg, name)
+        if not os.path.isdir(base):
+            raise UnknownTenant(name)
+        with self._lock:
+            opening = self._opening.setdefault(name, threading.Lock())
+        # a tenant is opened (and migrated) once per process, not once per thread; requests
+        # for other tenants go on meanwhile
+        with opening:
+            tenant = self._cached(name)
+            if tenant is not None:
+                return tenant
+            try:
+                tenant = Tenant(name, tenant_config(cfg, name), base, int(cfg.get("TENANT_IDLE_CONNECTIONS") or 0))
+                open_tenant_storage(tenant.cfg, schema_dir)
+            except BaseException:
+                with self._lock:
+                    self._opening.pop(name, None)
+                raise
+            with self._lock:
+                self._opening.pop(name, None)
+                self._items[name] = tenant
+                evicted = []
+                while len(self._items) > max(1, int(cfg.get("TENANT_CACHE_SIZE") or 1)):
+                    evicted.append(self._items.popitem(last=False)[1])
+        for old in evicted:
+            old.close()
+        return tenant
+
+    def close_all(self) -> None:
+        with self._lock:
+            items, self._items = list(self._items.values()), OrderedDict()
+        for tenant in items:
+            tenant.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+registry = TenantRegistry()
+
+register_metric(Gauge("bauapp_tenants_open", "Tenants held open by this worker.", (), lambda: {(): len(registry)}))
+
+def open_tenant_storage(cfg: dict, schema_dir: str) -> None:
+    """Create/migrate a tenant's database and upload root (no demo data)."""
+    from repositories import init_storage
+
+    db.ensure_upload_root(cfg["UPLOAD_ROOT"])
+    init_storage(cfg, schema_dir, seed=False)
+
+# -----------------------
+# Resolution (per request / CLI command)
+# -----------------------
+def _host_map(cfg) -> Dict[str, str]:
+    out = {}
+    for item in (cfg.get("TENANT_HOSTS") or "").split(","):
+        host, _, name = item.partition("=")
+        if host.strip() and name.strip():
+            out[host.strip().lower()] = name.strip()
+    return out
+
+def host_tenant(cfg) -> Optional[str]:
+    """Tenant named by the request's host, None if the host doesn't name one."""
+    if not has_request_context():
+        return None
+    host = request.host.lower()
+    if not host.startswith("["):  # IPv6 literals never name a tenant
+        host = host.split(":", 1)[0]
+    mapped = _host_map(cfg).get(host)
+    if mapped:
+        return mapped
+    base = (cfg.get("TENANT_BASE_DOMAIN") or "").strip().strip(".").lower()
+    if base and host.endswith("." + base):
+        label = host[:-len(base) - 1]
+        if "." not in label:
+            return label
+    return None
+
+def current_name(cfg) -> Optional[str]:
+    """Tenant of the current request/CLI command; None if tenancy is off."""
+    if not enabled(cfg):
+        return None
+    name = g.get("tenant_name") or host_tenant(cfg) or cfg.get("TENANT_DEFAULT")
+    if not name:
+        raise UnknownTenant("")
+    return name
+
+def current(cfg) -> Optional[Tenant]:
+    name = current_name(cfg)
+    if name is None:
+        return None
+    tenant = g.get("tenant")
+    if tenant is None or tenant.name != name:
+        tenant = g.tenant = registry.get(cfg, name, current_app.root_path)
+    return tenant
+
+def accept_token_claims(cfg, claims: dict) -> bool:
+    """Bind the request to the token's tenant; False if the token belongs to another one."""
+    if not enabled(cfg):
+        return True
+    tid = claims.get("tid")
+    if not tid:
+        return False
+    host = host_tenant(cfg)
+    if host and host != tid:
+        return False
+    g.tenant_name = tid
+    return True
+
+def storage_config(cfg):
+    """cfg with the current tenant's paths (cfg itself without tenancy)."""
+    tenant = current(cfg)
+    return tenant.cfg if tenant else cfg
+
+def open_request_store(cfg, read_only: bool = False):
+    """Store of the current tenant; open_store(cfg) without tenancy."""
+    from repositories import open_store
+
+    tenant = current(cfg)
+    if tenant is None:
+        return open_store(cfg, read_only=read_only)
+    return tenant.open_store(read_only=read_only)
@@ -0,0 +1,51 @@
+"""Test setup: the app is imported once against a throwaway database, uploads and archive
+(Config reads the environment at import time)."""
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_TMP = tempfile.mkdtemp(prefix="bauapp-tests-")
+os.environ.update({
+    "DB_BACKEND": "sqlite",
+    "DB_FILE": os.path.join(_TMP, "baustelle.db"),
+    "UPLOAD_ROOT": os.path.join(_TMP, "uploads"),
+    "ARCHIVE_DB_FILE": os.path.join(_TMP, "archive.db"),
+    "ARCHIVE_PACK_DIR": os.path.join(_TMP, "archive_packs"),
+    "READ_SNAPSHOT_DIR": os.path.join(_TMP, "snapshots"),
+    "PDF_IMAGE_CACHE_DIR": os.path.join(_TMP, "pdf_cache"),
+    "TENANTS_DIR": "",
+    "READ_SNAPSHOT_MODE": "off",
+    # demo passwords are hashed on every login; keep that cheap
+    "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+})
+
+import app as bauapp  # noqa: E402
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+@pytest.fixture
+def app():
+    return bauapp.app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def login(client):
+    """login(username, password) -> response body of POST /api/auth/login (asserts 200)."""
+    def do_login(username="admin", password="demo123"):
+        r = client.post("/api/auth/login", json={"username": username, "password": password})
+        assert r.status_code == 200, r.get_json()
+        return r.get_json()
+    return do_login
+
+def bearer(body) -> dict:
+    return {"Authorization": f"Bearer {body['token']}"}
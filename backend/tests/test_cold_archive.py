@@ -0,0 +1,121 @@
+import io
+import os
+import sqlite3
+
+import pytest
+from PIL import Image
+
+from conftest import bearer
+
+def jpeg(color) -> io.BytesIO:
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 600), color).save(buf, "JPEG")
+    buf.seek(0)
+    return buf
+
+def hot_report_ids(app, project_id):
+    conn = sqlite3.connect(app.config["DB_FILE"])
+    try:
+        return {r[0] for r in conn.execute("SELECT id FROM reports WHERE project_id = ?", (project_id,))}
+    finally:
+        conn.close()
+
+def listed_project(client, headers, project_id):
+    return next(p for p in client.get("/api/projects", headers=headers).get_json() if p["id"] == project_id)
+
+def stats(project):
+    return project["reportsCount"], project["imagesCount"], project["lastReportAt"]
+
+@pytest.fixture
+def cold_project(client, login, app):
+    """An archived project with two reports (one with a photo by the worker, a tagged one by
+    the admin), moved to the cold archive."""
+    admin, worker = login(), login("max")
+    headers = bearer(admin)
+    r = client.post("/api/projects", headers=headers, json={
+        "name": "Altbau Ringstraße", "address": "Ringstraße 1", "customerName": "Kunde",
+        "assignedWorkers": [worker["user"]["id"]],
+    })
+    project_id = r.get_json()["id"]
+    with_photo = client.post("/api/reports", headers=bearer(worker), content_type="multipart/form-data", data={
+        "projectId": project_id, "text": "Fenster eingebaut", "images": [(jpeg("red"), "fenster.jpg")],
+    }).get_json()
+    tagged = client.post("/api/reports", headers=headers, json={
+        "projectId": project_id, "text": "Abnahme", "quickActions": ["Inspektion"],
+    }).get_json()
+    photo_url = with_photo["images"][0]
+    photo_path = photo_url.split("/uploads/", 1)[1]
+    photo = client.get("/uploads/" + photo_path).data
+    assert client.post(f"/api/projects/{project_id}/archive", headers=headers).status_code == 200
+    before = listed_project(client, headers, project_id)
+
+    out = app.test_cli_runner().invoke(args=["archive-cold-projects", "--project", project_id]).output
+    assert "1 Projekte ins Archiv verschoben." in out
+    return {
+        "id": project_id, "headers": headers, "worker": bearer(worker), "before": before,
+        "reports": {with_photo["id"], tagged["id"]}, "photo_path": photo_path, "photo": photo,
+    }
+
+def test_freeze_moves_rows_and_photos_and_keeps_stats(client, app, cold_project):
+    project_id = cold_project["id"]
+    assert hot_report_ids(app, project_id) == set()
+    assert stats(listed_project(client, cold_project["headers"], project_id)) == stats(cold_project["before"])
+    assert stats(cold_project["before"])[:2] == (2, 1)
+
+    packs = os.listdir(app.config["ARCHIVE_PACK_DIR"])
+    assert [p for p in packs if p.startswith(project_id)]
+    upload_root = app.config["UPLOAD_ROOT"]
+    assert not os.path.exists(os.path.join(upload_root, cold_project["photo_path"]))
+    # old links keep working: served from the pack
+    r = client.get("/uploads/" + cold_project["photo_path"])
+    assert r.status_code == 200 and r.data == cold_project["photo"]
+
+def test_cold_reports_are_listed_on_request_and_in_the_dashboard(client, app, monkeypatch, cold_project):
+    monkeypatch.setitem(app.config, "DASHBOARD_CACHE_SECONDS", 0)
+    admin, worker = cold_project["headers"], cold_project["worker"]
+    hot = {r["id"] for r in client.get("/api/reports", headers=admin).get_json()}
+    assert not cold_project["reports"] & hot
+    listed = {r["id"]: r for r in client.get("/api/reports?archived=1", headers=admin).get_json()}
+    assert cold_project["reports"] <= set(listed)
+    photo_report = next(r for r in listed.values() if r["id"] in cold_project["reports"] and r["images"])
+    assert photo_report["images"][0].endswith("/uploads/" + cold_project["photo_path"])
+    assert photo_report["userName"] == "Max"
+
+    own = {r["id"] for r in client.get("/api/reports?archived=1", headers=worker).get_json()}
+    assert cold_project["reports"] <= own
+    tagged = {r["id"] for r in client.get("/api/reports?archived=1&tag=Inspektion", headers=admin).get_json()}
+    assert len(cold_project["reports"] & tagged) == 1
+
+    dashboard = client.get("/api/dashboard", headers=admin).get_json()
+    assert dashboard["reports"]["total"] == len(listed)
+    assert {qa["action"]: qa["count"] for qa in dashboard["quickActions"]}["Inspektion"] == len(tagged)
+    assert sum(day["count"] for day in dashboard["reports"]["perDay"]) >= 2
+
+def test_thaw_restores_rows_stats_and_photos(client, app, cold_project):
+    project_id = cold_project["id"]
+    detail = client.get(f"/api/projects/{project_id}", headers=cold_project["headers"]).get_json()
+    assert {r["id"] for r in detail["reports"]} == cold_project["reports"]
+    assert hot_report_ids(app, project_id) == cold_project["reports"]
+    assert stats(listed_project(client, cold_project["headers"], project_id)) == stats(cold_project["before"])
+
+    assert os.path.exists(os.path.join(app.config["UPLOAD_ROOT"], cold_project["photo_path"]))
+    assert client.get("/uploads/" + cold_project["photo_path"]).data == cold_project["photo"]
+    assert not [p for p in os.listdir(app.config["ARCHIVE_PACK_DIR"]) if p.startswith(project_id)]
+    # restored once: the listing has every report exactly once
+    ids = [r["id"] for r in client.get("/api/reports?archived=1", headers=cold_project["headers"]).get_json()]
+    assert len(ids) == len(set(ids))
+
+def test_single_report_is_restored_only_after_the_access_check(client, app, cold_project):
+    project_id = cold_project["id"]
+    conn = sqlite3.connect(app.config["DB_FILE"])
+    with conn:
+        conn.execute("DELETE FROM project_assignments WHERE project_id = ?", (project_id,))
+    conn.close()
+    report_id = next(iter(cold_project["reports"]))
+    for path in (f"/api/reports/{report_id}", f"/api/reports/{report_id}/similar-photos"):
+        assert client.get(path, headers=cold_project["worker"]).status_code == 403
+    assert hot_report_ids(app, project_id) == set()
+
+    r = client.get(f"/api/reports/{report_id}", headers=cold_project["headers"])
+    assert r.status_code == 200 and r.get_json()["id"] == report_id
+    assert hot_report_ids(app, project_id) == cold_project["reports"]
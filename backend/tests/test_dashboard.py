@@ -0,0 +1,21 @@
+import dashboard
+from conftest import bearer
+
+def test_write_in_another_worker_refreshes_the_cached_dashboard(client, app, login, monkeypatch):
+    monkeypatch.setitem(app.config, "DASHBOARD_CACHE_SECONDS", 300)
+    headers = bearer(login())
+    before = client.get("/api/dashboard", headers=headers).get_json()
+    # the write is handled elsewhere: this process' cache is never told
+    monkeypatch.setattr(dashboard.dashboard_cache, "invalidate", lambda scope=None: None)
+    assert client.post("/api/reports", headers=headers, json={"projectId": "proj-1", "text": "Estrich"}).status_code == 201
+    after = client.get("/api/dashboard", headers=headers).get_json()
+    assert after["reports"]["total"] == before["reports"]["total"] + 1
+
+def test_cached_dashboard_is_reused_without_writes(client, app, login, monkeypatch):
+    monkeypatch.setitem(app.config, "DASHBOARD_CACHE_SECONDS", 300)
+    headers = bearer(login())
+    client.get("/api/dashboard", headers=headers)
+    calls = []
+    monkeypatch.setattr("app.compute_dashboard", lambda *a, **k: calls.append(a) or {})
+    client.get("/api/dashboard", headers=headers)
+    assert calls == []
@@ -0,0 +1,34 @@
+import events
+import pytest
+from conftest import bearer
+from events import record_event
+from repositories import open_store
+
+@pytest.fixture
+def feed(app, client, login, monkeypatch):
+    monkeypatch.setitem(app.config, "SSE_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(events, "HEARTBEAT_SECONDS", 0.3)
+    headers = bearer(login())
+    resp = client.get("/api/events", headers=headers, buffered=False)
+    chunks = iter(resp.response)
+    assert next(chunks).startswith(b"retry:")
+    yield headers, chunks
+    resp.close()
+
+def test_events_of_another_worker_arrive_by_polling(app, feed):
+    _, chunks = feed
+    store = open_store(app.config)
+    # written and committed elsewhere: never published to this process' broker
+    event = record_event(store, "project.updated", "proj-1", {"name": "Anderswo"})
+    store.commit()
+    store.close()
+    chunk = next(chunks).decode()
+    assert f"id: {event['id']}\n" in chunk and "Anderswo" in chunk
+
+def test_local_events_are_sent_once(client, feed):
+    headers, chunks = feed
+    assert client.patch("/api/projects/proj-2", headers=headers, json={"description": "neu"}).status_code == 200
+    chunk = next(chunks).decode()
+    assert "event: project.updated" in chunk
+    # the same row is read again by the poll; only heartbeats follow
+    assert next(chunks) == b": ping\n\n"
@@ -0,0 +1,37 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from image_processing import ImageTooLarge, save_images_for_report
+
+def jpeg(size, truncate=False):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (120, 90, 60)).save(buf, format="JPEG", quality=95)
+    data = buf.getvalue()
+    return data[: len(data) // 2] if truncate else data
+
+def upload(data, name="foto.jpg"):
+    return FileStorage(stream=io.BytesIO(data), filename=name)
+
+def test_large_jpeg_is_stored_downscaled(tmp_path):
+    [(path, meta)] = save_images_for_report(str(tmp_path), [upload(jpeg((2000, 1500)))],
+                                            apply_scan=False, max_pixels=1_000_000)
+    assert meta["width"] * meta["height"] <= 1_000_000
+    assert meta["phash"] is not None
+
+def test_corrupt_oversized_jpeg_is_rejected(tmp_path):
+    files = [upload(jpeg((400, 300))), upload(jpeg((2000, 1500), truncate=True))]
+    with pytest.raises(ImageTooLarge):
+        save_images_for_report(str(tmp_path), files, apply_scan=False, max_pixels=1_000_000)
+    assert os.listdir(tmp_path) == []
+
+def test_corrupt_small_jpeg_is_kept_as_uploaded(tmp_path):
+    data = jpeg((400, 300), truncate=True)
+    [(path, meta)] = save_images_for_report(str(tmp_path), [upload(data)], apply_scan=False,
+                                            max_pixels=1_000_000)
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert meta["phash"] is None
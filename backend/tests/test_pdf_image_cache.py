@@ -0,0 +1,27 @@
+import os
+
+from PIL import Image
+
+from pdf_export import ImageCache
+
+def make_photo(path, color):
+    Image.new("RGB", (2400, 1600), color).save(path, "JPEG")
+    return str(path)
+
+def test_prune_keeps_recently_used_copies(tmp_path):
+    photos = [make_photo(tmp_path / f"{c}.jpg", c) for c in ("red", "green", "blue")]
+    cache = ImageCache(str(tmp_path / "cache"), max_px=600)
+    copies = [cache.get(p) for p in photos]
+    assert all(c.startswith(cache.cache_dir) for c in copies)
+    for age, copy in enumerate(copies):
+        os.utime(copy, (1000 + age, 1000 + age))  # red oldest
+
+    cache.max_bytes = sum(os.path.getsize(c) for c in copies) - 1
+    cache.get(photos[0])  # a hit makes red the most recently used
+    assert cache.prune() == 1
+    assert [os.path.exists(c) for c in copies] == [True, False, True]
+
+def test_unlimited_cache_is_not_pruned(tmp_path):
+    cache = ImageCache(str(tmp_path / "cache"), max_px=600)
+    cache.get(make_photo(tmp_path / "a.jpg", "red"))
+    assert cache.prune() == 0
@@ -0,0 +1,32 @@
+from conftest import bearer
+from read_snapshot import SnapshotManager
+
+def test_snapshot_is_shared_between_processes(tmp_path, app):
+    cfg = {"DB_FILE": app.config["DB_FILE"], "READ_SNAPSHOT_DIR": str(tmp_path),
+           "READ_SNAPSHOT_MODE": "backup", "READ_SNAPSHOT_MAX_AGE_SECONDS": 60}
+    # one manager per gunicorn worker
+    first, second = SnapshotManager(), SnapshotManager()
+    try:
+        first.connect(cfg).close()
+        second.connect(cfg).close()
+        assert first._path == second._path
+        assert sorted(p.suffix for p in tmp_path.iterdir()) == [".db", ".lock"]
+    finally:
+        first.close()
+        second.close()
+
+def test_own_timesheet_reads_the_primary(client, login, app, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, "READ_SNAPSHOT_MODE", "backup")
+    monkeypatch.setitem(app.config, "READ_SNAPSHOT_DIR", str(tmp_path))
+    admin, worker = bearer(login()), bearer(login("max"))
+    assert client.get("/api/reports?snapshot=1", headers=admin).status_code == 200  # snapshot taken
+
+    r = client.post("/api/reports", headers=worker, json={"projectId": "proj-1", "text": "Estrich verlegt"})
+    assert r.status_code == 201
+    report_id = r.get_json()["id"]
+
+    own = client.get("/api/reports?snapshot=1", headers=worker).get_json()
+    assert report_id in [x["id"] for x in own]
+    # the admin timesheet may lag behind by up to READ_SNAPSHOT_MAX_AGE_SECONDS
+    everyone = client.get("/api/reports?snapshot=1", headers=admin).get_json()
+    assert report_id not in [x["id"] for x in everyone]
@@ -0,0 +1,49 @@
+from conftest import bearer
+
+def refresh(client, raw):
+    return client.post("/api/auth/refresh", json={"refreshToken": raw})
+
+def test_refresh_rotates_the_token(client, login):
+    first = login()["refreshToken"]
+    r = refresh(client, first)
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["refreshToken"] != first
+    assert client.get("/api/auth/me", headers=bearer(body)).status_code == 200
+    assert refresh(client, body["refreshToken"]).status_code == 200
+
+def test_reuse_within_grace_is_refused_but_keeps_the_family(client, login, app, monkeypatch):
+    monkeypatch.setitem(app.config, "REFRESH_REUSE_GRACE_SECONDS", 60)
+    first = login()["refreshToken"]
+    second = refresh(client, first).get_json()["refreshToken"]
+    # a second tab presenting the token that was just rotated
+    assert refresh(client, first).status_code == 401
+    assert refresh(client, second).status_code == 200
+
+def test_reuse_after_grace_revokes_the_family(client, login, app, monkeypatch):
+    monkeypatch.setitem(app.config, "REFRESH_REUSE_GRACE_SECONDS", 0)
+    first = login()["refreshToken"]
+    second = refresh(client, first).get_json()["refreshToken"]
+    third = refresh(client, second).get_json()["refreshToken"]
+    # the stolen first token comes back: every token of the family is dead, including the newest
+    assert refresh(client, first).status_code == 401
+    assert refresh(client, third).status_code == 401
+    assert refresh(client, second).status_code == 401
+
+def test_revocation_is_per_family(client, login, app, monkeypatch):
+    monkeypatch.setitem(app.config, "REFRESH_REUSE_GRACE_SECONDS", 0)
+    laptop = login()["refreshToken"]
+    phone = login()["refreshToken"]
+    refresh(client, laptop)
+    assert refresh(client, laptop).status_code == 401
+    assert refresh(client, phone).status_code == 200
+
+def test_logout_revokes_the_family(client, login):
+    first = login()["refreshToken"]
+    second = refresh(client, first).get_json()["refreshToken"]
+    assert client.post("/api/auth/logout", json={"refreshToken": first}).status_code == 200
+    assert refresh(client, second).status_code == 401
+
+def test_unknown_or_missing_token(client):
+    assert refresh(client, "nope").status_code == 401
+    assert client.post("/api/auth/refresh", json={}).status_code == 400
@@ -0,0 +1,20 @@
+import pytest
+from conftest import bearer
+
+@pytest.mark.parametrize("field, value", [("projectId", 1), ("text", ["a"]), ("startTime", 730), ("weather", {"t": 3})])
+def test_wrongly_typed_fields_are_rejected(client, login, field, value):
+    headers = bearer(login())
+    body = {"projectId": "proj-1", "text": "Estrich", "clientKey": "k1", field: value}
+    r = client.post("/api/reports", headers=headers, json=body)
+    assert r.status_code == 400 and field in r.get_json()["error"]
+    r = client.post("/api/reports/batch", headers=headers, json={"reports": [body]})
+    assert r.status_code == 400 and r.get_json()["error"].startswith("Bericht k1:")
+
+def test_client_key_length_is_limited_for_single_reports(client, login):
+    headers = bearer(login())
+    body = {"projectId": "proj-1", "text": "Estrich", "clientKey": "k" * 101}
+    for path, payload in (("/api/reports", body), ("/api/reports/batch", {"reports": [body]})):
+        r = client.post(path, headers=headers, json=payload)
+        assert r.status_code == 400 and "clientKey zu lang" in r.get_json()["error"]
+    body["clientKey"] = "k" * 100
+    assert client.post("/api/reports", headers=headers, json=body).status_code == 201
@@ -0,0 +1,87 @@
+import threading
+
+import jwt
+import pytest
+
+import tenants
+from conftest import bearer
+
+MUELLER = "http://mueller.bauapp.example"
+SCHMIDT = "http://schmidt.bauapp.example"
+SHARED_API = "http://api.example.com"
+
+@pytest.fixture
+def tenancy(app, monkeypatch, tmp_path):
+    for key, value in {"TENANTS_DIR": str(tmp_path), "TENANT_BASE_DOMAIN": "bauapp.example",
+                       "TENANT_HOSTS": "bau-mueller.de=mueller", "TENANT_DEFAULT": ""}.items():
+        monkeypatch.setitem(app.config, key, value)
+    runner = app.test_cli_runner()
+    for name in ("mueller", "schmidt"):
+        result = runner.invoke(args=["create-tenant", name, "--admin-password", f"pw-{name}"])
+        assert result.exit_code == 0, result.output
+    yield
+    tenants.registry.close_all()
+
+def tenant_login(client, base_url, password):
+    return client.post("/api/auth/login", base_url=base_url, json={"username": "admin", "password": password})
+
+@pytest.mark.parametrize("base_url, expected", [
+    (MUELLER, "mueller"),
+    ("http://MUELLER.bauapp.example:8443", "mueller"),
+    ("http://bau-mueller.de", "mueller"),
+    (SHARED_API, None),              # used to resolve to tenant "api"
+    ("http://api.eu.example.com", None),
+    ("http://a.b.bauapp.example", None),
+    ("http://bauapp.example", None),
+    ("http://127.0.0.1:5000", None),
+])
+def test_host_names_a_tenant_only_when_configured(app, tenancy, base_url, expected):
+    with app.test_request_context("/", base_url=base_url):
+        assert tenants.host_tenant(app.config) == expected
+
+def test_login_token_carries_the_host_tenant(client, app, tenancy):
+    r = tenant_login(client, MUELLER, "pw-mueller")
+    assert r.status_code == 200
+    claims = jwt.decode(r.get_json()["token"], app.config["SECRET_KEY"], algorithms=["HS256"])
+    assert claims["tid"] == "mueller"
+    # users are per tenant
+    assert tenant_login(client, SCHMIDT, "pw-mueller").status_code == 401
+
+def test_token_tenant_wins_on_a_shared_host(client, tenancy):
+    headers = bearer(tenant_login(client, MUELLER, "pw-mueller").get_json())
+    assert client.get("/api/auth/me", base_url=SHARED_API, headers=headers).status_code == 200
+    assert client.get("/api/projects", base_url=SHARED_API, headers=headers).get_json() == []
+
+def test_token_is_rejected_on_another_tenants_host(client, tenancy):
+    headers = bearer(tenant_login(client, MUELLER, "pw-mueller").get_json())
+    assert client.get("/api/auth/me", base_url=SCHMIDT, headers=headers).status_code == 401
+
+def test_login_on_a_host_without_tenant(client, app, monkeypatch, tenancy):
+    assert tenant_login(client, SHARED_API, "pw-mueller").status_code == 404
+    monkeypatch.setitem(app.config, "TENANT_DEFAULT", "schmidt")
+    assert tenant_login(client, SHARED_API, "pw-schmidt").status_code == 200
+
+def test_opening_a_tenant_does_not_block_the_others(app, tenancy, monkeypatch):
+    opened, release = [], threading.Event()
+    real_open = tenants.open_tenant_storage
+
+    def slow_open(cfg, schema_dir):
+        opened.append(cfg["DB_FILE"])
+        if "mueller" in cfg["DB_FILE"]:
+            assert release.wait(5)
+        real_open(cfg, schema_dir)
+
+    monkeypatch.setattr(tenants, "open_tenant_storage", slow_open)
+    tenants.registry.close_all()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(tenants.registry.get(app.config, "mueller", app.root_path)))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    # mueller is still migrating; schmidt opens anyway
+    assert tenants.registry.get(app.config, "schmidt", app.root_path).name == "schmidt"
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len({id(t) for t in results}) == 1 and len(results) == 3
+    assert sum("mueller" in path for path in opened) == 1
@@ -0,0 +1,63 @@
+"""ZIP archives written on the fly for streaming responses.
+
+Entries are stored, not deflated (JPEGs don't get smaller), and files are copied in
+fixed-size blocks. zipfile runs in its non-seekable mode (sizes/CRC go into a data
+descriptor after each entry), so nothing is buffered beyond one block and the first
+bytes can go out before the last file has been opened.
+"""
+import os
+import zipfile
+import datetime
+from typing import Iterable, Iterator, List, Tuple
+
+BLOCK_SIZE = 256 * 1024
+
+class StreamSink:
+    """Write-only file object for zipfile; ``drain`` hands out what was written since the last call."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_zip(entries: Iterable[Tuple[str, str, datetime.datetime]], block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """entries: (name in archive, path on disk, timestamp). Missing files are skipped."""
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for arcname, path, ts in entries:
+            try:
+                src = open(path, "rb")
+            except OSError:
+                continue
+            with src:
+                info = zipfile.ZipInfo(arcname, date_time=max(ts, datetime.datetime(1980, 1, 1)).timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                info.file_size = os.fstat(src.fileno()).st_size
+                with zf.open(info, "w") as dst:
+                    while True:
+                        block = src.read(block_size)
+                        if not block:
+                            break
+                        dst.write(block)
+                        yield sink.drain()
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()  # central directory
+    if data:
+        yield data
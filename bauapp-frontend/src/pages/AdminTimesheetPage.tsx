@@ -70,7 +70,7 @@ const AdminTimesheetPage: React.FC = () => {
       }
 
       try {
-        const response = await fetch(`${API_BASE}/api/reports`, {
+        const response = await fetch(`${API_BASE}/api/reports?snapshot=1&archived=1`, {
           headers: { Authorization: `Bearer ${token}` },
         });
         const data = await response.json().catch(() => []);
@@ -222,9 +222,31 @@ const AdminTimesheetPage: React.FC = () => {
     return `${formatDate(start)} - ${formatDate(end)}`;
   };
 
-  const handleExport = () => {
+  const handleExport = async () => {
+    if (!token) {
+      addToast({ message: 'Export nur mit Anmeldung möglich', type: 'error' });
+      return;
+    }
+    // reports of the shown week, one row each with computed hours (streamed by the server)
+    const from = weekDates[0].toISOString().split('T')[0];
+    const to = weekDates[6].toISOString().split('T')[0];
     addToast({ message: 'Export wird vorbereitet...', type: 'info' });
-    // In real app: Generate CSV/PDF
+    const response = await fetch(`${API_BASE}/api/exports/reports.xlsx?from=${from}&to=${to}`, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    if (!response.ok) {
+      addToast({ message: 'Export fehlgeschlagen', type: 'error' });
+      return;
+    }
+    const blob = await response.blob();
+    const url = window.URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `Stunden_${from}_${to}.xlsx`;
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+    window.URL.revokeObjectURL(url);
   };
 
   return (
@@ -13,77 +13,98 @@ import { Card, Button, ProjectCard, Spinner } from '../components/ui';
 import { useAuthStore, useProjectStore } from '../store';
 import { cn } from '../utils/cn';
 import { mockReports } from '../mock/reports';
+import type { DashboardReportSummary, DashboardSummary, Project } from '../types';
 
 const API_BASE = import.meta.env.VITE_API_URL || 'http://127.0.0.1:5000';
 
-interface ReportSummary {
-  id: string;
-  projectId: string;
-  projectName?: string;
-  projectAddress?: string;
-  userName: string;
-  text: string;
-  quickActions?: string[];
-  weather?: string;
-  workersPresent?: number;
-  createdAt: string;
-}
+const isOpenHint = (report: DashboardReportSummary) => {
+  const quickActions = report.quickActions?.join(' ').toLowerCase() ?? '';
+  const text = report.text.toLowerCase();
+  return (
+    quickActions.includes('material fehlt') ||
+    quickActions.includes('inspektion') ||
+    text.includes('problem') ||
+    quickActions.includes('sicherheitsproblem')
+  );
+};
+
+const byNewest = (a: DashboardReportSummary, b: DashboardReportSummary) =>
+  new Date(b.createdAt).getTime() - new Date(a.createdAt).getTime();
+
+// Offline/demo fallback: same summary computed from the mock reports and the project store
+const buildLocalSummary = (projects: Project[], reports: DashboardReportSummary[]): DashboardSummary => {
+  const dayAgo = Date.now() - 24 * 60 * 60 * 1000;
+  const sorted = [...reports].sort(byNewest);
+  const hints = sorted.filter(isOpenHint);
+  const byStatus: DashboardSummary['projects']['byStatus'] = {};
+  projects.forEach((p) => {
+    byStatus[p.status] = (byStatus[p.status] || 0) + 1;
+  });
+  return {
+    generatedAt: new Date().toISOString(),
+    projects: {
+      byStatus,
+      total: projects.length,
+      active: projects.filter((p) => p.status === 'active').slice(0, 6),
+    },
+    reports: {
+      total: projects.reduce((sum, p) => sum + (p.reportsCount || 0), 0),
+      last24h: reports.filter((r) => new Date(r.createdAt).getTime() >= dayAgo).length,
+      perDay: [],
+      latest: sorted[0] ?? null,
+    },
+    activeWorkers: 0,
+    quickActions: [],
+    openHints: { count: hints.length, items: hints.slice(0, 6) },
+  };
+};
 
 const Dashboard: React.FC = () => {
   const navigate = useNavigate();
   const { user, token } = useAuthStore();
-  const { projects, loadProjects, isLoading } = useProjectStore();
-  const [reports, setReports] = useState<ReportSummary[]>([]);
+  const { projects, loadProjects } = useProjectStore();
+  const [summary, setSummary] = useState<DashboardSummary | null>(null);
+  const [useFallback, setUseFallback] = useState(false);
 
   useEffect(() => {
-    loadProjects(user?.id, user?.role, user?.assignedProjects);
-  }, [user, loadProjects]);
-
-  useEffect(() => {
-    const loadReports = async () => {
+    const loadDashboard = async () => {
       if (!token) return;
       try {
-        const response = await fetch(`${API_BASE}/api/reports`, {
+        const response = await fetch(`${API_BASE}/api/dashboard`, {
           headers: { Authorization: `Bearer ${token}` },
         });
-        const data = await response.json().catch(() => []);
-        if (!response.ok) {
-          setReports(mockReports);
+        const data = await response.json().catch(() => null);
+        if (!response.ok || !data) {
+          setUseFallback(true);
           return;
         }
-        setReports(Array.isArray(data) ? data : mockReports);
+        setSummary(data as DashboardSummary);
       } catch {
-        setReports(mockReports);
+        setUseFallback(true);
       }
     };
 
-    loadReports();
+    loadDashboard();
   }, [token]);
 
-  const activeProjects = projects.filter((p) => p.status === 'active');
-  const totalReports = projects.reduce((sum, p) => sum + (p.reportsCount || 0), 0);
-  const latestReport = reports.reduce((latest, report) => {
-    if (!latest) return report;
-    return new Date(report.createdAt).getTime() > new Date(latest.createdAt).getTime()
-      ? report
-      : latest;
-  }, null as ReportSummary | null);
-  const now = Date.now();
-  const dayAgo = now - 24 * 60 * 60 * 1000;
-  const todayReports = reports.filter(
-    (report) => new Date(report.createdAt).getTime() >= dayAgo
-  );
-  const openHints = reports.filter((report) => {
-    const quickActions = report.quickActions?.join(' ').toLowerCase() ?? '';
-    const text = report.text.toLowerCase();
-    return (
-      quickActions.includes('material fehlt') ||
-      quickActions.includes('inspektion') ||
-      text.includes('problem') ||
-      quickActions.includes('sicherheitsproblem')
-    );
-  });
-  const isCriticalHint = (report: ReportSummary) => {
+  useEffect(() => {
+    if (useFallback) {
+      loadProjects(user?.id, user?.role, user?.assignedProjects);
+    }
+  }, [useFallback, user, loadProjects]);
+
+  const data = summary ?? (useFallback ? buildLocalSummary(projects, mockReports) : null);
+  const isLoading = data === null;
+
+  const activeProjects = data?.projects.active ?? [];
+  const activeProjectsCount = data?.projects.byStatus.active ?? 0;
+  const totalReports = data?.reports.total ?? 0;
+  const latestReport = data?.reports.latest ?? null;
+  const todayReportsCount = data?.reports.last24h ?? 0;
+  const openHintsCount = data?.openHints.count ?? 0;
+  const openHintsSorted = data?.openHints.items ?? [];
+  const latestOpenHint = openHintsSorted[0] ?? null;
+  const isCriticalHint = (report: DashboardReportSummary) => {
     const haystack = `${report.text} ${(report.quickActions || []).join(' ')}`.toLowerCase();
     return (
       haystack.includes('kritisch') ||
@@ -94,16 +115,7 @@ const Dashboard: React.FC = () => {
       haystack.includes('brand')
     );
   };
-  const latestOpenHint = openHints.reduce((latest, report) => {
-    if (!latest) return report;
-    return new Date(report.createdAt).getTime() > new Date(latest.createdAt).getTime()
-      ? report
-      : latest;
-  }, null as ReportSummary | null);
   const projectNameById = new Map(projects.map((p) => [p.id, p.name]));
-  const openHintsSorted = [...openHints].sort(
-    (a, b) => new Date(b.createdAt).getTime() - new Date(a.createdAt).getTime()
-  );
   const latestReportTime = latestReport
     ? new Date(latestReport.createdAt).toLocaleTimeString('de-DE', {
         hour: '2-digit',
@@ -123,8 +135,8 @@ const Dashboard: React.FC = () => {
     {
       icon: Clock,
       label: 'Heute',
-      value: todayReports.length,
-      detail: todayReports.length ? 'Berichte eingereicht' : 'Noch kein Bericht',
+      value: todayReportsCount,
+      detail: todayReportsCount ? 'Berichte eingereicht' : 'Noch kein Bericht',
       color: 'text-primary-600 dark:text-primary-400 bg-primary-50 dark:bg-primary-900/30',
     },
     {
@@ -137,15 +149,15 @@ const Dashboard: React.FC = () => {
     {
       icon: AlertTriangle,
       label: 'Offene Hinweise',
-      value: openHints.length,
-      detail: openHints.length ? 'Bitte prüfen' : 'Alles ruhig',
+      value: openHintsCount,
+      detail: openHintsCount ? 'Bitte prüfen' : 'Alles ruhig',
       color: 'text-yellow-600 dark:text-yellow-400 bg-yellow-50 dark:bg-yellow-900/30',
       onClick: latestOpenHint ? () => navigate(`/reports/${latestOpenHint.id}`) : undefined,
     },
     {
       icon: FolderKanban,
       label: 'Aktive Projekte',
-      value: activeProjects.length,
+      value: activeProjectsCount,
       detail: totalReports ? `${totalReports} Berichte gesamt` : 'Keine Berichte',
       color: 'text-purple-600 dark:text-purple-400 bg-purple-50 dark:bg-purple-900/30',
     },
@@ -263,7 +275,7 @@ const Dashboard: React.FC = () => {
             </Card>
           ) : (
             <div className="space-y-3 sm:space-y-4">
-              {openHintsSorted.slice(0, 6).map((report) => {
+              {openHintsSorted.map((report) => {
                 const critical = isCriticalHint(report);
                 return (
                   <Card
@@ -366,7 +378,7 @@ const Dashboard: React.FC = () => {
           </motion.div>
         )}
 
-        {!isLoading && activeProjects.length === 0 && (
+        {!isLoading && activeProjectsCount === 0 && (
           <Card className="text-center py-12">
             <FolderKanban className="w-12 h-12 text-gray-300 dark:text-gray-600 mx-auto mb-4" />
             <p className="text-gray-500 dark:text-gray-400">Keine aktiven Projekte vorhanden</p>
@@ -7,20 +7,28 @@ const API_BASE = import.meta.env.VITE_API_URL || 'http://127.0.0.1:5000';
 interface AuthState {
   user: User | null;
   token: string | null;
+  refreshToken: string | null;
+  tokenExpiresAt: number | null;
   isAuthenticated: boolean;
   isLoading: boolean;
   error: string | null;
 
   login: (username: string, password: string) => Promise<boolean>;
+  refreshAccessToken: () => Promise<string | null>;
   logout: () => void;
   clearError: () => void;
 }
 
+// Parallel requests share one refresh call (refresh tokens rotate on every use).
+let refreshInFlight: Promise<string | null> | null = null;
+
 export const useAuthStore = create<AuthState>()(
   persist(
-    (set) => ({
+    (set, get) => ({
       user: null,
       token: null,
+      refreshToken: null,
+      tokenExpiresAt: null,
       isAuthenticated: false,
       isLoading: false,
       error: null,
@@ -56,6 +64,8 @@ export const useAuthStore = create<AuthState>()(
           set({
             user,
             token: data.token,
+            refreshToken: data.refreshToken || null,
+            tokenExpiresAt: data.expiresIn ? Date.now() + data.expiresIn * 1000 : null,
             isAuthenticated: true,
             isLoading: false,
             error: null,
@@ -70,10 +80,53 @@ export const useAuthStore = create<AuthState>()(
         }
       },
 
+      refreshAccessToken: async () => {
+        const refreshToken = get().refreshToken;
+        if (!refreshToken) return null;
+        if (!refreshInFlight) {
+          refreshInFlight = (async () => {
+            try {
+              const response = await fetch(`${API_BASE}/api/auth/refresh`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ refreshToken }),
+              });
+              if (!response.ok) {
+                // another tab may have rotated it already; only log out if nothing newer arrived
+                if (get().refreshToken === refreshToken) get().logout();
+                return get().token;
+              }
+              const data = await response.json();
+              set({
+                token: data.token,
+                refreshToken: data.refreshToken,
+                tokenExpiresAt: Date.now() + data.expiresIn * 1000,
+              });
+              return data.token as string;
+            } catch {
+              return null;
+            } finally {
+              refreshInFlight = null;
+            }
+          })();
+        }
+        return refreshInFlight;
+      },
+
       logout: () => {
+        const refreshToken = get().refreshToken;
+        if (refreshToken) {
+          fetch(`${API_BASE}/api/auth/logout`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ refreshToken }),
+          }).catch(() => undefined);
+        }
         set({
           user: null,
           token: null,
+          refreshToken: null,
+          tokenExpiresAt: null,
           isAuthenticated: false,
           error: null,
         });
@@ -86,6 +139,8 @@ export const useAuthStore = create<AuthState>()(
       partialize: (state) => ({
         user: state.user,
         token: state.token,
+        refreshToken: state.refreshToken,
+        tokenExpiresAt: state.tokenExpiresAt,
         isAuthenticated: state.isAuthenticated,
       }),
     }
@@ -0,0 +1,33 @@
+import type { Project, ProjectStatus } from './project';
+
+export interface DashboardReportSummary {
+  id: string;
+  projectId: string;
+  projectName?: string;
+  userId?: string;
+  userName: string;
+  text: string;
+  quickActions?: string[];
+  createdAt: string;
+}
+
+export interface DashboardSummary {
+  generatedAt: string;
+  projects: {
+    byStatus: Partial<Record<ProjectStatus, number>>;
+    total: number;
+    active: Project[];
+  };
+  reports: {
+    total: number;
+    last24h: number;
+    perDay: { date: string; count: number }[];
+    latest: DashboardReportSummary | null;
+  };
+  activeWorkers: number;
+  quickActions: { action: string; count: number }[];
+  openHints: {
+    count: number;
+    items: DashboardReportSummary[];
+  };
+}
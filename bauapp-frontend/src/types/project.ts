@@ -12,6 +12,8 @@ export interface Project {
   description?: string;
   imageUrl?: string;
   reportsCount?: number;
+  imagesCount?: number;
+  lastReportAt?: string | null;
 }
 
 export interface ProjectWithReports extends Project {
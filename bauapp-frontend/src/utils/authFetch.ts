@@ -0,0 +1,38 @@
+import { useAuthStore } from '../store/authStore';
+
+const API_BASE = import.meta.env.VITE_API_URL || 'http://127.0.0.1:5000';
+// Refresh a little before the access token actually expires
+const REFRESH_SKEW_MS = 30_000;
+
+/**
+ * Wraps window.fetch so every authenticated API call keeps working with short-lived
+ * access tokens: the token is refreshed shortly before expiry, and a 401 is retried
+ * once with a fresh token. Pages keep calling fetch with `Bearer ${token}` as before.
+ */
+export function installAuthFetch() {
+  const originalFetch = window.fetch.bind(window);
+
+  window.fetch = async (input: RequestInfo | URL, init?: RequestInit) => {
+    const url = typeof input === 'string' ? input : input instanceof URL ? input.href : input.url;
+    const headers = new Headers(init?.headers);
+    if (!url.startsWith(API_BASE) || url.includes('/api/auth/') || !headers.get('Authorization')) {
+      return originalFetch(input, init);
+    }
+
+    const auth = useAuthStore.getState();
+    if (auth.refreshToken && auth.tokenExpiresAt && auth.tokenExpiresAt - REFRESH_SKEW_MS < Date.now()) {
+      const fresh = await auth.refreshAccessToken();
+      if (fresh) headers.set('Authorization', `Bearer ${fresh}`);
+    }
+
+    const response = await originalFetch(input, { ...init, headers });
+    if (response.status !== 401 || !useAuthStore.getState().refreshToken) {
+      return response;
+    }
+
+    const fresh = await useAuthStore.getState().refreshAccessToken();
+    if (!fresh) return response;
+    headers.set('Authorization', `Bearer ${fresh}`);
+    return originalFetch(input, { ...init, headers });
+  };
+}